@@ -0,0 +1,166 @@
+"""
+Benchmark: the chatbot send_message pipeline end to end, offline.
+
+Runs routers.chatbot.send_message (session lookup, history, schema pruning, prompt
+building, LLM routing/caching, response parsing, persistence) against a temporary
+SQLite target database and a temporary metadata database, with the deterministic
+"local" LLM provider standing in for the model. Sessions run concurrently, each
+sending --turns questions in sequence. Reports per-request latency percentiles,
+throughput, and the mean time spent outside the simulated model call.
+
+    python benchmarks/bench_chat_pipeline.py --requests 200 --concurrency 20 --latency-ms 300
+
+With --cassette the run's provider and MCP traffic is recorded to (or replayed from)
+a cassette, so a workload recorded once against a real provider can be replayed
+against later builds and their throughput compared:
+
+    python benchmarks/bench_chat_pipeline.py --provider gemini --cassette run.jsonl --cassette-mode record
+    python benchmarks/bench_chat_pipeline.py --provider gemini --cassette run.jsonl --cassette-mode replay
+
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db.models import ChatSession
+from db.session import Base
+from models.query import ChatMessage
+from routers.chatbot import send_message
+from services import cassette, local_llm
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.db_manager import DbManager
+from services.llm_cache import get_llm_cache
+
+DB_ID = "bench_pipeline"
+QUESTIONS = [
+    "hello",
+    "how many orders",
+    "show customers in Berlin",
+    "list products with a price over 100",
+    "what is the total invoice amount per customer",
+    "how many invoices",
+]
+
+
+def make_target_db(path: str, n_rows: int = 200):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, city TEXT);
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, price REAL);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id),
+                             product_id INTEGER REFERENCES products(id), quantity INTEGER);
+        CREATE TABLE invoices (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders(id), amount REAL);
+        """
+    )
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?)", [(i, f"c{i}", "Berlin") for i in range(n_rows)])
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?)", [(i, f"p{i}", i * 1.5) for i in range(n_rows)])
+    conn.commit()
+    conn.close()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args):
+    tmp = tempfile.mkdtemp(prefix="bench_pipeline_")
+    target_path = os.path.join(tmp, "target.db")
+    make_target_db(target_path)
+
+    manager = DbManager()
+    db_config = {"name": "Pipeline benchmark", "engine": "sqlite", "path": target_path}
+    manager.config["databases"][DB_ID] = db_config
+    manager._connectors[DB_ID] = SQLiteConnector(db_config)
+
+    local_llm._local_llm = local_llm.LocalLLM({
+        "fixtures": "config/local_llm_fixtures.yaml",
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "tokens_per_second": args.tokens_per_second,
+    })
+    get_llm_cache().enabled = args.cache
+    if args.cassette:
+        cassette._cassette = cassette.Cassette(
+            mode=args.cassette_mode,
+            path=args.cassette,
+            replay_latency="zero" if args.zero_latency else "recorded",
+        )
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'meta.db')}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    latencies = []
+    sessions = max(1, args.requests // args.turns)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def converse(index: int):
+        user = SimpleNamespace(username=f"bench{index}")
+        async with semaphore, AsyncSession(engine, expire_on_commit=False) as db:
+            session = ChatSession(user_id=user.username, db_id=DB_ID, title="bench")
+            db.add(session)
+            await db.commit()
+            for turn in range(args.turns):
+                question = QUESTIONS[(index + turn) % len(QUESTIONS)]
+                started = time.perf_counter()
+                await send_message(
+                    session.id, ChatMessage(role="user", content=question), model_provider=args.provider,
+                    scope=None, active_mcp_ids=None, current_user=user, db=db,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(converse(i) for i in range(sessions)))
+    wall = time.perf_counter() - started
+    await engine.dispose()
+    manager._connectors.pop(DB_ID, None)
+
+    model_ms = args.latency_ms + args.jitter_ms / 2 if args.provider == "local" and not args.cassette else None
+    mean_ms = statistics.mean(latencies)
+    if args.cassette:
+        model = f"cassette {args.cassette_mode} {args.cassette}" + (" (zero latency)" if args.zero_latency else "")
+    else:
+        model = f"model latency {args.latency_ms}+{args.jitter_ms}ms jitter, {args.tokens_per_second} tok/s"
+    print(
+        f"\nsend_message pipeline ({args.provider}): {len(latencies)} requests, {sessions} sessions x {args.turns} turns, "
+        f"concurrency {args.concurrency}, {model}, response cache {'on' if args.cache else 'off'}"
+    )
+    print(f"{'wall s':>8}{'req/s':>8}{'mean ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'overhead ms':>13}")
+    overhead = f"{max(0.0, mean_ms - model_ms):>13.1f}" if model_ms is not None else f"{'n/a':>13}"
+    print(
+        f"{wall:>8.2f}{len(latencies) / wall:>8.1f}{mean_ms:>9.1f}{percentile(latencies, 0.5):>8.1f}"
+        f"{percentile(latencies, 0.95):>8.1f}{percentile(latencies, 0.99):>8.1f}{overhead}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3, help="messages per session")
+    parser.add_argument("--latency-ms", type=int, default=300)
+    parser.add_argument("--jitter-ms", type=int, default=100)
+    parser.add_argument("--tokens-per-second", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--provider", default="local", help="LLM provider (default: the offline local provider)")
+    parser.add_argument("--cassette", help="cassette file to record to or replay from")
+    parser.add_argument("--cassette-mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--zero-latency", action="store_true", help="replay without the recorded latencies")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
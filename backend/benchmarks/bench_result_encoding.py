@@ -0,0 +1,95 @@
+"""
+Benchmark: row-dict result encoding vs the columnar format (format="columnar").
+
+Builds a synthetic result of driver tuples, then times the server-side work for
+each format the way /api/query/execute does it: shape the rows, validate them
+through QueryResult and render the JSON body. Reports body size and CPU time.
+
+    python benchmarks/bench_result_encoding.py --rows 200000 --columns 20
+
+Run from the backend directory.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.query import QueryResult
+from services.result_encoding import ColumnarBuilder
+
+
+def make_result(n_rows: int, n_cols: int, batch_size: int):
+    """Column names and row batches shaped like execute_query_stream output."""
+    generators = [
+        ("customer_id", lambda i: i),
+        ("order_total_amount", lambda i: Decimal(i % 9973) / 100),
+        ("shipping_region_name", lambda i: ("north", "south", "east", "west")[i % 4]),
+        ("created_at_timestamp", lambda i: datetime(2024, 1, 1) + timedelta(minutes=i)),
+        ("is_priority_customer", lambda i: i % 3 == 0),
+        ("discount_ratio", lambda i: (i % 100) / 100.0),
+    ]
+    columns, makers = [], []
+    for c in range(n_cols):
+        name, maker = generators[c % len(generators)]
+        columns.append(f"{name}_{c}" if c >= len(generators) else name)
+        makers.append(maker)
+
+    rows = [tuple(maker(i) for maker in makers) for i in range(n_rows)]
+    batches = [rows[i:i + batch_size] for i in range(0, n_rows, batch_size)]
+    return columns, batches
+
+
+def render(result: QueryResult) -> bytes:
+    # Mirrors FastAPI: serialize the response model in JSON mode, then Starlette's JSONResponse
+    content = result.model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def encode_rows(columns, batches) -> bytes:
+    rows = [dict(zip(columns, row)) for batch in batches for row in batch]
+    return render(QueryResult(columns=columns, rows=rows, rows_affected=len(rows), query_executed="SELECT"))
+
+
+def encode_columnar(columns, batches) -> bytes:
+    builder = ColumnarBuilder(columns)
+    for batch in batches:
+        builder.add_rows(batch)
+    return render(QueryResult(columnar=builder.build(), rows_affected=builder.row_count, query_executed="SELECT"))
+
+
+def measure(fn, columns, batches, repeat: int):
+    best_cpu = float("inf")
+    body = b""
+    for _ in range(repeat):
+        started = time.process_time()
+        body = fn(columns, batches)
+        best_cpu = min(best_cpu, time.process_time() - started)
+    return len(body), best_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="Best CPU time of N runs is reported")
+    args = parser.parse_args()
+
+    columns, batches = make_result(args.rows, args.columns, args.batch_size)
+    rows_bytes, rows_cpu = measure(encode_rows, columns, batches, args.repeat)
+    col_bytes, col_cpu = measure(encode_columnar, columns, batches, args.repeat)
+
+    print(f"\nResult encoding: {args.rows} rows x {args.columns} columns")
+    print(f"{'format':<10}{'body MB':>12}{'cpu s':>10}")
+    print(f"{'rows':<10}{rows_bytes / 1e6:>12.2f}{rows_cpu:>10.3f}")
+    print(f"{'columnar':<10}{col_bytes / 1e6:>12.2f}{col_cpu:>10.3f}")
+    print(f"payload: {col_bytes / rows_bytes:.0%} of rows format, cpu: {col_cpu / rows_cpu:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark: bulk catalog introspection vs the legacy per-table (N+1) pattern.
+
+Two modes:
+
+  Simulated (no database needed). Serves a synthetic catalog over a link with a
+  fixed round-trip time, so the cost of round-trips is visible on a laptop:
+
+      python benchmarks/bench_schema_introspection.py --tables 2000 --rtt-ms 0.5
+
+  Live. Creates a scratch schema (Postgres) or database (MySQL) with N linked
+  tables on a configured connection, times both strategies and drops it again:
+
+      python benchmarks/bench_schema_introspection.py --db-id postgres_docker --tables 2000
+
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.postgres_connector import PostgresConnector
+from services.connectors.mysql_connector import MySqlConnector
+
+SCRATCH_NAME = "bench_introspection"
+
+
+# --- Legacy N+1 implementations (as they were before bulk introspection) ---
+
+async def legacy_postgres_schema(conn, schema_name):
+    schema_data = []
+    tables = await conn.fetch(
+        "SELECT table_name, table_type FROM information_schema.tables "
+        "WHERE table_schema = $1 ORDER BY table_name;",
+        schema_name,
+    )
+    for table in tables:
+        columns = await conn.fetch(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = $1 AND table_schema = $2 ORDER BY ordinal_position;",
+            table["table_name"], schema_name,
+        )
+        constraints = await conn.fetch(
+            """
+            SELECT kcu.column_name, tc.constraint_type,
+                   ccu.table_name AS foreign_table_name, ccu.column_name AS foreign_column_name
+            FROM information_schema.table_constraints AS tc
+            JOIN information_schema.key_column_usage AS kcu
+              ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+            LEFT JOIN information_schema.constraint_column_usage AS ccu
+              ON ccu.constraint_name = tc.constraint_name AND ccu.table_schema = tc.table_schema
+            WHERE tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+              AND tc.table_name = $1 AND tc.table_schema = $2;
+            """,
+            table["table_name"], schema_name,
+        )
+        schema_data.append((table, columns, constraints))
+    return schema_data
+
+
+async def legacy_mysql_schema(conn, db_name):
+    schema_data = []
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            "SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = %s",
+            (db_name,),
+        )
+        tables = await cursor.fetchall()
+        for table in tables:
+            t_name = {k.lower(): v for k, v in table.items()}["table_name"]
+            await cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = %s AND table_schema = %s",
+                (t_name, db_name),
+            )
+            columns = await cursor.fetchall()
+            await cursor.execute(
+                """
+                SELECT k.column_name, t.constraint_type, k.referenced_table_name, k.referenced_column_name
+                FROM information_schema.table_constraints t
+                JOIN information_schema.key_column_usage k
+                USING (constraint_name, table_schema, table_name)
+                WHERE t.table_schema = %s AND t.table_name = %s
+                """,
+                (db_name, t_name),
+            )
+            constraints = await cursor.fetchall()
+            schema_data.append((table, columns, constraints))
+    await conn.commit()
+    return schema_data
+
+
+# --- Simulated catalog ---
+
+class SimulatedCatalog:
+    """In-memory Postgres catalog answering every query after a fixed round-trip delay."""
+
+    def __init__(self, n_tables: int, cols_per_table: int, rtt_ms: float):
+        self.rtt = rtt_ms / 1000.0
+        self.round_trips = 0
+        self.tables = []
+        self.columns = []
+        self.constraints = []
+        self.columns_by_table = {}
+        self.legacy_constraints_by_table = {}
+        for i in range(n_tables):
+            name = f"t{i:05d}"
+            self.tables.append({"table_name": name, "table_type": "BASE TABLE"})
+            cols = [("id", "integer"), ("parent_id", "integer")] + [
+                (f"attr_{c}", "character varying") for c in range(cols_per_table - 2)
+            ]
+            self.columns_by_table[name] = [{"column_name": c, "data_type": t} for c, t in cols]
+            self.columns.extend({"table_name": name, "column_name": c, "data_type": t} for c, t in cols)
+            legacy = [{"column_name": "id", "constraint_type": "PRIMARY KEY",
+                       "foreign_table_name": name, "foreign_column_name": "id"}]
+            self.constraints.append({"table_name": name, "column_name": "id", "constraint_type": "PRIMARY KEY",
+                                     "referenced_table_name": None, "referenced_column_name": None})
+            if i > 0:
+                parent = f"t{i - 1:05d}"
+                legacy.append({"column_name": "parent_id", "constraint_type": "FOREIGN KEY",
+                               "foreign_table_name": parent, "foreign_column_name": "id"})
+                self.constraints.append({"table_name": name, "column_name": "parent_id",
+                                         "constraint_type": "FOREIGN KEY",
+                                         "referenced_table_name": parent, "referenced_column_name": "id"})
+            self.legacy_constraints_by_table[name] = legacy
+
+    async def fetch(self, sql, *args):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+        if sql is PostgresConnector._TABLES_SQL:
+            return self.tables
+        if sql is PostgresConnector._COLUMNS_SQL:
+            return self.columns
+        if sql is PostgresConnector._CONSTRAINTS_SQL:
+            return self.constraints
+        if "information_schema.columns" in sql:
+            return self.columns_by_table[args[0]]
+        if "table_constraints" in sql:
+            return self.legacy_constraints_by_table[args[0]]
+        return self.tables
+
+
+async def run_simulated(n_tables: int, cols_per_table: int, rtt_ms: float):
+    catalog = SimulatedCatalog(n_tables, cols_per_table, rtt_ms)
+    connector = PostgresConnector({"engine": "postgresql", "host": "sim", "user": "", "password": "", "dbname": ""})
+
+    @asynccontextmanager
+    async def simulated_acquire():
+        yield catalog
+
+    connector._acquire = simulated_acquire
+
+    started = time.perf_counter()
+    await legacy_postgres_schema(catalog, "public")
+    legacy_s = time.perf_counter() - started
+    legacy_trips = catalog.round_trips
+
+    catalog.round_trips = 0
+    started = time.perf_counter()
+    schema = await connector.get_schema()
+    bulk_s = time.perf_counter() - started
+    assert len(schema) == n_tables
+
+    return legacy_s, legacy_trips, bulk_s, catalog.round_trips
+
+
+# --- Live database ---
+
+def _load_db_config(db_id: str):
+    import yaml
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    db_config = config.get("databases", {}).get(db_id)
+    if not db_config:
+        raise SystemExit(f"Database '{db_id}' not found in config/config.yaml")
+    return dict(db_config)
+
+
+async def run_live_postgres(db_config, n_tables: int, cols_per_table: int, keep: bool):
+    connector = PostgresConnector({**db_config, "schema": SCRATCH_NAME})
+    extra_cols = ", ".join(f"attr_{c} varchar(64)" for c in range(cols_per_table - 2))
+    ddl = [f"DROP SCHEMA IF EXISTS {SCRATCH_NAME} CASCADE;", f"CREATE SCHEMA {SCRATCH_NAME};"]
+    for i in range(n_tables):
+        parent = f"REFERENCES {SCRATCH_NAME}.t{i - 1:05d}(id)" if i else ""
+        ddl.append(
+            f"CREATE TABLE {SCRATCH_NAME}.t{i:05d} (id serial PRIMARY KEY, parent_id integer {parent}, {extra_cols});"
+        )
+    try:
+        async with connector._acquire() as conn:
+            print(f"Creating {n_tables} tables in schema '{SCRATCH_NAME}'...")
+            await conn.execute("\n".join(ddl))
+
+            started = time.perf_counter()
+            legacy = await legacy_postgres_schema(conn, SCRATCH_NAME)
+            legacy_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        schema = await connector.get_schema()
+        bulk_s = time.perf_counter() - started
+        assert len(schema) == len(legacy) == n_tables
+        return legacy_s, 1 + 2 * n_tables, bulk_s, 3
+    finally:
+        if not keep:
+            async with connector._acquire() as conn:
+                await conn.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_NAME} CASCADE;")
+        await connector.disconnect()
+
+
+async def run_live_mysql(db_config, n_tables: int, cols_per_table: int, keep: bool):
+    admin = MySqlConnector(db_config)
+    connector = MySqlConnector({**db_config, "dbname": SCRATCH_NAME})
+    extra_cols = ", ".join(f"attr_{c} varchar(64)" for c in range(cols_per_table - 2))
+    try:
+        async with admin._acquire() as conn:
+            async with conn.cursor() as cursor:
+                print(f"Creating {n_tables} tables in database '{SCRATCH_NAME}'...")
+                await cursor.execute(f"DROP DATABASE IF EXISTS {SCRATCH_NAME}")
+                await cursor.execute(f"CREATE DATABASE {SCRATCH_NAME}")
+                for i in range(n_tables):
+                    fk = f", FOREIGN KEY (parent_id) REFERENCES {SCRATCH_NAME}.t{i - 1:05d}(id)" if i else ""
+                    await cursor.execute(
+                        f"CREATE TABLE {SCRATCH_NAME}.t{i:05d} "
+                        f"(id int AUTO_INCREMENT PRIMARY KEY, parent_id int, {extra_cols}{fk})"
+                    )
+            await conn.commit()
+
+        async with connector._acquire() as conn:
+            started = time.perf_counter()
+            legacy = await legacy_mysql_schema(conn, SCRATCH_NAME)
+            legacy_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        schema = await connector.get_schema()
+        bulk_s = time.perf_counter() - started
+        assert len(schema) == len(legacy) == n_tables
+        return legacy_s, 1 + 2 * n_tables, bulk_s, 3
+    finally:
+        if not keep:
+            async with admin._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(f"DROP DATABASE IF EXISTS {SCRATCH_NAME}")
+        await connector.disconnect()
+        await admin.disconnect()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=2000)
+    parser.add_argument("--columns", type=int, default=8, help="Columns per table (min 2)")
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="Simulated round-trip time")
+    parser.add_argument("--db-id", help="Benchmark against a live connection from config.yaml")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema after a live run")
+    args = parser.parse_args()
+    cols = max(args.columns, 2)
+
+    if args.db_id:
+        db_config = _load_db_config(args.db_id)
+        engine = db_config.get("engine")
+        if engine == "postgresql":
+            result = await run_live_postgres(db_config, args.tables, cols, args.keep)
+        elif engine == "mysql":
+            result = await run_live_mysql(db_config, args.tables, cols, args.keep)
+        else:
+            raise SystemExit(f"Live mode supports postgresql and mysql, not '{engine}'")
+        label = f"live {engine} ({args.db_id})"
+    else:
+        result = await run_simulated(args.tables, cols, args.rtt_ms)
+        label = f"simulated, rtt={args.rtt_ms}ms"
+
+    legacy_s, legacy_trips, bulk_s, bulk_trips = result
+    print(f"\nSchema introspection: {args.tables} tables x {cols} columns [{label}]")
+    print(f"{'strategy':<12}{'round-trips':>14}{'seconds':>12}")
+    print(f"{'per-table':<12}{legacy_trips:>14}{legacy_s:>12.3f}")
+    print(f"{'bulk':<12}{bulk_trips:>14}{bulk_s:>12.3f}")
+    if bulk_s > 0:
+        print(f"speedup: {legacy_s / bulk_s:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
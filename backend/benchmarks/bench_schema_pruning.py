@@ -0,0 +1,118 @@
+"""
+Benchmark: prompt schema size with and without question-aware pruning.
+
+Builds synthetic Postgres-shaped schemas of growing size (business-domain table
+names, FK chains between related tables), then for a fixed set of questions
+reports the full prompt size, the pruned prompt size, whether the table each
+question is about survived pruning, and the index build / selection time.
+
+    python benchmarks/bench_schema_pruning.py --sizes 25 100 500 2000 --token-budget 4000
+
+Run from the backend directory.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.postgres_connector import PostgresConnector
+from services.schema_retriever import SchemaIndex
+from services.token_utils import estimate_tokens
+
+ENTITIES = [
+    "customer", "order", "invoice", "product", "shipment", "supplier", "warehouse",
+    "employee", "department", "payment", "refund", "campaign", "ticket", "contract",
+    "subscription", "vendor", "asset", "project", "timesheet", "lead",
+]
+SUFFIXES = ["", "_item", "_history", "_status", "_note", "_address", "_tag", "_audit"]
+COLUMNS = ["name", "description", "amount", "currency", "created_at", "updated_at", "region", "code"]
+
+# (question, table that must be in the prompt to answer it)
+QUESTIONS = [
+    ("What is the total invoice amount per customer last month?", "invoice"),
+    ("Which products were shipped from each warehouse?", "shipment"),
+    ("List employees in the sales department", "employee"),
+    ("How many support tickets are still open?", "ticket"),
+    ("Show refunds over 100 dollars", "refund"),
+]
+
+
+def make_schema(n_tables: int, seed: int = 7):
+    rng = random.Random(seed)
+    names = []
+    shard = 0
+    while len(names) < n_tables:
+        for suffix in SUFFIXES:
+            for entity in ENTITIES:
+                name = f"{entity}{suffix}" + (f"_{shard}" if shard else "")
+                names.append(name)
+        shard += 1
+    names = names[:n_tables]
+
+    schema = []
+    for name in names:
+        entity = name.split("_")[0]
+        columns = [{"name": "id", "type": "integer", "extra": "PK"}]
+        if name != entity and entity in names:
+            columns.append({"name": f"{entity}_id", "type": "integer", "extra": f"FK -> {entity}.id"})
+        elif rng.random() < 0.5:
+            parent = rng.choice(ENTITIES)
+            if parent != entity and parent in names:
+                columns.append({"name": f"{parent}_id", "type": "integer", "extra": f"FK -> {parent}.id"})
+        for column in rng.sample(COLUMNS, 5):
+            columns.append({"name": f"{entity}_{column}" if column == "name" else column, "type": "text", "extra": ""})
+        schema.append({"name": name, "type": "table", "columns": columns})
+    return schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 100, 500, 2000])
+    parser.add_argument("--token-budget", type=int, default=4000)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--fk-depth", type=int, default=1)
+    parser.add_argument("--fk-neighbors", type=int, default=3)
+    args = parser.parse_args()
+
+    formatter = PostgresConnector.format_schema_for_prompt.__get__(object())
+
+    print(f"\nSchema pruning: top_k={args.top_k}, fk_depth={args.fk_depth}, budget={args.token_budget} tokens")
+    print(f"{'tables':>7}{'full tok':>10}{'pruned tok':>12}{'ratio':>8}{'kept':>7}{'recall':>8}{'build ms':>10}{'select ms':>11}")
+    for size in args.sizes:
+        schema = make_schema(size)
+        full_tokens = estimate_tokens(formatter(schema))
+
+        started = time.perf_counter()
+        index = SchemaIndex(schema)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        cost_cache = {}
+
+        def cost(table):
+            if table["name"] not in cost_cache:
+                cost_cache[table["name"]] = estimate_tokens(formatter([table]))
+            return cost_cache[table["name"]]
+
+        pruned, kept, hits, select_ms = [], [], 0, []
+        for question, expected in QUESTIONS:
+            started = time.perf_counter()
+            selection = index.select(question, cost, args.top_k, args.token_budget, args.fk_depth, args.fk_neighbors)
+            select_ms.append((time.perf_counter() - started) * 1000)
+            pruned.append(estimate_tokens(formatter(selection["tables"])))
+            kept.append(len(selection["tables"]))
+            hits += any(t["name"] == expected for t in selection["tables"])
+
+        pruned_tokens = statistics.mean(pruned)
+        print(
+            f"{size:>7}{full_tokens:>10}{pruned_tokens:>12.0f}{pruned_tokens / full_tokens:>8.0%}"
+            f"{statistics.mean(kept):>7.1f}{hits / len(QUESTIONS):>8.0%}"
+            f"{build_ms:>10.1f}{statistics.mean(select_ms):>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,9 @@ class ChatSession(Base):
     title = Column(String, nullable=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Rolling summary of the messages up to and including summary_through_id (see ChatHistoryManager)
+    history_summary = Column(Text, nullable=True)
+    summary_through_id = Column(Integer, nullable=True)
 
     project = relationship("Project", back_populates="sessions")
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
@@ -55,6 +58,7 @@ class AuditLog(Base):
     success = Column(Boolean, default=False)
     error = Column(Text, nullable=True)
     rows_returned = Column(Integer, nullable=True)
+    cache_hit = Column(Boolean, nullable=True)
 
 class SavedQuery(Base):
     __tablename__ = "saved_queries"
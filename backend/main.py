@@ -10,6 +10,11 @@ from models.auth import User
 from routers import auth, database, query, admin, chatbot, saved_query, mcp_connection, transcription
 from mcp_server import mcp
 from services.audit_service import AuditService
+from services.db_manager import DbManager
+from services.result_cursors import ResultCursorRegistry
+from services.mcp_pool import McpSessionPool
+from services.llm_clients import close_llm_clients
+from services.chat_jobs import close_chat_job_queue
 from services.security import get_current_user, has_role, create_initial_admin_user
 from db.session import engine, Base
 from db import models # Register models
@@ -39,23 +44,47 @@ app.add_middleware(
 )
 
 
+COLUMN_MIGRATIONS = [
+    ("chat_messages", "results", "TEXT"),
+    ("audit_logs", "cache_hit", "BOOLEAN"),
+    ("chat_sessions", "history_summary", "TEXT"),
+    ("chat_sessions", "summary_through_id", "INTEGER"),
+]
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initializes services and creates the first admin user if none exist."""
     from sqlalchemy import text
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-        # Migrate: Add 'results' column if missing
+    # Migrate: add columns introduced after the tables were first created. Each runs
+    # in its own transaction so an existing column doesn't abort the others.
+    for table, column, column_type in COLUMN_MIGRATIONS:
         try:
-            await conn.execute(text("ALTER TABLE chat_messages ADD COLUMN results TEXT"))
-            print("DB Migration: Added 'results' column to chat_messages.")
+            async with engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+            print(f"DB Migration: Added '{column}' column to {table}.")
         except Exception as e:
             # Column likely already exists
-            if "duplicate column" not in str(e).lower():
+            if "duplicate column" not in str(e).lower() and "already exists" not in str(e).lower():
                 print(f"DB Migration Note: {e}")
     create_initial_admin_user()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Closes held result cursors, long-lived database connection pools, pooled MCP
+    sessions, LLM HTTP clients and the chat job queue's Redis connections.
+    """
+    await ResultCursorRegistry().close_all()
+    await DbManager().close()
+    await McpSessionPool().close_all()
+    await close_llm_clients()
+    await close_chat_job_queue()
+
+
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(
     database.router,
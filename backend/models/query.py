@@ -11,6 +11,12 @@ class QueryRequest(BaseModel):
     preview_only: bool = True
     confirm_execute: bool = False
     allow_mutations: bool = False  # This must be explicitly passed from the UI
+    batch_size: int = 1000  # Rows per batch for /query/execute/stream
+    page_size: Optional[int] = None  # Set to page /query/execute results via next_page_token
+    # "columnar" returns QueryResult.columnar (per-column value arrays) instead of rows;
+    # "arrow" / "parquet" stream a binary export (see /query/execute)
+    format: Literal["rows", "columnar", "arrow", "parquet"] = "rows"
+    use_cache: bool = True  # False bypasses the read-only result cache
 
 
 class GeneratedQuery(BaseModel):
@@ -27,6 +33,10 @@ class QueryResult(BaseModel):
     error: Optional[str] = None
     rows_affected: Optional[int] = None
     query_executed: str
+    next_page_token: Optional[str] = None  # Present while a paginated result has more pages
+    # format="columnar": {"columns", "types", "values": [[column values], ...], "row_count"}
+    columnar: Optional[Dict[str, Any]] = None
+    cache_hit: Optional[bool] = None  # Set when the result cache was consulted
 
 
 class SavedQuery(BaseModel):
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends
-from typing import List
+from typing import List, Dict, Any, Optional
 from services.audit_service import AuditService, AuditLogEntry
 from db.session import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from services.security import has_role
+from services.db_manager import DbManager
+from services.llm_cache import get_llm_cache
+from services.llm_routing import get_llm_router
+from services.prompt_cache import get_gemini_context_cache, get_prefix_cache
+from services.mcp_pool import McpSessionPool
+from services.mcp_tools import get_tool_catalog
 
 router = APIRouter()
 
@@ -20,3 +26,72 @@ async def get_audit_logs(
     audit_service = AuditService(db)
     logs = await audit_service.get_logs(limit)
     return logs
+
+
+@router.get("/db-pools", response_model=Dict[str, Any])
+async def get_db_pool_stats():
+    """
+    Returns connection pool sizing and acquire-wait metrics per database.
+    """
+    return DbManager().get_pool_stats()
+
+
+@router.get("/result-cache", response_model=Dict[str, Any])
+async def get_result_cache_stats():
+    """
+    Returns size and hit/miss counters for the query result cache.
+    """
+    return DbManager().result_cache.stats()
+
+
+@router.delete("/result-cache", response_model=Dict[str, Any])
+async def purge_result_cache(db_id: Optional[str] = None):
+    """
+    Drops cached query results for one database, or all of them.
+    """
+    purged = DbManager().result_cache.invalidate(db_id)
+    return {"purged": purged}
+
+
+@router.get("/llm-cache", response_model=Dict[str, Any])
+async def get_llm_cache_stats():
+    """
+    Returns backend, size and hit-rate counters for the LLM response cache.
+    """
+    return await get_llm_cache().stats()
+
+
+@router.delete("/llm-cache", response_model=Dict[str, Any])
+async def purge_llm_cache():
+    """
+    Drops every cached LLM response.
+    """
+    purged = await get_llm_cache().purge()
+    return {"purged": purged}
+
+
+@router.get("/llm-latency", response_model=Dict[str, Any])
+async def get_llm_latency():
+    """
+    Returns the provider routing policy and each provider's latency histogram
+    (count, errors, cancelled hedges, p50/p90/p99 and the current hedge delay).
+    """
+    return get_llm_router().stats()
+
+
+@router.get("/prompt-cache", response_model=Dict[str, Any])
+async def get_prompt_cache_stats():
+    """
+    Returns hit counters for the memoized static prompt prefixes and the state of
+    explicit Gemini context caches.
+    """
+    return {"prefixes": get_prefix_cache().stats(), "gemini": get_gemini_context_cache().stats()}
+
+
+@router.get("/mcp-pool", response_model=Dict[str, Any])
+async def get_mcp_pool_stats():
+    """
+    Returns the pooled MCP sessions with their reuse counters and idle times, and the
+    tool catalog cache counters.
+    """
+    return {**McpSessionPool().stats(), "tool_catalog": get_tool_catalog().stats()}
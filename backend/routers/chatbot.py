@@ -1,19 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import json
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from services.mcp_client import McpClientService
-
 from models.auth import User
 from models.query import ChatRequest, ChatMessage
 from models.chat import ChatSession, ChatMessageDB, CreateSessionRequest, InitialChatResponse, Project, CreateProjectRequest
 from services.llm_service import LLMService
 from services.db_manager import DbManager
+from services.schema_retriever import question_from_history
 from services.security import get_current_user
 from services.visualization_service import VisualizationService
 from services.chat_service import ChatService
-from db.session import get_db
+from services.chat_orchestrator import ChatOrchestrator
+from services.chat_jobs import get_chat_job_queue, job_status
+from services.result_encoding import json_default
+from db.session import get_db, AsyncSessionLocal
 
 router = APIRouter()
 
@@ -196,194 +200,153 @@ async def send_message(
     session = await chat_service.get_session(session_id=session_id, user_id=current_user.username)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    llm_service = LLMService()
-    db_manager = DbManager()
-    mcp_client = McpClientService()
-    
+
+    orchestrator = ChatOrchestrator(db, session, current_user.username, model_provider, scope, active_mcp_ids)
     try:
-        # 2. Save User Message
-        await chat_service.add_message(
-            session_id=session_id,
-            role="user",
-            content=message.content
-        )
-        
-        # 3. Fetch Active MCP Tools
-        tools = []
-        active_connections = []
-        if active_mcp_ids:
-            # Parse IDs if they came as a single comma-separated string (frontend quirk handling)
-            # But normally List[str] handling depends on client. We'll assume List.
-            # Handle potential case where it's a single string of comma separated values
-            ids_to_fetch = []
-            for id_val in active_mcp_ids:
-                if "," in id_val:
-                    ids_to_fetch.extend(id_val.split(","))
-                else:
-                    ids_to_fetch.append(id_val)
-            
-            # Fetch connections from DB
-            from models.mcp_connection import MCPConnection
-            from sqlalchemy.future import select
-            
-            stmt = select(MCPConnection).where(MCPConnection.id.in_(ids_to_fetch), MCPConnection.user_id == current_user.username)
-            result = await db.execute(stmt)
-            active_connections = result.scalars().all()
-            
-            for conn in active_connections:
-                try:
-                    conn_tools = await mcp_client.get_tools(
-                        connection_config={
-                            "type": conn.connection_type,
-                            "url": conn.url,
-                            "configuration": conn.configuration or {}
-                        },
-                        headers=conn.headers
-                    )
-                    # Namespace tools to avoid collision? For now, raw.
-                    tools.extend(conn_tools)
-                except Exception as e:
-                    print(f"Failed to fetch tools from {conn.name}: {e}")
-
-        # 4. ReAct Loop (Max depth 5)
-        max_turns = 5
-        current_turn = 0
-        final_response_message = None
-        
-        while current_turn < max_turns:
-            current_turn += 1
-            print(f"--- Turn {current_turn}/{max_turns} ---")
-            
-            # Retrieve Context (Refresh each turn as we might add tool outputs)
-            db_messages = await chat_service.get_session_messages(session_id=session_id)
-            context_messages = []
-            for db_msg in db_messages:
-                context_messages.append(ChatMessage(
-                    role=db_msg.role,
-                    content=db_msg.content,
-                    query=db_msg.query
-                ))
-            
-            if scope == "all":
-                # Multi-DB Mode: Scoped to the SAME ENGINE as the current session DB
-                try:
-                    current_engine = db_manager.get_db_engine(session.db_id)
-                    schema = await db_manager.get_all_schemas_for_prompt(engine_filter=current_engine)
-                    db_engine = "multi-db" # Triggers routing prompt
-                except Exception as e:
-                     # Fallback if session DB is invalid or "ALL" legacy
-                     print(f"Warning: Could not determine engine for scoping: {e}")
-                     schema = await db_manager.get_all_schemas_for_prompt() # Fallback to everything
-                     db_engine = "multi-db"
-            elif session.db_id == "ALL":
-                # Legacy handling for sessions created with ALL
-                schema = await db_manager.get_all_schemas_for_prompt()
-                db_engine = "multi-db"
-            else:
-                schema = await db_manager.get_schema_for_prompt(session.db_id)
-                db_engine = db_manager.get_db_engine(session.db_id)
-            
-            # Generate Response
-            print(f"Calling LLM: {model_provider} with {len(context_messages)} messages...")
-            response_message = await llm_service.generate_response_from_messages(
-                db_id=session.db_id,
-                provider=model_provider,
-                messages=context_messages,
-                schema=schema,
-                engine=db_engine,
-                tools=tools if tools else None
-            )
-            print(f"LLM Response Received. Content len: {len(response_message.content) if response_message.content else 0}")
-            
-            if response_message.query and response_message.query.startswith("__TOOL_CALL__:"):
-                # It's a tool call
-                import json
-                try:
-                    payload = json.loads(response_message.query[len("__TOOL_CALL__:") :])
-                    tool_name = payload["tool"]
-                    tool_args = payload["args"]
-                    
-                    print(f"Model executing MCP Tool: {tool_name} with args: {tool_args}")
-
-                    # Save the "Thought/Action" from assistant
-                    await chat_service.add_message(
-                        session_id=session_id,
-                        role="assistant",
-                        content=response_message.content,
-                        query=f"Executing tool: {tool_name}"
-                    )
-                    
-                    # Find which connection has this tool
-                    tool_result = f"Error: Tool {tool_name} not found or failed execution."
-                    
-                    for conn in active_connections:
-                         try:
-                             # TODO: Improve efficient tool routing.
-                             print(f"Sending tool call to connection: {conn.name} ({conn.url})")
-                             res = await mcp_client.call_tool(
-                                 connection_config={
-                                     "type": conn.connection_type,
-                                     "url": conn.url,
-                                     "configuration": conn.configuration or {}
-                                 }, 
-                                 tool_name=tool_name, 
-                                 arguments=tool_args, 
-                                 headers=conn.headers
-                             )
-                             tool_result = f"Tool Output: {res}"
-                             print(f"Tool executed successfully. Output len: {len(str(res))}")
-                             break # Success
-                         except Exception as exc:
-                             print(f"Tool execution failed on {conn.name}: {exc}")
-                             continue
-                    
-                    # Save Tool Result
-                    await chat_service.add_message(
-                        session_id=session_id,
-                        role="user",
-                        content=f"Observation: {tool_result}"
-                    )
-                    
-                    # Loop continues
-                    continue
-                    
-                except Exception as e:
-                    print(f"Error parsing/executing tool call: {e}")
-                    await chat_service.add_message(
-                        session_id=session_id,
-                        role="user",
-                        content=f"Observation: Error executing tool: {str(e)}"
-                    )
-                    continue
-            else:
-                # Final response (or just a question/SQL query)
-                print("Model provided final response or SQL.")
-                if response_message.query:
-                     print(f"Generated SQL/Command: {response_message.query}")
-                final_response_message = response_message
-                break
-        
-        if not final_response_message:
-            final_response_message = ChatMessage(role="assistant", content="I stopped processing after too many tool calls.")
-            
-        # 5. Save Final Assistant Response
-        saved_response = await chat_service.add_message(
-            session_id=session_id,
-            role=final_response_message.role,
-            content=final_response_message.content,
-            query=final_response_message.query
-        )
-        
+        saved_response = None
+        async for event in orchestrator.run(message.content):
+            if event["type"] == "message":
+                saved_response = event["message"]
         return [saved_response]
 
     except Exception as e:
         # Log error in chat?
         print(f"Critical Error in chat loop: {e}")
-        await chat_service.add_message(session_id=session_id, role="assistant", content=f"Error: {str(e)}")
+        await orchestrator.save_error(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_event(event: Dict[str, Any]) -> str:
+    payload = {k: v for k, v in event.items() if k != "type"}
+    if isinstance(payload.get("message"), BaseModel):
+        payload["message"] = payload["message"].model_dump(mode="json")
+    return f"event: {event['type']}\ndata: {json.dumps(payload, default=json_default)}\n\n"
+
+
+@router.post("/sessions/{session_id}/message/stream")
+async def stream_message(
+    session_id: int,
+    message: ChatMessage,
+    model_provider: str = "gemini",
+    scope: Optional[str] = Query(None),
+    active_mcp_ids: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming variant of send_message, as Server-Sent Events. Emits `turn`,
+    `token` (model text as it arrives), `tool_call_start`/`tool_call_end`, `query`
+    and finally `message` with the saved assistant response, or `error`.
+    """
+    chat_service = ChatService(db)
+    session = await chat_service.get_session(session_id=session_id, user_id=current_user.username)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def event_stream():
+        # The request-scoped session is gone by the time a streamed body finishes,
+        # so the stream gets its own session for the whole chat loop.
+        async with AsyncSessionLocal() as stream_db:
+            stream_session = await ChatService(stream_db).get_session(
+                session_id=session_id, user_id=current_user.username
+            )
+            if not stream_session:
+                yield _sse_event({"type": "error", "detail": "Session not found"})
+                return
+            orchestrator = ChatOrchestrator(
+                stream_db, stream_session, current_user.username, model_provider, scope, active_mcp_ids
+            )
+            try:
+                async for event in orchestrator.run(message.content, stream=True):
+                    yield _sse_event(event)
+            except Exception as e:
+                print(f"Critical Error in streaming chat loop: {e}")
+                await orchestrator.save_error(e)
+                yield _sse_event({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/sessions/{session_id}/message/async", status_code=202)
+async def enqueue_message(
+    session_id: int,
+    message: ChatMessage,
+    model_provider: str = "gemini",
+    scope: Optional[str] = Query(None),
+    active_mcp_ids: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Background variant of send_message: queues the request for the arq worker and
+    returns its job id at once. Follow the job with GET /jobs/{job_id}/events (SSE,
+    the same events as the streaming endpoint) or poll GET /jobs/{job_id}.
+    """
+    chat_service = ChatService(db)
+    session = await chat_service.get_session(session_id=session_id, user_id=current_user.username)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        job_id = await get_chat_job_queue().enqueue(
+            session_id, current_user.username, message.content, model_provider, scope, active_mcp_ids
+        )
+    except Exception as e:
+        print(f"Failed to enqueue chat job for session {session_id}: {e}")
+        raise HTTPException(status_code=503, detail=f"Background chat is unavailable: {e}")
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _owned_job(job_id: str, current_user: User):
+    queue = get_chat_job_queue()
+    owner = await queue.owner(job_id)
+    if not owner or owner["username"] != current_user.username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return queue
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    after: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+):
+    """Polling view of a background chat job: its status and its events from `after` on."""
+    queue = await _owned_job(job_id, current_user)
+    events = await queue.events(job_id)
+    return {"job_id": job_id, "status": job_status(events), "events": events[after:]}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    after: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Server-Sent Events of a background chat job from `after` on (each carries its
+    `seq`, for resuming): `queued`, `started`, then the streaming endpoint's events,
+    ending with `message` or `error`.
+    """
+    queue = await _owned_job(job_id, current_user)
+
+    async def event_stream():
+        async for event in queue.follow(job_id, after):
+            # Comments keep idle connections from timing out while the job waits
+            yield ": keep-alive\n\n" if event is None else _sse_event(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class UpdateMessageRequest(BaseModel):
     results: Optional[Dict[str, Any]] = None
     chart_config: Optional[Dict[str, Any]] = None
@@ -431,7 +394,9 @@ async def handle_chat_message(
     db_manager = DbManager()
 
     try:
-        schema = await db_manager.get_schema_for_prompt(request.db_id)
+        schema = await db_manager.get_schema_for_prompt(
+            request.db_id, question=question_from_history(request.messages)
+        )
         db_engine = db_manager.get_db_engine(request.db_id)
 
         response_message = await llm_service.generate_response_from_messages(
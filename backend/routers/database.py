@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from services.db_manager import DbManager
 from models.database import AppConfig, Schema
@@ -36,6 +36,34 @@ async def get_database_schema(db_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve schema: {e}")
 
 
+@router.post("/schema/{db_id}/refresh", response_model=List[Schema])
+async def refresh_database_schema(db_id: str):
+    """
+    Drops the cached schema for a database and returns a freshly introspected one.
+    """
+    try:
+        manager = DbManager()
+        return await manager.refresh_schema(db_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh schema: {e}")
+
+
+@router.get("/schema/{db_id}/prompt-preview", response_model=Dict[str, Any])
+async def preview_schema_prompt(db_id: str, question: str, token_budget: Optional[int] = None):
+    """
+    Shows the schema text the LLM would get for `question`, with the per-table
+    pruning decisions (score, reason, included, estimated tokens).
+    """
+    try:
+        manager = DbManager()
+        return await manager.select_schema_for_prompt(db_id, question, token_budget)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build schema prompt: {e}")
+
 @router.get("/schemas", response_model=Dict[str, Any])
 async def get_all_schemas():
     """
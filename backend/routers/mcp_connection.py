@@ -6,6 +6,8 @@ from typing import List, Dict, Any
 from db.session import get_db
 from models.mcp_connection import MCPConnection
 from models.auth import User
+from services.mcp_pool import McpSessionPool
+from services.mcp_tools import get_tool_catalog
 from services.security import get_current_user
 from pydantic import BaseModel, HttpUrl
 
@@ -98,4 +100,6 @@ async def delete_mcp_connection(
         
     await db.delete(connection)
     await db.commit()
+    await McpSessionPool().close_connection(connection_id)
+    get_tool_catalog().invalidate_connection(connection_id)
     return None
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+import re
+from contextlib import aclosing
+from typing import Tuple, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from models.query import QueryRequest, GeneratedQuery, QueryResult
 from models.auth import User
 from services.security import get_current_user, has_role
 from services.db_manager import DbManager
 from services.llm_service import LLMService
 from services.audit_service import AuditService
-from db.session import get_db
+from services.result_encoding import encode_ndjson_line, columnar_from_rows
+from services.result_cursors import ResultCursorRegistry, CursorExpiredError
+from services.arrow_export import (
+    ARROW_STREAM_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE,
+    arrow_available,
+    stream_arrow,
+)
+from db.session import get_db, AsyncSessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
@@ -26,7 +39,9 @@ async def generate_query_from_nl(
     audit_service = AuditService(db)
 
     try:
-        schema_for_prompt = await db_manager.get_schema_for_prompt(request.db_id)
+        schema_for_prompt = await db_manager.get_schema_for_prompt(
+            request.db_id, question=request.natural_language_query
+        )
         db_engine = db_manager.get_db_engine(request.db_id)
 
         generated_query = await llm_service.generate_query(
@@ -61,26 +76,17 @@ async def generate_query_from_nl(
         raise HTTPException(status_code=500, detail=f"Failed to generate query: {e}")
 
 
-@router.post("/query/execute", response_model=QueryResult)
-async def execute_raw_query(
-    request: QueryRequest, 
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
+def _resolve_query_target(request: QueryRequest, current_user: User, db_manager: DbManager) -> Tuple[str, str, bool]:
     """
-    Executes a raw query against the specified database.
-    Includes safety checks for mutations.
+    Resolves the target database (honouring a leading 'DB_ID: <id>' line) and applies
+    the mutation safety checks. Returns (db_id, query, is_mutation); raises HTTPException.
     """
-    db_manager = DbManager()
-    audit_service = AuditService(db)
-
     # Multi-DB Logic: Parse real DB_ID if scope is ALL
     real_db_id = request.db_id
     final_query = request.raw_query.strip()
 
     # Multi-DB Logic: Check for DB_ID: <id> prefix regardless of request.db_id
     # This allows LLM to route to a different DB than the one selected in UI (if in 'All' scope)
-    import re
     match = re.match(r"^DB_ID:\s*([a-zA-Z0-9_-]+)\s*\n?", final_query, re.IGNORECASE)
     
     if match:
@@ -118,8 +124,117 @@ async def execute_raw_query(
                 detail="Mutation query detected, but the 'allow_mutations' confirmation flag was not set.",
             )
 
+    return real_db_id, final_query, is_mutation
+
+
+async def _audit_streamed_query(
+    current_user: User, request: QueryRequest, db_id: str, query: str, error: Optional[str], rows_returned: int
+):
+    # The request-scoped session is gone by the time a streamed body finishes,
+    # so the audit entry gets its own short-lived session.
+    async with AsyncSessionLocal() as audit_db:
+        await AuditService(audit_db).log(
+            username=current_user.username,
+            db_id=db_id,
+            natural_query=request.natural_language_query,
+            generated_query=query,
+            executed=True,
+            success=error is None,
+            error=error,
+            rows_returned=rows_returned,
+        )
+
+
+def _negotiate_export_format(request: QueryRequest, accept: str) -> Optional[str]:
+    """Binary export selected by `format` or by the Accept header: "arrow", "parquet" or None."""
+    if request.format in ("arrow", "parquet"):
+        return request.format
+    accepted = [part.split(";")[0].strip().lower() for part in (accept or "").split(",")]
+    if ARROW_STREAM_MEDIA_TYPE in accepted:
+        return "arrow"
+    if PARQUET_MEDIA_TYPE in accepted:
+        return "parquet"
+    return None
+
+
+def _arrow_export_response(
+    request: QueryRequest, current_user: User, db_manager: DbManager, db_id: str, query: str, export_format: str
+) -> StreamingResponse:
+    """
+    Streams the result as Arrow IPC record batches (or Parquet row groups), encoded
+    batch by batch from the connector's cursor. A failure mid-stream aborts the body.
+    """
+    if not arrow_available():
+        raise HTTPException(
+            status_code=406, detail="Arrow/Parquet export requires the 'pyarrow' package on the server."
+        )
+    batch_size = max(1, min(request.batch_size, 100000))
+    stats = {"rows": 0}
+
+    async def counted(batches):
+        async for batch in batches:
+            stats["rows"] += len(batch.get("rows") or batch.get("json_result") or [])
+            yield batch
+
+    async def body():
+        error = None
+        try:
+            async with aclosing(db_manager.execute_query_stream(db_id, query, batch_size)) as batches:
+                async with aclosing(stream_arrow(counted(batches), parquet=export_format == "parquet")) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            await _audit_streamed_query(current_user, request, db_id, query, error, stats["rows"])
+
+    if export_format == "parquet":
+        return StreamingResponse(
+            body(),
+            media_type=PARQUET_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{db_id}-result.parquet"'},
+        )
+    return StreamingResponse(body(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+@router.post("/query/execute", response_model=QueryResult)
+async def execute_raw_query(
+    request: QueryRequest, 
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Executes a raw query against the specified database.
+    Includes safety checks for mutations.
+
+    `Accept: application/vnd.apache.arrow.stream` (or format="arrow") streams the result
+    as Arrow IPC instead of JSON; format="parquet" streams a Parquet download.
+    """
+    db_manager = DbManager()
+    audit_service = AuditService(db)
+    real_db_id, final_query, is_mutation = _resolve_query_target(request, current_user, db_manager)
+
+    export_format = _negotiate_export_format(request, http_request.headers.get("accept"))
+    if export_format:
+        if is_mutation:
+            raise HTTPException(status_code=400, detail="Mutation queries cannot be exported.")
+        return _arrow_export_response(request, current_user, db_manager, real_db_id, final_query, export_format)
+
     try:
-        result = await db_manager.execute_query(real_db_id, final_query)
+        if request.page_size and not is_mutation:
+            # Paginated mode: first page now, the rest via /query/pages/{next_page_token}
+            result = await ResultCursorRegistry().open(
+                current_user.username, real_db_id, final_query, request.page_size
+            )
+        elif request.format == "columnar" and not is_mutation:
+            result = await db_manager.execute_query_columnar(real_db_id, final_query, use_cache=request.use_cache)
+        else:
+            result = await db_manager.execute_query(real_db_id, final_query, use_cache=request.use_cache)
+
+        if request.format == "columnar" and result.get("rows") is not None:
+            result["columnar"] = columnar_from_rows(result.get("columns") or [], result.pop("rows"))
 
         await audit_service.log(
             username=current_user.username,
@@ -129,6 +244,7 @@ async def execute_raw_query(
             executed=True,
             success=True,
             rows_returned=result.get("rows_affected", 0),
+            cache_hit=result.get("cache_hit"),
         )
         return QueryResult(**result, query_executed=final_query)
 
@@ -143,3 +259,89 @@ async def execute_raw_query(
             error=str(e),
         )
         return QueryResult(error=str(e), query_executed=request.raw_query)
+
+
+@router.get("/query/pages/{token}", response_model=QueryResult)
+async def fetch_next_page(
+    token: str,
+    format: Literal["rows", "columnar"] = "rows",
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Returns the next page of a paginated /query/execute result. Each token is single-use;
+    the response carries a fresh `next_page_token` until the result is exhausted.
+    """
+    registry = ResultCursorRegistry()
+    try:
+        result = await registry.next_page(token, current_user.username)
+    except CursorExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        return QueryResult(error=str(e), query_executed="")
+    if format == "columnar" and result.get("rows") is not None:
+        result["columnar"] = columnar_from_rows(result.get("columns") or [], result.pop("rows"))
+    return QueryResult(**result, query_executed="")
+
+
+@router.delete("/query/pages/{token}")
+async def close_page_cursor(token: str, current_user: User = Depends(get_current_user)):
+    """Releases a paginated result early instead of waiting for idle expiry."""
+    closed = await ResultCursorRegistry().close(token, current_user.username)
+    return {"closed": closed}
+
+
+@router.post("/query/execute/stream")
+async def execute_raw_query_stream(
+    request: QueryRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Executes a read-only query and streams the result as NDJSON, one line per event:
+
+        {"type": "columns", "columns": [...]}
+        {"type": "rows", "rows": [[...], ...]}          (repeated, batch_size rows each)
+        {"type": "documents", "documents": [...]}       (document engines instead of rows)
+        {"type": "end", "rows_returned": N}
+        {"type": "error", "error": "..."}               (replaces "end" on failure)
+
+    Rows are fetched through server-side cursors, so memory stays flat for large results.
+    """
+    db_manager = DbManager()
+    real_db_id, final_query, is_mutation = _resolve_query_target(request, current_user, db_manager)
+    if is_mutation:
+        raise HTTPException(
+            status_code=400,
+            detail="Mutation queries cannot be streamed; use /query/execute instead.",
+        )
+    batch_size = max(1, min(request.batch_size, 10000))
+
+    async def event_stream():
+        rows_returned = 0
+        error = None
+        sent_columns = False
+        try:
+            async with aclosing(db_manager.execute_query_stream(real_db_id, final_query, batch_size)) as batches:
+                async for batch in batches:
+                    if "rows" in batch and batch.get("columns") is not None:
+                        if not sent_columns:
+                            sent_columns = True
+                            yield encode_ndjson_line({"type": "columns", "columns": batch["columns"]})
+                        if batch["rows"]:
+                            rows_returned += len(batch["rows"])
+                            yield encode_ndjson_line({"type": "rows", "rows": batch["rows"]})
+                    elif "json_result" in batch:
+                        docs = batch["json_result"]
+                        if not isinstance(docs, list):
+                            docs = [docs]
+                        rows_returned += len(docs)
+                        yield encode_ndjson_line({"type": "documents", "documents": docs})
+                    else:
+                        rows_returned += batch.get("rows_affected") or 0
+            yield encode_ndjson_line({"type": "end", "rows_returned": rows_returned})
+        except Exception as e:
+            error = str(e)
+            yield encode_ndjson_line({"type": "error", "error": error})
+        finally:
+            await _audit_streamed_query(current_user, request, real_db_id, final_query, error, rows_returned)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
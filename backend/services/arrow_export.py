@@ -0,0 +1,243 @@
+import json
+from contextlib import aclosing
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services.result_encoding import json_default
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Extra column on document exports holding, as JSON, any fields that only appear
+# after the first batch (an Arrow stream's schema is fixed by its first message).
+EXTRA_FIELDS_COLUMN = "_extra"
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+# Postgres cursors report the declared type of each column; using it keeps the Arrow
+# schema exact even when the first batch is all NULLs. Other types are inferred.
+_PG_ARROW_TYPES = {
+    "bool": "bool_",
+    "int2": "int16",
+    "int4": "int32",
+    "int8": "int64",
+    "float4": "float32",
+    "float8": "float64",
+    "text": "string",
+    "varchar": "string",
+    "bpchar": "string",
+    "name": "string",
+    "date": "date32",
+    "bytea": "binary",
+    # asyncpg reports numeric columns without precision or scale; a decimal type
+    # inferred from the first batch would reject later, wider values, so use text.
+    "numeric": "string",
+}
+
+
+def _declared_type(type_name: Optional[str]):
+    if type_name == "timestamp":
+        return pa.timestamp("us")
+    if type_name == "timestamptz":
+        return pa.timestamp("us", tz="UTC")
+    factory = _PG_ARROW_TYPES.get(type_name or "")
+    return getattr(pa, factory)() if factory else None
+
+
+_ARROW_NATIVE = (bool, int, float, str, bytes, Decimal, datetime, date, time)
+
+
+def _to_cell(value: Any) -> Any:
+    """Values Arrow can't infer (arrays, ObjectIds, ...) become JSON or text."""
+    if value is None or isinstance(value, _ARROW_NATIVE):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=json_default)
+    return str(value)
+
+
+def flatten_document(doc: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Flattens nested sub-documents into dotted column names; arrays stay as JSON text."""
+    flat = {}
+    for key, value in doc.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten_document(value, f"{name}."))
+        else:
+            flat[name] = _to_cell(value)
+    return flat
+
+
+class ArrowBatchEncoder:
+    """
+    Turns execute_query_stream batches into Arrow record batches under one schema,
+    fixed by the first batch. Later values that don't fit a column's type are
+    stored as text in columns that were inferred as null or string.
+    """
+
+    def __init__(self):
+        self.schema = None
+
+    def encode(self, batch: Dict[str, Any]):
+        if "rows" in batch and batch.get("columns") is not None:
+            return self._encode_rows(batch["columns"], batch["rows"], batch.get("column_types"))
+        if isinstance(batch.get("json_result"), list):
+            return self._encode_documents(batch["json_result"])
+        return None
+
+    def _encode_rows(self, columns: List[str], rows: List[tuple], column_types: Optional[List[str]] = None):
+        column_values = list(zip(*rows)) if rows else [() for _ in columns]
+        if self.schema is None:
+            arrays = []
+            for index, values in enumerate(column_values):
+                declared = _declared_type(column_types[index]) if column_types else None
+                arrays.append(self._infer_array(values, declared))
+            fields = [
+                # All-NULL first batches would pin the column to the null type; use text instead
+                pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                for name, array in zip(columns, arrays)
+            ]
+            self.schema = pa.schema(fields)
+        arrays = [
+            self._array_for(field, values) for field, values in zip(self.schema, column_values)
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _encode_documents(self, docs: List[Dict[str, Any]]):
+        flat_docs = [flatten_document(doc) for doc in docs]
+        if self.schema is None:
+            names: List[str] = []
+            seen = set()
+            for doc in flat_docs:
+                for name in doc:
+                    if name not in seen:
+                        seen.add(name)
+                        names.append(name)
+            columns = [[doc.get(name) for doc in flat_docs] for name in names]
+            arrays = [self._infer_array(values, None) for values in columns]
+            fields = [
+                pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                for name, array in zip(names, arrays)
+            ]
+            fields.append(pa.field(EXTRA_FIELDS_COLUMN, pa.string()))
+            self.schema = pa.schema(fields)
+
+        known = set(self.schema.names)
+        extras = []
+        for doc in flat_docs:
+            unknown = {k: v for k, v in doc.items() if k not in known}
+            extras.append(json.dumps(unknown, default=json_default) if unknown else None)
+        arrays = []
+        for field in self.schema:
+            if field.name == EXTRA_FIELDS_COLUMN:
+                arrays.append(pa.array(extras, type=pa.string()))
+            else:
+                arrays.append(self._array_for(field, [doc.get(field.name) for doc in flat_docs]))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    @staticmethod
+    def _infer_array(values, declared_type):
+        if declared_type is not None:
+            try:
+                return pa.array(values, type=declared_type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                if pa.types.is_string(declared_type):
+                    return pa.array([_to_text(v) for v in values], type=pa.string())
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.array([_to_text(v) for v in values], type=pa.string())
+        if pa.types.is_decimal(array.type):
+            # Precision inferred from one batch; text keeps later, wider values exact
+            return pa.array([_to_text(v) for v in values], type=pa.string())
+        return array
+
+    @staticmethod
+    def _array_for(field, values):
+        try:
+            return pa.array(values, type=field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if pa.types.is_string(field.type):
+                return pa.array([_to_text(v) for v in values], type=pa.string())
+            raise ValueError(
+                f"Column '{field.name}' changed type mid-result and cannot be exported as {field.type}."
+            )
+
+
+def _to_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, Decimal):
+        # Exact digits; json_default would round through float
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=json_default)
+    return str(json_default(value))
+
+
+class _ChunkSink:
+    """Minimal writable file for pyarrow writers; the caller drains written chunks."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _open_writer(sink: _ChunkSink, schema, parquet: bool):
+    target = pa.PythonFile(sink, mode="w")
+    return pq.ParquetWriter(target, schema) if parquet else pa.ipc.new_stream(target, schema)
+
+
+async def stream_arrow(batches: AsyncIterator[Dict[str, Any]], parquet: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encodes execute_query_stream batches as an Arrow IPC stream, or as Parquet with one
+    row group per batch, yielding bytes as each batch is written.
+    """
+    encoder = ArrowBatchEncoder()
+    sink = _ChunkSink()
+    writer = None
+    async with aclosing(batches):
+        async for batch in batches:
+            record_batch = encoder.encode(batch)
+            if record_batch is None:
+                continue
+            if writer is None:
+                writer = _open_writer(sink, record_batch.schema, parquet)
+            writer.write_batch(record_batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+    if writer is None:
+        # No row batches at all (e.g. a status-only result): still a valid, empty file
+        writer = _open_writer(sink, pa.schema([]), parquet)
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
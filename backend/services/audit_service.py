@@ -21,6 +21,7 @@ class AuditLogEntry(BaseModel):
     success: bool
     error: Optional[str] = None
     rows_returned: Optional[int] = None
+    cache_hit: Optional[bool] = None
     
     class Config:
         from_attributes = True
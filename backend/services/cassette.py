@@ -0,0 +1,226 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import yaml
+
+from services.llm_routing import error_status
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(RuntimeError):
+    """A replayed request that was never recorded."""
+
+
+class CassetteReplayError(RuntimeError):
+    """A recorded provider/tool error, raised again on replay with its status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    payload = json.dumps({"kind": kind, **request}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Record/replay of external calls (LLM provider requests, MCP tool calls) for
+    reproducible workloads.
+
+    In "record" mode every call made through `through()`/`stream()` is appended to a
+    JSONL file (gzip when the path ends in .gz) as one line: kind, request-hash key,
+    the request, latency, and the response or error (streams keep each delta with its
+    offset). In "replay" mode the same request is answered from the file, after the
+    recorded latency or immediately with replay_latency "zero". Repeated requests
+    replay their recordings in order, cycling. Unrecorded requests raise CassetteMiss,
+    or go to the live service with on_miss "passthrough". "off" calls straight through.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        path: str = "cassettes/default.jsonl",
+        replay_latency: str = "recorded",
+        on_miss: str = "error",
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.path = path
+        self.zero_latency = replay_latency == "zero"
+        self.passthrough = on_miss == "passthrough"
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursor: Dict[str, int] = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _write(self, entry: Dict[str, Any]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._open("a") as f:
+            f.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+        self.recorded += 1
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with self._open("r") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries.setdefault(entry["key"], []).append(entry)
+            print(f"DEBUG: Loaded cassette {self.path} ({sum(map(len, self._entries.values()))} recordings)")
+        recordings = self._entries.get(key)
+        if not recordings:
+            return None
+        index = self._cursor.get(key, 0)
+        self._cursor[key] = index + 1
+        self.replayed += 1
+        return recordings[index % len(recordings)]
+
+    async def _wait(self, elapsed_ms: float):
+        if not self.zero_latency and elapsed_ms > 0:
+            await asyncio.sleep(elapsed_ms / 1000)
+
+    def _miss(self, kind: str, key: str):
+        self.misses += 1
+        if not self.passthrough:
+            raise CassetteMiss(f"No {kind} recording for key {key} in {self.path}")
+
+    async def through(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        call: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+    ) -> Any:
+        if self.mode == "off":
+            return await call()
+        key = request_key(kind, request)
+
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            if entry is not None:
+                await self._wait(entry["latency_ms"])
+                if "error" in entry:
+                    raise CassetteReplayError(entry["error"], entry.get("status"))
+                return decode(entry["response"])
+            self._miss(kind, key)
+            return await call()
+
+        started = time.perf_counter()
+        entry = {"kind": kind, "key": key, "request": request}
+        try:
+            result = await call()
+        except Exception as e:
+            status = error_status(e)
+            entry.update(latency_ms=round((time.perf_counter() - started) * 1000, 1), error=f"{type(e).__name__}: {e}")
+            if status is not None:
+                entry["status"] = status
+            self._write(entry)
+            raise
+        entry.update(latency_ms=round((time.perf_counter() - started) * 1000, 1), response=encode(result))
+        self._write(entry)
+        return result
+
+    async def stream(
+        self, kind: str, request: Dict[str, Any], open_stream: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        if self.mode == "off":
+            async with aclosing(open_stream()) as deltas:
+                async for delta in deltas:
+                    yield delta
+            return
+        key = request_key(kind, request)
+
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            if entry is not None:
+                elapsed = 0.0
+                for offset_ms, delta in entry["response"]:
+                    await self._wait(offset_ms - elapsed)
+                    elapsed = offset_ms
+                    yield delta
+                if "error" in entry:
+                    await self._wait(entry["latency_ms"] - elapsed)
+                    raise CassetteReplayError(entry["error"], entry.get("status"))
+                return
+            self._miss(kind, key)
+            async with aclosing(open_stream()) as deltas:
+                async for delta in deltas:
+                    yield delta
+            return
+
+        started = time.perf_counter()
+        entry = {"kind": kind, "key": key, "request": request}
+        recorded = []
+        # Streams that fail or that the consumer closes early (provider failover)
+        # are recorded too, up to where they stopped, so replays follow the same path.
+        try:
+            async with aclosing(open_stream()) as deltas:
+                async for delta in deltas:
+                    recorded.append([round((time.perf_counter() - started) * 1000, 1), delta])
+                    yield delta
+        except Exception as e:
+            status = error_status(e)
+            entry["error"] = f"{type(e).__name__}: {e}"
+            if status is not None:
+                entry["status"] = status
+            raise
+        finally:
+            entry.update(latency_ms=round((time.perf_counter() - started) * 1000, 1), response=recorded)
+            self._write(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Cassette:
+    """
+    Process-wide cassette from the `cassette` block of config.yaml; CASSETTE_MODE and
+    CASSETTE_PATH override mode and path.
+    """
+    global _cassette
+    if _cassette is None:
+        with open("config/config.yaml", "r") as f:
+            config = yaml.safe_load(f).get("cassette") or {}
+        _cassette = Cassette(
+            mode=os.getenv("CASSETTE_MODE") or config.get("mode", "off"),
+            path=os.getenv("CASSETTE_PATH") or config.get("path", "cassettes/default.jsonl"),
+            replay_latency=config.get("replay_latency", "recorded"),
+            on_miss=config.get("on_miss", "error"),
+        )
+        if _cassette.active:
+            print(f"DEBUG: Cassette {_cassette.mode} mode, file {_cassette.path}")
+    return _cassette
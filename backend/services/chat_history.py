@@ -0,0 +1,141 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from models.query import ChatMessage
+from services.token_utils import estimate_tokens
+
+OBSERVATION_PREFIX = "Observation:"
+SUMMARY_HEADER = "[Summary of earlier conversation]"
+
+
+def _is_question(message) -> bool:
+    return message.role == "user" and not (message.content or "").startswith(OBSERVATION_PREFIX)
+
+
+def extractive_summary(previous: str, messages: List[Any], max_tokens: int) -> str:
+    """
+    Summary without a model call: one line per folded message (questions and answers
+    clipped, generated queries kept, tool output reduced to its size). Oldest lines
+    are dropped first when over max_tokens.
+    """
+    lines = [line for line in (previous or "").splitlines() if line.strip()]
+    for message in messages:
+        content = " ".join((message.content or "").split())
+        if message.role == "user" and content.startswith(OBSERVATION_PREFIX):
+            lines.append(f"- Tool output ({len(content)} chars) was returned.")
+        elif message.role == "user":
+            lines.append(f"- User asked: {content[:200]}")
+        else:
+            line = f"- Assistant: {content[:200]}"
+            if getattr(message, "query", None):
+                line += f" [query: {' '.join(message.query.split())[:300]}]"
+            lines.append(line)
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ChatHistoryManager:
+    """
+    Builds the message list sent to the LLM for a chat session under a per-provider
+    token budget (`llm.providers.<p>.history_tokens`, else `llm.history.max_tokens`).
+
+    The current turn (the latest question and any tool observations after it) is
+    always sent verbatim, and earlier turns are kept newest-first while they fit.
+    When the history no longer fits, older turns are folded into the session's
+    rolling summary, persisted on ChatSession (history_summary, summary_through_id),
+    and sent as a single leading message instead. Folding trims the verbatim part
+    down to `recent_fraction` of the budget so the summarizer runs once per chunk of
+    turns rather than on every message.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        save_summary: Callable[[int, str, int], Awaitable[Any]],
+        summarize: Optional[Callable[[str, str, List[Any], int], Awaitable[str]]] = None,
+    ):
+        history_config = config.get("history") or {}
+        self.providers = config.get("providers") or {}
+        self.enabled = history_config.get("enabled", True)
+        self.max_tokens = history_config.get("max_tokens", 6000)
+        self.recent_fraction = history_config.get("recent_fraction", 0.6)
+        self.summary_max_tokens = history_config.get("summary_max_tokens", 600)
+        self.observation_max_chars = history_config.get("observation_max_chars", 2000)
+        self.summarizer = history_config.get("summarizer", "llm")
+        self.save_summary = save_summary
+        self.summarize = summarize
+
+    def budget_for(self, provider: str) -> int:
+        provider_config = self.providers.get((provider or "").lower()) or {}
+        return provider_config.get("history_tokens", self.max_tokens)
+
+    def _clip(self, message, in_current_turn: bool) -> ChatMessage:
+        content = message.content or ""
+        if (
+            not in_current_turn
+            and message.role == "user"
+            and content.startswith(OBSERVATION_PREFIX)
+            and len(content) > self.observation_max_chars
+        ):
+            # Older tool output only needs to be recognisable, not complete
+            content = content[:self.observation_max_chars] + f"... [{len(content) - self.observation_max_chars} chars truncated]"
+        return ChatMessage(role=message.role, content=content, query=getattr(message, "query", None))
+
+    async def build_context(self, session, db_messages: List[Any], provider: str) -> List[ChatMessage]:
+        """
+        Returns the messages to send for `session` given its stored messages (oldest
+        first). May update and persist the session's rolling summary.
+        """
+        if not self.enabled:
+            return [self._clip(m, True) for m in db_messages]
+
+        summary = session.history_summary or ""
+        through_id = session.summary_through_id or 0
+        # Messages of the running request may not be saved yet (no id): always pending
+        pending = [m for m in db_messages if m.id is None or m.id > through_id]
+
+        anchor = max((i for i, m in enumerate(pending) if _is_question(m)), default=0)
+        clipped = [self._clip(m, i >= anchor) for i, m in enumerate(pending)]
+        costs = [estimate_tokens(m.content) + (estimate_tokens(m.query) if m.query else 0) for m in clipped]
+
+        budget = self.budget_for(provider)
+        summary_cost = estimate_tokens(summary)
+        keep_from = 0
+        if summary_cost + sum(costs) > budget:
+            target = int(budget * self.recent_fraction) - self.summary_max_tokens
+            keep_from = anchor
+            used = sum(costs[anchor:])
+            while keep_from > 0 and used + costs[keep_from - 1] <= target:
+                keep_from -= 1
+                used += costs[keep_from]
+            # Start the verbatim window on a question, not halfway through a turn
+            while keep_from < anchor and not _is_question(pending[keep_from]):
+                keep_from += 1
+
+        if keep_from > 0:
+            folded = pending[:keep_from]
+            summary = await self._summarize(provider, summary, folded)
+            through_id = folded[-1].id
+            await self.save_summary(session.id, summary, through_id)
+            session.history_summary = summary
+            session.summary_through_id = through_id
+            print(
+                f"DEBUG: Folded {len(folded)} messages of session {session.id} into its summary "
+                f"({estimate_tokens(summary)} tokens); {len(pending) - keep_from} kept verbatim"
+            )
+
+        context = []
+        if summary:
+            context.append(ChatMessage(role="user", content=f"{SUMMARY_HEADER}\n{summary}"))
+        context.extend(clipped[keep_from:])
+        return context
+
+    async def _summarize(self, provider: str, previous: str, messages: List[Any]) -> str:
+        if self.summarizer == "llm" and self.summarize is not None:
+            try:
+                summary = await self.summarize(provider, previous, messages, self.summary_max_tokens)
+                if summary and not summary.startswith("Error"):
+                    return summary.strip()
+            except Exception as e:
+                print(f"WARNING: History summarization failed, using extractive summary: {e}")
+        return extractive_summary(previous, messages, self.summary_max_tokens)
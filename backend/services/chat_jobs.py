@@ -0,0 +1,220 @@
+import json
+import os
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import yaml
+from pydantic import BaseModel
+
+from services.result_encoding import json_default
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+try:
+    from arq import create_pool
+    from arq.connections import RedisSettings
+except ImportError:
+    create_pool = None
+
+# arq function name of the worker task (worker.run_chat_task)
+CHAT_JOB_FUNCTION = "run_chat_task"
+TERMINAL_EVENTS = ("message", "error")
+
+
+def encode_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """A ChatOrchestrator event as plain JSON data (the saved message is a pydantic model)."""
+    payload = dict(event)
+    if isinstance(payload.get("message"), BaseModel):
+        payload["message"] = payload["message"].model_dump(mode="json")
+    return json.loads(json.dumps(payload, default=json_default))
+
+
+def job_status(events: List[Dict[str, Any]]) -> str:
+    if not events:
+        return "unknown"
+    return {"queued": "queued", "message": "completed", "error": "failed"}.get(events[-1]["type"], "running")
+
+
+async def run_chat_job(
+    orchestrator,
+    content: str,
+    publish: Callable[[Dict[str, Any]], Awaitable[Any]],
+    stream: bool = True,
+):
+    """
+    Runs one chat request through `orchestrator` (the same ReAct/MCP loop as the
+    inline endpoints), passing every event to `publish`. A failure is saved to the
+    session like the inline path does and published as an `error` event; a
+    cancellation is published as an `error` event too, then re-raised.
+    """
+    await publish({"type": "started"})
+    try:
+        async for event in orchestrator.run(content, stream=stream):
+            await publish(event)
+    except Exception as e:
+        print(f"Critical Error in chat job: {e}")
+        await orchestrator.save_error(e)
+        await publish({"type": "error", "detail": str(e)})
+    except BaseException:
+        # Cancelled (arq job timeout, worker shutdown): followers still need a final event
+        print("Chat job was cancelled before it finished")
+        await publish({"type": "error", "detail": "The chat job was cancelled or timed out before it finished."})
+        raise
+
+
+class ChatJobQueue:
+    """
+    Chat requests run by the arq worker instead of the API process. enqueue() saves
+    who owns the job and queues it; the worker publishes the job's events (the
+    ChatOrchestrator events plus `queued`, `started` and `error`), numbered by `seq`,
+    to a Redis list, kept for `events_ttl_seconds` so polling and late subscribers
+    can catch up, and to a pub/sub channel for live followers.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        key_prefix: str = "chatjob:",
+        events_ttl_seconds: int = 3600,
+        heartbeat_seconds: float = 15,
+        stream_tokens: bool = True,
+    ):
+        if aioredis is None or create_pool is None:
+            raise RuntimeError("The 'redis' and 'arq' packages are required for background chat jobs.")
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.events_ttl_seconds = events_ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stream_tokens = stream_tokens
+        self._redis = aioredis.from_url(redis_url)
+        self._arq = None
+
+    def _key(self, job_id: str, suffix: str) -> str:
+        return f"{self.key_prefix}{job_id}:{suffix}"
+
+    async def enqueue(
+        self,
+        session_id: int,
+        username: str,
+        content: str,
+        model_provider: str,
+        scope: Optional[str],
+        active_mcp_ids: Optional[List[str]],
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        meta_key = self._key(job_id, "meta")
+        await self._redis.hset(meta_key, mapping={"username": username, "session_id": str(session_id)})
+        await self._redis.expire(meta_key, self.events_ttl_seconds)
+        await self.publish(job_id, {"type": "queued"})
+        if self._arq is None:
+            self._arq = await create_pool(RedisSettings.from_dsn(self.redis_url))
+        await self._arq.enqueue_job(
+            CHAT_JOB_FUNCTION, job_id, session_id, username, content, model_provider, scope, active_mcp_ids,
+            _job_id=job_id,
+        )
+        return job_id
+
+    async def owner(self, job_id: str) -> Optional[Dict[str, str]]:
+        meta = await self._redis.hgetall(self._key(job_id, "meta"))
+        if not meta:
+            return None
+        return {key.decode(): value.decode() for key, value in meta.items()}
+
+    async def publish(self, job_id: str, event: Dict[str, Any]):
+        data = encode_event(event)
+        data["seq"] = await self._redis.incr(self._key(job_id, "seq")) - 1
+        encoded = json.dumps(data)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(self._key(job_id, "events"), encoded)
+            pipe.expire(self._key(job_id, "events"), self.events_ttl_seconds)
+            pipe.expire(self._key(job_id, "seq"), self.events_ttl_seconds)
+            pipe.publish(self._key(job_id, "channel"), encoded)
+            await pipe.execute()
+
+    async def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """The job's events from `seq` number `after` on."""
+        return [json.loads(item) for item in await self._redis.lrange(self._key(job_id, "events"), after, -1)]
+
+    async def follow(self, job_id: str, after: int = 0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the job's events from `after` on until it completes or fails, then
+        stops; yields None every `heartbeat_seconds` while nothing happens.
+        """
+        channel = self._key(job_id, "channel")
+        pubsub = self._redis.pubsub()
+        # Subscribe before reading the backlog so nothing falls between the two
+        await pubsub.subscribe(channel)
+        try:
+            next_seq = after
+            backlog = await self.events(job_id, next_seq)
+            while True:
+                for event in backlog:
+                    if event["seq"] < next_seq:
+                        continue
+                    yield event
+                    next_seq = event["seq"] + 1
+                    if event["type"] in TERMINAL_EVENTS:
+                        return
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.heartbeat_seconds)
+                if message is None:
+                    backlog = []
+                    yield None
+                    continue
+                event = json.loads(message["data"])
+                # A gap means messages were missed; the list has all of them
+                backlog = [event] if event["seq"] <= next_seq else await self.events(job_id, next_seq)
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def close(self):
+        if self._arq is not None:
+            await self._arq.aclose()
+            self._arq = None
+        await self._redis.aclose()
+
+
+_chat_job_queue: Optional[ChatJobQueue] = None
+
+
+def load_chat_jobs_config() -> Dict[str, Any]:
+    with open("config/config.yaml", "r") as f:
+        return yaml.safe_load(f).get("chat_jobs") or {}
+
+
+def chat_jobs_redis_url(jobs_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    The Redis both the API (enqueue, events) and the arq worker use for chat jobs:
+    `chat_jobs.redis_url`, else $REDIS_URL, else localhost.
+    """
+    if jobs_config is None:
+        jobs_config = load_chat_jobs_config()
+    return jobs_config.get("redis_url") or os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+def get_chat_job_queue() -> ChatJobQueue:
+    """
+    Process-wide queue built from the `chat_jobs` block of config.yaml (redis_url,
+    key_prefix, events_ttl_seconds, heartbeat_seconds, stream_tokens).
+    """
+    global _chat_job_queue
+    if _chat_job_queue is None:
+        jobs_config = load_chat_jobs_config()
+        _chat_job_queue = ChatJobQueue(
+            redis_url=chat_jobs_redis_url(jobs_config),
+            key_prefix=jobs_config.get("key_prefix", "chatjob:"),
+            events_ttl_seconds=jobs_config.get("events_ttl_seconds", 3600),
+            heartbeat_seconds=jobs_config.get("heartbeat_seconds", 15),
+            stream_tokens=jobs_config.get("stream_tokens", True),
+        )
+    return _chat_job_queue
+
+
+async def close_chat_job_queue():
+    global _chat_job_queue
+    if _chat_job_queue is not None:
+        queue, _chat_job_queue = _chat_job_queue, None
+        await queue.close()
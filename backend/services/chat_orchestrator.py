@@ -0,0 +1,281 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import ChatMessage as ChatMessageRow
+from models.mcp_connection import MCPConnection
+from models.query import ChatMessage
+from models.chat import ChatMessageDB
+from services.chat_history import ChatHistoryManager
+from services.chat_service import ChatService
+from services.db_manager import DbManager
+from services.llm_service import LLMService
+from services.mcp_client import McpClientService
+from services.mcp_tools import ToolIndex, connection_config, get_tool_catalog
+from services.schema_retriever import question_from_history
+
+TOOL_CALL_PREFIX = "__TOOL_CALL__:"
+MAX_TURNS = 5
+
+
+class ChatTurnContext:
+    """
+    A session's messages for one chat request: the stored history, loaded once, plus
+    the messages the request adds (question, tool calls, observations, answer), kept
+    in memory until flush() saves the pending ones in one transaction.
+    """
+
+    def __init__(self, chat_service: ChatService, session_id: int):
+        self.chat_service = chat_service
+        self.session_id = session_id
+        self.history: List[ChatMessageRow] = []
+        self.pending: List[ChatMessageRow] = []
+
+    async def load(self):
+        self.history = list(await self.chat_service.get_session_messages(session_id=self.session_id))
+
+    @property
+    def messages(self) -> List[ChatMessageRow]:
+        return self.history + self.pending
+
+    def add(self, role: str, content: str, query: Optional[str] = None) -> ChatMessageRow:
+        message = ChatMessageRow(session_id=self.session_id, role=role, content=content, query=query)
+        self.pending.append(message)
+        return message
+
+    async def flush(self) -> List[ChatMessageRow]:
+        pending, self.pending = self.pending, []
+        saved = await self.chat_service.add_messages(pending)
+        self.history.extend(saved)
+        return saved
+
+
+class ChatOrchestrator:
+    """
+    Runs one chat request for a session: saves the user message, loads the active
+    MCP tools, then loops model turns (ReAct) until the model answers or MAX_TURNS
+    is reached; the tool calls of one turn run concurrently. History and schema are
+    loaded once and messages go through the in-memory ChatTurnContext: the question
+    is saved before the first model call, each tool turn (call and observation) in
+    one transaction once it has run, and the answer at the end. Anything still
+    pending is saved if the request fails or the client goes away.
+
+    run() yields events, so the blocking endpoint and the SSE endpoint share it:
+        {"type": "turn", "turn": n}
+        {"type": "token", "delta": "..."}            (streaming only)
+        {"type": "tool_call_start", "tool": ..., "args": {...}, "index": i}
+        {"type": "tool_call_end", "tool": ..., "ok": bool, "output_chars": n, "index": i}
+        {"type": "query", "query": "..."}
+        {"type": "message", "message": ChatMessageDB}   (the saved final response)
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        session,
+        username: str,
+        model_provider: str = "gemini",
+        scope: Optional[str] = None,
+        active_mcp_ids: Optional[List[str]] = None,
+    ):
+        self.db = db
+        self.session = session
+        self.username = username
+        self.model_provider = model_provider
+        self.scope = scope
+        self.active_mcp_ids = active_mcp_ids or []
+        self.chat_service = ChatService(db)
+        self.llm_service = LLMService()
+        self.db_manager = DbManager()
+        self.mcp_client = McpClientService()
+        self.history_manager = ChatHistoryManager(
+            self.llm_service.config, self.chat_service.update_session_summary, self.llm_service.summarize_history
+        )
+        self.tools: List[Dict[str, Any]] = []
+        self.active_connections: List[MCPConnection] = []
+        self.tool_index = ToolIndex()
+        tool_calls = self.llm_service.config.get("tool_calls") or {}
+        self.tool_call_timeout = tool_calls.get("timeout_seconds", 60)
+        self.max_parallel_tool_calls = tool_calls.get("max_per_turn", 8)
+        self.context: Optional[ChatTurnContext] = None
+
+    async def run(self, content: str, stream: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        self.context = ChatTurnContext(self.chat_service, self.session.id)
+        await self.context.load()
+        self.context.add(role="user", content=content)
+        # Saved before any model call, so a killed process still keeps the question
+        await self.context.flush()
+        try:
+            await self._load_tools()
+            # Observations are not questions, so the pruned schema holds for every turn
+            schema, db_engine = await self._schema_for(question_from_history(self.context.messages))
+
+            final_response_message = None
+            for turn in range(1, MAX_TURNS + 1):
+                print(f"--- Turn {turn}/{MAX_TURNS} ---")
+                yield {"type": "turn", "turn": turn}
+
+                # Bounded by the provider's history budget; older turns come back as a summary
+                context_messages = await self.history_manager.build_context(
+                    self.session, self.context.messages, self.model_provider
+                )
+
+                print(f"Calling LLM: {self.model_provider} with {len(context_messages)} messages...")
+                request = dict(
+                    db_id=self.session.db_id,
+                    provider=self.model_provider,
+                    messages=context_messages,
+                    schema=schema,
+                    engine=db_engine,
+                    tools=self.tools if self.tools else None,
+                )
+                if stream:
+                    response_message = None
+                    async for event in self.llm_service.stream_response_from_messages(**request):
+                        if event["type"] == "token":
+                            yield event
+                        else:
+                            response_message = event["message"]
+                else:
+                    response_message = await self.llm_service.generate_response_from_messages(**request)
+                print(f"LLM Response Received. Content len: {len(response_message.content) if response_message.content else 0}")
+
+                if response_message.query and response_message.query.startswith(TOOL_CALL_PREFIX):
+                    async for event in self._run_tool_call(response_message):
+                        yield event
+                    # One transaction per tool turn (call + observation)
+                    await self.context.flush()
+                    # Loop continues
+                    continue
+
+                # Final response (or just a question/SQL query)
+                print("Model provided final response or SQL.")
+                if response_message.query:
+                    print(f"Generated SQL/Command: {response_message.query}")
+                    yield {"type": "query", "query": response_message.query}
+                final_response_message = response_message
+                break
+
+            if not final_response_message:
+                final_response_message = ChatMessage(role="assistant", content="I stopped processing after too many tool calls.")
+
+            self.context.add(
+                role=final_response_message.role,
+                content=final_response_message.content,
+                query=final_response_message.query,
+            )
+            saved_response = (await self.context.flush())[-1]
+        finally:
+            if self.context.pending:
+                await self._flush_partial()
+        yield {"type": "message", "message": ChatMessageDB.model_validate(saved_response, from_attributes=True)}
+
+    async def _flush_partial(self):
+        # The request failed or was abandoned: keep the question and the turns so far
+        try:
+            saved = await self.context.flush()
+            print(f"Saved {len(saved)} messages of an unfinished request in session {self.session.id}")
+        except Exception as e:
+            print(f"Failed to save messages of an unfinished request in session {self.session.id}: {e}")
+
+    async def save_error(self, error: Exception):
+        await self.chat_service.add_message(session_id=self.session.id, role="assistant", content=f"Error: {str(error)}")
+
+    async def _load_tools(self):
+        if not self.active_mcp_ids:
+            return
+        # IDs may arrive as one comma-separated value (frontend quirk) or repeated params
+        ids_to_fetch = []
+        for id_val in self.active_mcp_ids:
+            ids_to_fetch.extend(id_val.split(","))
+
+        stmt = select(MCPConnection).where(MCPConnection.id.in_(ids_to_fetch), MCPConnection.user_id == self.username)
+        result = await self.db.execute(stmt)
+        self.active_connections = result.scalars().all()
+
+        # Cached per connection; misses are fetched concurrently
+        self.tool_index = await get_tool_catalog().load(self.mcp_client, self.active_connections)
+        self.tools = self.tool_index.tools
+
+    async def _schema_for(self, question: str):
+        if self.scope == "all":
+            # Multi-DB Mode: Scoped to the SAME ENGINE as the current session DB
+            try:
+                current_engine = self.db_manager.get_db_engine(self.session.db_id)
+                schema = await self.db_manager.get_all_schemas_for_prompt(engine_filter=current_engine, question=question)
+            except Exception as e:
+                # Fallback if session DB is invalid or "ALL" legacy
+                print(f"Warning: Could not determine engine for scoping: {e}")
+                schema = await self.db_manager.get_all_schemas_for_prompt(question=question)  # Fallback to everything
+            return schema, "multi-db"  # Triggers routing prompt
+        if self.session.db_id == "ALL":
+            # Legacy handling for sessions created with ALL
+            return await self.db_manager.get_all_schemas_for_prompt(question=question), "multi-db"
+        schema = await self.db_manager.get_schema_for_prompt(self.session.db_id, question=question)
+        return schema, self.db_manager.get_db_engine(self.session.db_id)
+
+    async def _run_tool_call(self, response_message: ChatMessage) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            payload = json.loads(response_message.query[len(TOOL_CALL_PREFIX):])
+            calls = [(call["tool"], call["args"]) for call in payload.get("calls") or [payload]]
+        except Exception as e:
+            print(f"Error parsing/executing tool call: {e}")
+            self.context.add(role="user", content=f"Observation: Error executing tool: {str(e)}")
+            return
+
+        skipped = calls[self.max_parallel_tool_calls:]
+        calls = calls[:self.max_parallel_tool_calls]
+        for index, (tool_name, tool_args) in enumerate(calls):
+            print(f"Model executing MCP Tool: {tool_name} with args: {tool_args}")
+            yield {"type": "tool_call_start", "tool": tool_name, "args": tool_args, "index": index}
+
+        # Record the "Thought/Action" from assistant
+        names = ", ".join(tool_name for tool_name, _ in calls)
+        self.context.add(role="assistant", content=response_message.content, query=f"Executing tool: {names}")
+
+        # Independent calls of one turn run concurrently; observations go back together
+        results = await asyncio.gather(*(self._execute_tool(tool_name, tool_args) for tool_name, tool_args in calls))
+
+        # Record Tool Result
+        if len(calls) == 1 and not skipped:
+            observation = f"Observation: {results[0][0]}"
+        else:
+            lines = [f"[{i + 1}] {tool_name}: {result}" for i, ((tool_name, _), (result, _)) in enumerate(zip(calls, results))]
+            lines += [f"[skipped] {tool_name}: not run, at most {self.max_parallel_tool_calls} tool calls per turn" for tool_name, _ in skipped]
+            observation = f"Observation: Results of {len(calls)} tool calls:\n" + "\n".join(lines)
+        self.context.add(role="user", content=observation)
+        for index, ((tool_name, _), (tool_result, ok)) in enumerate(zip(calls, results)):
+            yield {"type": "tool_call_end", "tool": tool_name, "ok": ok, "output_chars": len(tool_result), "index": index}
+
+    async def _execute_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> Tuple[str, bool]:
+        # Route the call to the connection that owns the tool
+        route = self.tool_index.resolve(tool_name)
+        if route is None:
+            print(f"Tool {tool_name} is not offered by any active connection")
+            return f"Error: Tool {tool_name} not found or failed execution.", False
+        conn = route.connection
+        try:
+            print(f"Sending tool call to connection: {conn.name} ({conn.url})")
+            res = await asyncio.wait_for(
+                self.mcp_client.call_tool(
+                    connection_config=connection_config(conn),
+                    tool_name=route.tool_name,
+                    arguments=tool_args,
+                    headers=conn.headers,
+                    connection_id=conn.id
+                ),
+                self.tool_call_timeout,
+            )
+            print(f"Tool executed successfully. Output len: {len(str(res))}")
+            return f"Tool Output: {res}", True
+        except asyncio.TimeoutError:
+            print(f"Tool {tool_name} on {conn.name} timed out after {self.tool_call_timeout}s")
+            return f"Error: Tool {tool_name} timed out after {self.tool_call_timeout}s.", False
+        except Exception as exc:
+            print(f"Tool execution failed on {conn.name}: {exc}")
+            # The catalog may be stale (tool renamed or removed); refetch next time
+            get_tool_catalog().invalidate_connection(conn.id)
+            return f"Error: Tool {tool_name} not found or failed execution.", False
@@ -104,6 +104,19 @@ class ChatService:
         )
         return result.scalars().first()
 
+    async def get_session_by_id(self, session_id: int) -> Optional[ChatSession]:
+        """Unscoped lookup for background work that has already been authorized."""
+        return await self.db.get(ChatSession, session_id)
+
+    async def update_session_summary(self, session_id: int, summary: str, through_message_id: int) -> bool:
+        result = await self.db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(history_summary=summary, summary_through_id=through_message_id)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+
     async def add_message(self, session_id: int, role: str, content: str, query: str = None, chart_config: Dict = None) -> ChatMessage:
         # We don't verify session ownership here implicitly, ensuring caller does or FK constraint handles it (if we trust session_id)
         # But for safety/integrity, we assume session_id is valid.
@@ -120,6 +133,22 @@ class ChatService:
         await self.db.refresh(message)
         return message
 
+    async def add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        """
+        Saves several new (unsaved) messages in one transaction, then reloads them with
+        one query (for ids and server-side created_at) instead of a refresh per row.
+        """
+        if not messages:
+            return []
+        self.db.add_all(messages)
+        await self.db.flush()
+        ids = [message.id for message in messages]
+        await self.db.commit()
+        result = await self.db.execute(
+            select(ChatMessage).where(ChatMessage.id.in_(ids)).order_by(ChatMessage.id.asc())
+        )
+        return result.scalars().all()
+
     async def get_session_messages(self, session_id: int) -> List[ChatMessage]:
         result = await self.db.execute(
             select(ChatMessage).where(ChatMessage.session_id == session_id).order_by(ChatMessage.id.asc())
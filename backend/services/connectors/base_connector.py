@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator
 
 
 class BaseConnector(ABC):
@@ -34,6 +34,20 @@ class BaseConnector(ABC):
         """
         pass
 
+    def format_schema_for_prompt(self, schema: List[Dict[str, Any]]) -> str:
+        """
+        Render a schema previously returned by get_schema() into the LLM prompt format,
+        without going back to the database.
+        """
+        raise NotImplementedError
+
+    async def get_schema_fingerprint(self) -> Optional[str]:
+        """
+        Return a cheap token that changes whenever the schema changes.
+        Engines without such a signal return None and are refreshed by TTL only.
+        """
+        return None
+
     @abstractmethod
     async def get_sample_data(self, object_name: str) -> Dict[str, Any]:
         """
@@ -48,6 +62,41 @@ class BaseConnector(ABC):
         """
         pass
 
+    # True when execute_query_stream holds a real server-side cursor, so a paginated
+    # result can keep the generator open between pages.
+    supports_server_cursors = False
+
+    def paginate_query(self, query: str, offset: int, limit: int) -> Optional[str]:
+        """
+        Returns `query` rewritten to fetch `limit` rows starting at `offset`, for
+        stateless pagination, or None if this engine can't page the query.
+        """
+        return None
+
+    async def execute_query_stream(self, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a query and yield its results in batches instead of materializing them.
+
+        Row-oriented engines yield {"columns": [...], "rows": [tuple, ...]} (at least one
+        batch, possibly with no rows); document engines yield {"json_result": [...]}.
+        Statements that return no rows yield a single execute_query-style status dict.
+
+        This default buffers the full execute_query result and slices it; connectors
+        with server-side cursors override it so memory stays flat.
+        """
+        result = await self.execute_query(query)
+        if result.get("columns") is not None and "rows" in result:
+            columns = result["columns"]
+            rows = [tuple(row.get(col) for col in columns) for row in result["rows"]]
+            for start in range(0, max(len(rows), 1), batch_size):
+                yield {"columns": columns, "rows": rows[start:start + batch_size]}
+        elif isinstance(result.get("json_result"), list):
+            docs = result["json_result"]
+            for start in range(0, max(len(docs), 1), batch_size):
+                yield {"json_result": docs[start:start + batch_size]}
+        else:
+            yield result
+
     @abstractmethod
     def is_mutation(self, query: str) -> bool:
         """
@@ -55,3 +104,10 @@ class BaseConnector(ABC):
         This is a security measure.
         """
         pass
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Return connection pool metrics (size, idle connections, acquire waits).
+        Connectors that do not keep a pool return None.
+        """
+        return None
@@ -1,6 +1,7 @@
 import motor.motor_asyncio
 import json
-from typing import List, Dict, Any
+import hashlib
+from typing import List, Dict, Any, Optional, AsyncIterator
 from .base_connector import BaseConnector
 
 class MongoConnector(BaseConnector):
@@ -39,8 +40,17 @@ class MongoConnector(BaseConnector):
             })
         return schema_data
 
+    async def get_schema_fingerprint(self) -> Optional[str]:
+        # Field lists come from sampled documents, so only the collection set is
+        # versioned here; field drift within a collection is picked up by TTL.
+        await self.connect()
+        collections = sorted(await self.db.list_collection_names())
+        return hashlib.md5("\n".join(collections).encode()).hexdigest()
+
     async def get_schema_for_prompt(self) -> str:
-        schema_list = await self.get_schema()
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema_list: List[Dict[str, Any]]) -> str:
         prompt_str = "MongoDB Collections and Fields:\n"
         for coll in schema_list:
             prompt_str += f"- Collection: '{coll['name']}', Fields: {', '.join(coll['fields'])}\n"
@@ -62,7 +72,7 @@ class MongoConnector(BaseConnector):
         Expects query to be a JSON string.
         Supported operations:
         - {"collection": "...", "filter": ...}  (Defaults to find)
-        - {"collection": "...", "operation": "find", "filter": ...}
+        - {"collection": "...", "operation": "find", "filter": ..., "skip": n, "limit": n}
         - {"collection": "...", "operation": "insert_one", "data": ...}
         - {"collection": "...", "operation": "insert_many", "data": [...]}
         - {"collection": "...", "operation": "update_one", "filter": ..., "update": ...}
@@ -87,8 +97,9 @@ class MongoConnector(BaseConnector):
             
             if operation == "find":
                 filter_obj = query_data.get("filter", {})
-                cursor = coll.find(filter_obj).limit(100)
-                results = await cursor.to_list(length=100)
+                limit = int(query_data.get("limit") or 100)
+                cursor = coll.find(filter_obj).skip(int(query_data.get("skip") or 0)).limit(limit)
+                results = await cursor.to_list(length=limit)
                 for doc in results:
                     if "_id" in doc:
                         doc["_id"] = str(doc["_id"])
@@ -129,7 +140,7 @@ class MongoConnector(BaseConnector):
                 if not pipeline or not isinstance(pipeline, list):
                     return {"error": "Pipeline must be a list for aggregate"}
                 cursor = coll.aggregate(pipeline)
-                results = await cursor.to_list(length=100)
+                results = await cursor.to_list(length=int(query_data.get("limit") or 100))
                 for doc in results:
                     if "_id" in doc:
                         doc["_id"] = str(doc["_id"])
@@ -151,6 +162,72 @@ class MongoConnector(BaseConnector):
         except Exception as e:
             raise RuntimeError(f"MongoDB query failed: {e}")
 
+    async def execute_query_stream(self, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams find/aggregate results through a server-side batch cursor, without the
+        100-document cap of execute_query. Other operations fall back to execute_query.
+        """
+        try:
+            query_data = json.loads(query)
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"MongoDB query failed: {e}")
+
+        operation = query_data.get("operation", "find")
+        if operation not in ("find", "aggregate") or not query_data.get("collection"):
+            async for batch in super().execute_query_stream(query, batch_size):
+                yield batch
+            return
+
+        await self.connect()
+        coll = self.db[query_data["collection"]]
+        try:
+            if operation == "find":
+                cursor = coll.find(query_data.get("filter", {})).skip(int(query_data.get("skip") or 0))
+                if query_data.get("limit"):
+                    cursor = cursor.limit(int(query_data["limit"]))
+                cursor = cursor.batch_size(batch_size)
+            else:
+                pipeline = query_data.get("pipeline")
+                if not pipeline or not isinstance(pipeline, list):
+                    raise ValueError("Pipeline must be a list for aggregate")
+                cursor = coll.aggregate(pipeline, batchSize=batch_size)
+
+            yielded = False
+            try:
+                while True:
+                    docs = await cursor.to_list(length=batch_size)
+                    if not docs:
+                        break
+                    for doc in docs:
+                        if "_id" in doc:
+                            doc["_id"] = str(doc["_id"])
+                    yielded = True
+                    yield {"json_result": docs}
+            finally:
+                await cursor.close()
+            if not yielded:
+                yield {"json_result": []}
+        except Exception as e:
+            raise RuntimeError(f"MongoDB query failed: {e}")
+
+    supports_server_cursors = True
+
+    def paginate_query(self, query: str, offset: int, limit: int) -> Optional[str]:
+        try:
+            query_data = json.loads(query)
+        except json.JSONDecodeError:
+            return None
+        operation = query_data.get("operation", "find")
+        if operation == "find":
+            query_data["skip"] = offset
+            query_data["limit"] = limit
+        elif operation == "aggregate" and isinstance(query_data.get("pipeline"), list):
+            query_data["pipeline"] = query_data["pipeline"] + [{"$skip": offset}, {"$limit": limit}]
+            query_data["limit"] = limit
+        else:
+            return None
+        return json.dumps(query_data)
+
     def is_mutation(self, query: str) -> bool:
         try:
             query_data = json.loads(query)
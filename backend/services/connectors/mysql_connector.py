@@ -1,109 +1,195 @@
-# Note: To use this, you'll need to `uv pip install PyMySQL`
+# Note: To use this, you'll need to `uv pip install aiomysql` (it pulls in PyMySQL)
+import asyncio
+import hashlib
+import time
+import aiomysql
 import pymysql
-import pymysql.cursors
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, AsyncIterator
 
 from .base_connector import BaseConnector
+from .sql_paging import wrap_limit_offset
+from .pool_metrics import PoolMetrics
+from .sql_schema import assemble_sql_schema
 
 class MySqlConnector(BaseConnector):
-    
+    """
+    MySQL connector backed by a persistent aiomysql pool.
+
+    Pool sizing is read from the optional `pool` block of the database entry in
+    config.yaml (min_size, max_size, recycle_seconds, ping_interval, acquire_timeout).
+    """
+
     def __init__(self, db_config: Dict[str, Any]):
         super().__init__(db_config)
-        self.conn = None
+        pool_config = db_config.get("pool") or {}
+        self.min_size = pool_config.get("min_size", 1)
+        self.max_size = pool_config.get("max_size", 10)
+        # Connections idle for longer than this are closed instead of reused
+        self.recycle_seconds = pool_config.get("recycle_seconds", 300)
+        # Connections idle for longer than this are pinged before being handed out
+        self.ping_interval = pool_config.get("ping_interval", 30)
+        self.acquire_timeout = pool_config.get("acquire_timeout", 30)
+
+        self.pool: Optional[aiomysql.Pool] = None
+        self.metrics = PoolMetrics()
+        self.failed_pings = 0
+        self._pool_loop = None
+        self._pool_lock = None
 
     async def connect(self):
-        if not self.conn:
+        # aiomysql pools are tied to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self.pool = None
+            self._pool_loop = loop
+            self._pool_lock = asyncio.Lock()
+
+        if self.pool is not None:
+            return
+
+        async with self._pool_lock:
+            if self.pool is not None:
+                return
             try:
-                self.conn = pymysql.connect(
+                self.pool = await aiomysql.create_pool(
                     host=self.db_config['host'],
                     user=self.db_config['user'],
                     password=self.db_config['password'],
-                    database=self.db_config['dbname'],
+                    db=self.db_config['dbname'],
                     port=self.db_config.get('port', 3306),
-                    cursorclass=pymysql.cursors.DictCursor
+                    minsize=self.min_size,
+                    maxsize=self.max_size,
+                    pool_recycle=self.recycle_seconds,
+                    cursorclass=aiomysql.DictCursor,
+                    autocommit=False,
                 )
-            except pymysql.MySQLError as e:
+            except (OSError, pymysql.MySQLError) as e:
                 raise ConnectionError(f"Failed to connect to MySQL: {e}")
 
     async def disconnect(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
 
-    async def get_schema(self) -> List[Dict[str, Any]]:
+    @asynccontextmanager
+    async def _acquire(self):
+        """
+        Check a connection out of the pool. Connections that sat idle longer than
+        `ping_interval` are health-checked (and transparently reconnected) first.
+        """
         await self.connect()
-        schema_data = []
+        started = time.perf_counter()
         try:
-            with self.conn.cursor() as cursor:
-                db_name = self.db_config['dbname']
-                cursor.execute("SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = %s", (db_name,))
-                tables = cursor.fetchall()
-                for table in tables:
-                    # Normalize keys to lowercase to handle potential case differences
-                    table_lower = {k.lower(): v for k, v in table.items()}
-                    t_name = table_lower.get('table_name')
-                    t_type = table_lower.get('table_type')
-                    
-                    cursor.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s AND table_schema = %s", (t_name, db_name))
-                    columns = cursor.fetchall()
-
-                    # Fetch Constraints (PK, FK)
-                    cursor.execute("""
-                        SELECT 
-                            k.column_name, 
-                            t.constraint_type, 
-                            k.referenced_table_name, 
-                            k.referenced_column_name 
-                        FROM information_schema.table_constraints t 
-                        JOIN information_schema.key_column_usage k 
-                        USING (constraint_name, table_schema, table_name) 
-                        WHERE t.table_schema = %s AND t.table_name = %s
-                    """, (db_name, t_name))
-                    constraints = cursor.fetchall()
-                    
-                    # Map column constraints
-                    col_details = {} # column_name -> "PK" or "FK -> table.col"
-                    
-                    for c in constraints:
-                         # Normalize keys if needed (DictCursor returns sensitive keys usually?)
-                         # Re-normalize to be safe
-                         c_lower = {k.lower(): v for k,v in c.items()}
-                         c_col = c_lower['column_name']
-                         c_type = c_lower['constraint_type']
-                         
-                         if c_type == 'PRIMARY KEY':
-                              col_details[c_col] = "PK"
-                         elif c_type == 'FOREIGN KEY':
-                              ref_table = c_lower['referenced_table_name']
-                              ref_col = c_lower['referenced_column_name']
-                              col_details[c_col] = f"FK -> {ref_table}.{ref_col}"
-                    
-                    cols_processed = []
-                    for col in columns:
-                         col_lower = {k.lower(): v for k, v in col.items()}
-                         c_name = col_lower['column_name']
-                         c_type = col_lower['data_type']
-                         
-                         # Add constraint info if exists
-                         extra_info = col_details.get(c_name, "")
-                         
-                         cols_processed.append({
-                             "name": c_name, 
-                             "type": c_type,
-                             "extra": extra_info
-                         })
-
-                    schema_data.append({
-                        "name": t_name,
-                        "type": "view" if t_type == 'VIEW' else "table",
-                        "columns": cols_processed
-                    })
+            conn = await asyncio.wait_for(self.pool.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.record_timeout()
+            raise ConnectionError(
+                f"Timed out after {self.acquire_timeout}s waiting for a MySQL connection from the pool."
+            )
+        self.metrics.record_acquire((time.perf_counter() - started) * 1000)
+        try:
+            if self._pool_loop.time() - conn.last_usage > self.ping_interval:
+                try:
+                    await conn.ping(reconnect=True)
+                except pymysql.MySQLError as e:
+                    self.failed_pings += 1
+                    raise ConnectionError(f"MySQL connection failed health check: {e}")
+            yield conn
         finally:
-            await self.disconnect()
-        return schema_data
+            self.metrics.record_release()
+            self.pool.release(conn)
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        stats = self.metrics.snapshot()
+        stats.update({
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "recycle_seconds": self.recycle_seconds,
+            "size": self.pool.size if self.pool else 0,
+            "idle": self.pool.freesize if self.pool else 0,
+            "failed_pings": self.failed_pings,
+        })
+        return stats
+
+    # Introspection runs a constant number of grouped information_schema scans
+    # regardless of table count; assemble_sql_schema stitches them together.
+    _TABLES_SQL = """
+        SELECT table_name AS table_name, table_type AS table_type
+        FROM information_schema.tables
+        WHERE table_schema = %s
+        ORDER BY table_name
+    """
+
+    _COLUMNS_SQL = """
+        SELECT table_name AS table_name, column_name AS column_name, data_type AS data_type
+        FROM information_schema.columns
+        WHERE table_schema = %s
+        ORDER BY table_name, ordinal_position
+    """
+
+    _CONSTRAINTS_SQL = """
+        SELECT
+            k.table_name AS table_name,
+            k.column_name AS column_name,
+            t.constraint_type AS constraint_type,
+            k.referenced_table_name AS referenced_table_name,
+            k.referenced_column_name AS referenced_column_name
+        FROM information_schema.table_constraints t
+        JOIN information_schema.key_column_usage k
+        USING (constraint_name, table_schema, table_name)
+        WHERE t.table_schema = %s
+          AND t.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+    """
+
+    async def get_schema(self) -> List[Dict[str, Any]]:
+        db_name = self.db_config['dbname']
+        async with self._acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(self._TABLES_SQL, (db_name,))
+                tables = await cursor.fetchall()
+                await cursor.execute(self._COLUMNS_SQL, (db_name,))
+                columns = await cursor.fetchall()
+                await cursor.execute(self._CONSTRAINTS_SQL, (db_name,))
+                constraints = await cursor.fetchall()
+            # End the read snapshot so the pooled connection doesn't hold it open
+            await conn.commit()
+        return assemble_sql_schema(tables, columns, constraints)
+
+    async def get_schema_fingerprint(self) -> Optional[str]:
+        """
+        Hashes per-table CREATE_TIME (bumped by table-rebuilding ALTERs) together with a
+        checksum over column definitions (catches INSTANT ALTERs, which keep CREATE_TIME).
+        UPDATE_TIME is left out on purpose: it moves on every DML statement, not DDL.
+        """
+        db_name = self.db_config['dbname']
+        async with self._acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT table_name AS table_name, create_time AS create_time "
+                    "FROM information_schema.tables WHERE table_schema = %s ORDER BY table_name",
+                    (db_name,),
+                )
+                tables = await cursor.fetchall()
+                await cursor.execute(
+                    "SELECT COUNT(*) AS column_count, "
+                    "SUM(CRC32(CONCAT_WS(':', table_name, column_name, column_type, column_key))) AS column_checksum "
+                    "FROM information_schema.columns WHERE table_schema = %s",
+                    (db_name,),
+                )
+                columns = await cursor.fetchone()
+            await conn.commit()
+        digest = hashlib.md5()
+        for table in tables:
+            digest.update(f"{table['table_name']}:{table['create_time']};".encode())
+        digest.update(f"{columns['column_count']}:{columns['column_checksum']}".encode())
+        return digest.hexdigest()
 
     async def get_schema_for_prompt(self) -> str:
-        schema_list = await self.get_schema()
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema_list: List[Dict[str, Any]]) -> str:
         prompt_str = ""
         for table in schema_list:
             columns_str = ", ".join([
@@ -114,37 +200,72 @@ class MySqlConnector(BaseConnector):
         return prompt_str.strip()
 
     async def get_sample_data(self, table_name: str) -> Dict[str, Any]:
-        await self.connect()
-        try:
-            with self.conn.cursor() as cursor:
+        async with self._acquire() as conn:
+            async with conn.cursor() as cursor:
                 # Note: MySQL uses ` for identifiers
-                cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 10")
-                rows = cursor.fetchall()
+                await cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 10")
+                rows = await cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
-                return {"columns": columns, "rows": rows}
-        finally:
-            await self.disconnect()
+            await conn.commit()
+            return {"columns": columns, "rows": rows}
 
     async def execute_query(self, query: str) -> Dict[str, Any]:
-        await self.connect()
-        try:
-            with self.conn.cursor() as cursor:
-                rows_affected = cursor.execute(query)
-                if cursor.description:
-                    columns = [desc[0] for desc in cursor.description]
-                    rows = cursor.fetchall()
-                    self.conn.commit()
-                    return {"columns": columns, "rows": rows, "rows_affected": len(rows)}
-                else:
-                    self.conn.commit()
-                    return {"rows_affected": rows_affected, "message": "Query executed successfully."}
-        except pymysql.MySQLError as e:
-            self.conn.rollback()
-            raise RuntimeError(f"Query execution failed: {e}")
-        finally:
-            await self.disconnect()
+        async with self._acquire() as conn:
+            try:
+                async with conn.cursor() as cursor:
+                    rows_affected = await cursor.execute(query)
+                    if cursor.description:
+                        columns = [desc[0] for desc in cursor.description]
+                        rows = await cursor.fetchall()
+                        await conn.commit()
+                        return {"columns": columns, "rows": rows, "rows_affected": len(rows)}
+                    else:
+                        await conn.commit()
+                        return {"rows_affected": rows_affected, "message": "Query executed successfully."}
+            except pymysql.MySQLError as e:
+                await conn.rollback()
+                raise RuntimeError(f"Query execution failed: {e}")
+
+    async def execute_query_stream(self, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        async with self._acquire() as conn:
+            # SSCursor is unbuffered: rows stay on the server until fetched
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            finished = False
+            try:
+                await cursor.execute(query)
+                if not cursor.description:
+                    await conn.commit()
+                    finished = True
+                    yield {"rows_affected": cursor.rowcount, "message": "Query executed successfully."}
+                    return
+
+                columns = [desc[0] for desc in cursor.description]
+                yielded = False
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yielded = True
+                    yield {"columns": columns, "rows": list(rows)}
+                if not yielded:
+                    yield {"columns": columns, "rows": []}
+                await cursor.close()
+                await conn.commit()
+                finished = True
+            except pymysql.MySQLError as e:
+                raise RuntimeError(f"Query execution failed: {e}")
+            finally:
+                if not finished:
+                    # Closing an unbuffered cursor drains every remaining row; dropping
+                    # the connection is far cheaper. The pool discards closed connections.
+                    conn.close()
+
+    supports_server_cursors = True
+
+    def paginate_query(self, query: str, offset: int, limit: int) -> Optional[str]:
+        return wrap_limit_offset(query, offset, limit)
 
     def is_mutation(self, query: str) -> bool:
         query_normalized = query.strip().upper()
         mutation_keywords = ["INSERT", "UPDATE", "DELETE", "DROP", "CREATE", "ALTER", "TRUNCATE"]
-        return any(query_normalized.startswith(keyword) for keyword in mutation_keywords)
\ No newline at end of file
+        return any(query_normalized.startswith(keyword) for keyword in mutation_keywords)
@@ -0,0 +1,38 @@
+from typing import Dict, Any
+
+
+class PoolMetrics:
+    """Counters describing how long callers wait to check out a pooled connection."""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.last_wait_ms = 0.0
+
+    def record_acquire(self, wait_ms: float):
+        self.acquisitions += 1
+        self.in_use += 1
+        self.total_wait_ms += wait_ms
+        self.last_wait_ms = wait_ms
+        if wait_ms > self.max_wait_ms:
+            self.max_wait_ms = wait_ms
+
+    def record_release(self):
+        self.in_use = max(0, self.in_use - 1)
+
+    def record_timeout(self):
+        self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        avg_wait = self.total_wait_ms / self.acquisitions if self.acquisitions else 0.0
+        return {
+            "acquisitions": self.acquisitions,
+            "acquire_timeouts": self.timeouts,
+            "in_use": self.in_use,
+            "avg_wait_ms": round(avg_wait, 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "last_wait_ms": round(self.last_wait_ms, 3),
+        }
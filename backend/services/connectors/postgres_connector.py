@@ -1,116 +1,183 @@
-import psycopg2
-import psycopg2.extras
-from typing import List, Dict, Any
+import asyncio
+import time
+import asyncpg
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import re
 
 from .base_connector import BaseConnector
+from .sql_paging import wrap_limit_offset
+from .pool_metrics import PoolMetrics
+from .sql_schema import assemble_sql_schema
 
 
 class PostgresConnector(BaseConnector):
+    """
+    PostgreSQL connector backed by a long-lived asyncpg pool.
+
+    Pool sizing is read from the optional `pool` block of the database entry in
+    config.yaml (min_size, max_size, max_idle_seconds, acquire_timeout, command_timeout).
+    Introspection covers the `schema` given in the config (default 'public').
+    """
 
     def __init__(self, db_config: Dict[str, Any]):
         super().__init__(db_config)
-        self.conn = None
+        self.schema_name = db_config.get("schema", "public")
+        pool_config = db_config.get("pool") or {}
+        self.min_size = pool_config.get("min_size", 1)
+        self.max_size = pool_config.get("max_size", 10)
+        self.max_idle_seconds = pool_config.get("max_idle_seconds", 300)
+        self.acquire_timeout = pool_config.get("acquire_timeout", 30)
+        self.command_timeout = pool_config.get("command_timeout", 60)
 
-    def _get_dsn(self):
-        return f"dbname='{self.db_config['dbname']}' user='{self.db_config['user']}' host='{self.db_config['host']}' password='{self.db_config['password']}' port='{self.db_config.get('port', 5432)}'"
+        self.pool: Optional[asyncpg.Pool] = None
+        self.metrics = PoolMetrics()
+        self._pool_loop = None
+        self._pool_lock = None
 
     async def connect(self):
-        if not self.conn or self.conn.closed:
+        # The pool is bound to the event loop it was created on, so scripts that
+        # call asyncio.run() more than once get a fresh pool per loop.
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self.pool = None
+            self._pool_loop = loop
+            self._pool_lock = asyncio.Lock()
+
+        if self.pool is not None:
+            return
+
+        async with self._pool_lock:
+            if self.pool is not None:
+                return
             try:
-                self.conn = psycopg2.connect(self._get_dsn())
-            except psycopg2.OperationalError as e:
+                self.pool = await asyncpg.create_pool(
+                    host=self.db_config["host"],
+                    port=self.db_config.get("port", 5432),
+                    user=self.db_config["user"],
+                    password=self.db_config["password"],
+                    database=self.db_config["dbname"],
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_inactive_connection_lifetime=self.max_idle_seconds,
+                    command_timeout=self.command_timeout,
+                )
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
                 raise ConnectionError(f"Failed to connect to PostgreSQL: {e}")
 
     async def disconnect(self):
-        if self.conn and not self.conn.closed:
-            self.conn.close()
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
 
-    async def get_schema(self) -> List[Dict[str, Any]]:
+    @asynccontextmanager
+    async def _acquire(self):
+        """Check a connection out of the pool, recording how long the caller waited."""
         await self.connect()
-        schema_data = []
+        started = time.perf_counter()
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                # Get tables and views
-                cur.execute(
-                    """
-                    SELECT table_name, table_type 
-                    FROM information_schema.tables 
-                    WHERE table_schema = 'public'
-                    ORDER BY table_name;
-                """
-                )
-                tables = cur.fetchall()
-                for table in tables:
-                    # Get columns for each table
-                    cur.execute(
-                        """
-                        SELECT column_name, data_type 
-                        FROM information_schema.columns 
-                        WHERE table_name = %s AND table_schema = 'public'
-                        ORDER BY ordinal_position;
-                    """,
-                        (table["table_name"],),
-                    )
-                    columns = cur.fetchall()
-                    # Fetch Constraints correctly for Postgres
-                    cur.execute(
-                        """
-                        SELECT 
-                            kcu.column_name, 
-                            tc.constraint_type, 
-                            ccu.table_name AS foreign_table_name,
-                            ccu.column_name AS foreign_column_name 
-                        FROM information_schema.table_constraints AS tc 
-                        JOIN information_schema.key_column_usage AS kcu
-                          ON tc.constraint_name = kcu.constraint_name
-                          AND tc.table_schema = kcu.table_schema
-                        LEFT JOIN information_schema.constraint_column_usage AS ccu
-                          ON ccu.constraint_name = tc.constraint_name
-                          AND ccu.table_schema = tc.table_schema
-                        WHERE tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY') 
-                          AND tc.table_name = %s
-                          AND tc.table_schema = 'public';
-                        """,
-                        (table["table_name"],)
-                    )
-                    constraints = cur.fetchall()
-                    
-                    col_details = {}
-                    for c in constraints:
-                         # psycopg2 DictRow access
-                         c_col = c["column_name"]
-                         c_type = c["constraint_type"]
-                         
-                         if c_type == 'PRIMARY KEY':
-                              col_details[c_col] = "PK"
-                         elif c_type == 'FOREIGN KEY':
-                              ref_table = c["foreign_table_name"]
-                              ref_col = c["foreign_column_name"]
-                              col_details[c_col] = f"FK -> {ref_table}.{ref_col}"
-
-                    schema_data.append(
-                        {
-                            "name": table["table_name"],
-                            "type": (
-                                "view" if table["table_type"] == "VIEW" else "table"
-                            ),
-                            "columns": [
-                                {
-                                    "name": col["column_name"], 
-                                    "type": col["data_type"],
-                                    "extra": col_details.get(col["column_name"], "")
-                                }
-                                for col in columns
-                            ],
-                        }
-                    )
+            conn = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.record_timeout()
+            raise ConnectionError(
+                f"Timed out after {self.acquire_timeout}s waiting for a PostgreSQL connection from the pool."
+            )
+        self.metrics.record_acquire((time.perf_counter() - started) * 1000)
+        try:
+            yield conn
         finally:
-            await self.disconnect()
-        return schema_data
+            self.metrics.record_release()
+            await self.pool.release(conn)
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        stats = self.metrics.snapshot()
+        stats.update(
+            {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "max_idle_seconds": self.max_idle_seconds,
+                "size": self.pool.get_size() if self.pool else 0,
+                "idle": self.pool.get_idle_size() if self.pool else 0,
+            }
+        )
+        return stats
+
+    # Introspection runs a constant number of catalog queries regardless of table
+    # count; the per-table structure is assembled in Python by assemble_sql_schema.
+    _TABLES_SQL = """
+        SELECT table_name, table_type
+        FROM information_schema.tables
+        WHERE table_schema = $1
+        ORDER BY table_name;
+    """
+
+    _COLUMNS_SQL = """
+        SELECT table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = $1
+        ORDER BY table_name, ordinal_position;
+    """
+
+    # unnest(conkey, confkey) pairs each key column with its referenced column;
+    # for primary keys confkey is NULL so the referenced side comes back NULL.
+    _CONSTRAINTS_SQL = """
+        SELECT
+            cl.relname AS table_name,
+            att.attname AS column_name,
+            CASE con.contype WHEN 'p' THEN 'PRIMARY KEY' ELSE 'FOREIGN KEY' END AS constraint_type,
+            fcl.relname AS referenced_table_name,
+            fatt.attname AS referenced_column_name
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_class cl ON cl.oid = con.conrelid
+        JOIN pg_catalog.pg_namespace ns ON ns.oid = cl.relnamespace
+        CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+        JOIN pg_catalog.pg_attribute att
+          ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+        LEFT JOIN pg_catalog.pg_class fcl ON fcl.oid = con.confrelid
+        LEFT JOIN pg_catalog.pg_attribute fatt
+          ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+        WHERE ns.nspname = $1
+          AND con.contype IN ('p', 'f');
+    """
+
+    async def get_schema(self) -> List[Dict[str, Any]]:
+        async with self._acquire() as conn:
+            tables = await conn.fetch(self._TABLES_SQL, self.schema_name)
+            columns = await conn.fetch(self._COLUMNS_SQL, self.schema_name)
+            constraints = await conn.fetch(self._CONSTRAINTS_SQL, self.schema_name)
+        return assemble_sql_schema(tables, columns, constraints)
+
+    # pg_class/pg_attribute/pg_constraint rows get a new xmin whenever DDL rewrites
+    # them (VACUUM/ANALYZE update pg_class in place and leave xmin alone), so
+    # hashing oid:xmin pairs gives a cheap schema version in one round-trip.
+    _FINGERPRINT_SQL = """
+        SELECT md5(
+            coalesce((SELECT string_agg(c.oid::text || ':' || c.xmin::text, ',' ORDER BY c.oid)
+                      FROM pg_catalog.pg_class c
+                      WHERE c.relnamespace = n.oid), '')
+            || '|' ||
+            coalesce((SELECT string_agg(a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text, ','
+                                        ORDER BY a.attrelid, a.attnum)
+                      FROM pg_catalog.pg_attribute a
+                      JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+                      WHERE c.relnamespace = n.oid AND a.attnum > 0), '')
+            || '|' ||
+            coalesce((SELECT string_agg(con.oid::text || ':' || con.xmin::text, ',' ORDER BY con.oid)
+                      FROM pg_catalog.pg_constraint con
+                      WHERE con.connamespace = n.oid), '')
+        )
+        FROM pg_catalog.pg_namespace n
+        WHERE n.nspname = $1;
+    """
+
+    async def get_schema_fingerprint(self) -> Optional[str]:
+        async with self._acquire() as conn:
+            return await conn.fetchval(self._FINGERPRINT_SQL, self.schema_name)
 
     async def get_schema_for_prompt(self) -> str:
-        schema_list = await self.get_schema()
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema_list: List[Dict[str, Any]]) -> str:
         prompt_str = ""
         for table in schema_list:
             columns_str = ", ".join(
@@ -122,58 +189,129 @@ class PostgresConnector(BaseConnector):
             prompt_str += f"Table {table['name']}: {columns_str}\n"
         return prompt_str.strip()
 
+    @staticmethod
+    def _quote_identifier(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
     async def get_sample_data(self, table_name: str) -> Dict[str, Any]:
-        await self.connect()
-        try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                # Use psycopg2's safe identifier composition
-                from psycopg2 import sql
+        async with self._acquire() as conn:
+            stmt = await conn.prepare(
+                f"SELECT * FROM {self._quote_identifier(table_name)} LIMIT 10"
+            )
+            records = await stmt.fetch()
+            columns = [attr.name for attr in stmt.get_attributes()]
+            rows = [dict(record) for record in records]
+            return {"columns": columns, "rows": rows}
 
-                query = sql.SQL("SELECT * FROM {table} LIMIT 10").format(
-                    table=sql.Identifier(table_name)
-                )
-                cur.execute(query)
+    @staticmethod
+    def _bind_named_params(query: str, params: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """
+        Rewrites `:name` placeholders into asyncpg's positional `$n` form.
+        Only names present in `params` are replaced, so `::casts` and literals are left alone.
+        """
+        args = []
+        for key, value in params.items():
+            pattern = rf"(?<![:\w]):{re.escape(key)}\b"
+            if re.search(pattern, query):
+                args.append(value)
+                query = re.sub(pattern, f"${len(args)}", query)
+        return query, args
 
-                columns = [desc for desc in cur.description]
-                rows = [dict(row) for row in cur.fetchall()]
-                return {"columns": columns, "rows": rows}
-        finally:
-            await self.disconnect()
+    @staticmethod
+    def _rows_from_status(status: str) -> int:
+        # Command tags look like "INSERT 0 3", "UPDATE 5" or "CREATE TABLE".
+        last = status.rsplit(" ", 1)[-1] if status else ""
+        return int(last) if last.isdigit() else -1
 
     async def execute_query(
         self, query: str, params: Dict[str, Any] = None
     ) -> Dict[str, Any]:
-        await self.connect()
-
+        args = []
         if params:
-            for key in params:
-                query = query.replace(f":{key}", f"%({key})s")
+            query, args = self._bind_named_params(query, params)
 
-        try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute(query, params)
-
-                if cur.description:
-                    columns = [desc.name for desc in cur.description]
-
-                    rows = [dict(row) for row in cur.fetchall()]
-                    self.conn.commit()
-                    return {
-                        "columns": columns,
-                        "rows": rows,
-                        "rows_affected": len(rows),
-                    }
-                else:
-                    self.conn.commit()
-                    return {
-                        "rows_affected": cur.rowcount,
-                        "message": "Query executed successfully.",
-                    }
-        except Exception as e:
-            self.conn.rollback()
-            raise RuntimeError(f"Query execution failed: {e}")
-        finally:
-            await self.disconnect()
+        async with self._acquire() as conn:
+            try:
+                async with conn.transaction():
+                    stmt = await conn.prepare(query)
+                    records = await stmt.fetch(*args)
+                    attributes = stmt.get_attributes()
+
+                    if attributes:
+                        columns = [attr.name for attr in attributes]
+                        rows = [dict(record) for record in records]
+                        return {
+                            "columns": columns,
+                            "rows": rows,
+                            "rows_affected": len(rows),
+                        }
+                    else:
+                        return {
+                            "rows_affected": self._rows_from_status(stmt.get_statusmsg()),
+                            "message": "Query executed successfully.",
+                        }
+            except asyncpg.PostgresSyntaxError as e:
+                if args or not self._is_multi_statement_error(e):
+                    raise RuntimeError(f"Query execution failed: {e}")
+            except Exception as e:
+                raise RuntimeError(f"Query execution failed: {e}")
+
+            # Scripts of several statements can't be prepared; the simple query
+            # protocol runs them (without parameters) and reports the last status.
+            try:
+                async with conn.transaction():
+                    status = await conn.execute(query)
+            except Exception as e:
+                raise RuntimeError(f"Query execution failed: {e}")
+            return {
+                "rows_affected": self._rows_from_status(status),
+                "message": "Query executed successfully.",
+            }
+
+    @staticmethod
+    def _is_multi_statement_error(error: Exception) -> bool:
+        return "multiple commands" in str(error)
+
+    async def execute_query_stream(self, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        # asyncpg cursors are server-side portals and need an open transaction;
+        # the pooled connection stays checked out until the stream is consumed or closed.
+        async with self._acquire() as conn:
+            try:
+                async with conn.transaction():
+                    stmt = await conn.prepare(query)
+                    attributes = stmt.get_attributes()
+                    if not attributes:
+                        await stmt.fetch()
+                        yield {
+                            "rows_affected": self._rows_from_status(stmt.get_statusmsg()),
+                            "message": "Query executed successfully.",
+                        }
+                        return
+
+                    columns = [attr.name for attr in attributes]
+                    # Declared types let typed consumers (Arrow export) skip inference
+                    column_types = [attr.type.name for attr in attributes]
+                    cursor = await stmt.cursor()
+                    yielded = False
+                    while True:
+                        records = await cursor.fetch(batch_size)
+                        if not records:
+                            break
+                        yielded = True
+                        yield {
+                            "columns": columns,
+                            "column_types": column_types,
+                            "rows": [tuple(record) for record in records],
+                        }
+                    if not yielded:
+                        yield {"columns": columns, "column_types": column_types, "rows": []}
+            except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                raise RuntimeError(f"Query execution failed: {e}")
+
+    supports_server_cursors = True
+
+    def paginate_query(self, query: str, offset: int, limit: int) -> Optional[str]:
+        return wrap_limit_offset(query, offset, limit)
 
     def is_mutation(self, query: str) -> bool:
         # A simple but effective check for common mutation keywords at the start of a query
@@ -67,7 +67,9 @@ class RedisConnector(BaseConnector):
         return schema_data
 
     async def get_schema_for_prompt(self) -> str:
-        schema_list = await self.get_schema()
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema_list: List[Dict[str, Any]]) -> str:
         prompt_str = "Redis Keys (sample):\n"
         for key in schema_list:
             prompt_str += f"- Key: '{key['name']}', Type: {key['type']}\n"
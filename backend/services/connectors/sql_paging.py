@@ -0,0 +1,16 @@
+import re
+from typing import Optional
+
+_READ_QUERY = re.compile(r"^\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+
+
+def wrap_limit_offset(query: str, offset: int, limit: int) -> Optional[str]:
+    """
+    Wraps a read query as a derived table so LIMIT/OFFSET applies regardless of any
+    ORDER BY/LIMIT already inside it. Returns None for anything that isn't a plain read.
+    Without an ORDER BY in the original query, page boundaries are not guaranteed stable.
+    """
+    stripped = query.strip().rstrip(";").strip()
+    if not _READ_QUERY.match(stripped) or ";" in stripped:
+        return None
+    return f"SELECT * FROM ({stripped}) AS _page LIMIT {int(limit)} OFFSET {int(offset)}"
@@ -0,0 +1,60 @@
+from typing import List, Dict, Any, Iterable, Mapping
+
+
+def _lower_keys(row: Mapping[str, Any]) -> Dict[str, Any]:
+    # MySQL returns information_schema labels in upper case, Postgres in lower case
+    return {k.lower(): v for k, v in dict(row).items()}
+
+
+def assemble_sql_schema(
+    tables: Iterable[Mapping[str, Any]],
+    columns: Iterable[Mapping[str, Any]],
+    constraints: Iterable[Mapping[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Builds the connector schema shape from three bulk catalog result sets.
+
+    - tables: table_name, table_type
+    - columns: table_name, column_name, data_type (in ordinal order per table)
+    - constraints: table_name, column_name, constraint_type ('PRIMARY KEY' / 'FOREIGN KEY'),
+      referenced_table_name, referenced_column_name
+
+    Returns [{"name", "type", "columns": [{"name", "type", "extra"}]}] in table order,
+    where "extra" is "PK", "FK -> table.col" or both joined by ", ".
+    """
+    col_details: Dict[tuple, List[str]] = {}
+    for row in constraints:
+        c = _lower_keys(row)
+        key = (c["table_name"], c["column_name"])
+        if c["constraint_type"] == "PRIMARY KEY":
+            detail = "PK"
+        elif c["constraint_type"] == "FOREIGN KEY":
+            detail = f"FK -> {c['referenced_table_name']}.{c['referenced_column_name']}"
+        else:
+            continue
+        details = col_details.setdefault(key, [])
+        if detail not in details:
+            details.append(detail)
+
+    columns_by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for row in columns:
+        col = _lower_keys(row)
+        t_name = col["table_name"]
+        details = col_details.get((t_name, col["column_name"]), [])
+        columns_by_table.setdefault(t_name, []).append({
+            "name": col["column_name"],
+            "type": col["data_type"],
+            # PK first so a key that is also a reference reads "PK, FK -> ..."
+            "extra": ", ".join(sorted(details, key=lambda d: d != "PK")),
+        })
+
+    schema_data = []
+    for row in tables:
+        table = _lower_keys(row)
+        t_name = table["table_name"]
+        schema_data.append({
+            "name": t_name,
+            "type": "view" if table["table_type"] == "VIEW" else "table",
+            "columns": columns_by_table.get(t_name, []),
+        })
+    return schema_data
@@ -1,6 +1,7 @@
 import aiosqlite
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator
 from services.connectors.base_connector import BaseConnector
+from services.connectors.sql_paging import wrap_limit_offset
 
 class SQLiteConnector(BaseConnector):
     def __init__(self, db_config: Dict[str, Any]):
@@ -33,11 +34,18 @@ class SQLiteConnector(BaseConnector):
         return schema
 
     async def get_schema_for_prompt(self) -> str:
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema: List[Dict[str, Any]]) -> str:
+        # The CREATE TABLE statements are the most faithful description for the LLM
+        return "\n\n".join([table["ddl"] for table in schema if table.get("ddl")])
+
+    async def get_schema_fingerprint(self) -> Optional[str]:
+        # schema_version is bumped by SQLite on every schema change
         async with aiosqlite.connect(self.db_path) as db:
-            # Filter out sqlite internal tables if needed
-            async with db.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';") as cursor:
-                rows = await cursor.fetchall()
-                return "\n\n".join([row[0] for row in rows if row[0]])
+            async with db.execute("PRAGMA schema_version") as cursor:
+                row = await cursor.fetchone()
+                return str(row[0])
 
     async def get_sample_data(self, object_name: str) -> Dict[str, Any]:
          async with aiosqlite.connect(self.db_path) as db:
@@ -61,6 +69,29 @@ class SQLiteConnector(BaseConnector):
                     await db.commit()
                     return {"rows_affected": cursor.rowcount}
 
+    async def execute_query_stream(self, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute(query) as cursor:
+                if not cursor.description:
+                    await db.commit()
+                    yield {"rows_affected": cursor.rowcount}
+                    return
+                columns = [description[0] for description in cursor.description]
+                yielded = False
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yielded = True
+                    yield {"columns": columns, "rows": [tuple(row) for row in rows]}
+                if not yielded:
+                    yield {"columns": columns, "rows": []}
+
+    supports_server_cursors = True
+
+    def paginate_query(self, query: str, offset: int, limit: int) -> Optional[str]:
+        return wrap_limit_offset(query, offset, limit)
+
     def is_mutation(self, query: str) -> bool:
         normalized = query.strip().upper()
         return any(normalized.startswith(kw) for kw in ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "REPLACE"])
@@ -1,7 +1,14 @@
+import asyncio
+import time
+from contextlib import aclosing
 import yaml
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, AsyncIterator
 
 from services.connectors.base_connector import BaseConnector
+from services.result_encoding import ColumnarBuilder, columnar_from_rows
+from services.result_cache import QueryResultCache, query_fingerprint
+from services.schema_retriever import SchemaIndex
+from services.token_utils import estimate_tokens
 
 try:
     from services.connectors.postgres_connector import PostgresConnector
@@ -52,6 +59,55 @@ class DbManager:
         with open("config/config.yaml", "r") as f:
             self.config = yaml.safe_load(f)
         self._initialize_connectors()
+        self._initialize_schema_cache()
+        self._initialize_result_cache()
+        self._initialize_schema_pruning()
+
+    def _initialize_schema_cache(self):
+        """
+        Schema cache keyed by db_id. Each entry holds the structured schema, the
+        lazily rendered prompt string and the engine fingerprint it was fetched at.
+        """
+        cache_config = self.config.get("schema_cache") or {}
+        # Hard expiry: the schema is refetched after this even if the fingerprint is unchanged
+        self._schema_ttl = cache_config.get("ttl_seconds", 600)
+        # The fingerprint is re-checked against the database at most this often
+        self._schema_revalidate_seconds = cache_config.get("revalidate_seconds", 5)
+        self._schema_cache: Dict[str, Dict[str, Any]] = {}
+        self._schema_locks: Dict[str, asyncio.Lock] = {}
+
+        # Multi-database fan-out: per-database deadline, and how long a database that
+        # failed `failure_threshold` times in a row is skipped before being tried again
+        self._fanout_timeout = cache_config.get("fanout_timeout_seconds", 10)
+        self._failure_backoff = cache_config.get("failure_backoff_seconds", 30)
+        self._failure_threshold = cache_config.get("failure_threshold", 3)
+        self._schema_failures: Dict[str, Dict[str, Any]] = {}
+
+    def _initialize_result_cache(self):
+        """
+        Byte-bounded LRU of read-only query results. A database entry can override
+        the TTL with `result_cache_ttl`; 0 disables result caching for it.
+        """
+        cache_config = self.config.get("result_cache") or {}
+        self._result_cache_enabled = cache_config.get("enabled", True)
+        self._result_cache_ttl = cache_config.get("ttl_seconds", 30)
+        self.result_cache = QueryResultCache(
+            max_bytes=cache_config.get("max_bytes", 64 * 1024 * 1024),
+            max_entry_bytes=cache_config.get("max_entry_bytes"),
+        )
+
+    def _initialize_schema_pruning(self):
+        """
+        Question-aware prompt schemas: databases with at least `min_tables` tables only
+        show the model the tables ranked relevant to the question (see SchemaIndex).
+        """
+        pruning_config = self.config.get("schema_pruning") or {}
+        self._pruning_enabled = pruning_config.get("enabled", True)
+        self._pruning_top_k = pruning_config.get("top_k", 8)
+        self._pruning_token_budget = pruning_config.get("token_budget", 4000)
+        self._pruning_min_tables = pruning_config.get("min_tables", 15)
+        self._pruning_fk_depth = pruning_config.get("fk_depth", 1)
+        self._pruning_fk_neighbors = pruning_config.get("fk_neighbors", 3)
 
     def _initialize_connectors(self):
         db_configs = self.config.get("databases", {})
@@ -109,7 +165,11 @@ class DbManager:
                 )
             )
 
-        llm_providers = list(self.config.get("llm", {}).get("providers", {}).keys())
+        llm_providers = [
+            name
+            for name, provider in self.config.get("llm", {}).get("providers", {}).items()
+            if (provider or {}).get("listed", True)
+        ]
 
         return AppConfig(databases=db_connections, llm_providers=llm_providers)
 
@@ -122,78 +182,393 @@ class DbManager:
             raise ValueError(f"Database config not found for id: {db_id}")
         return db_info.get("engine")
 
-    async def get_schema(self, db_id: str) -> List[Dict[str, Any]]:
+    def _get_schema_ttl(self, db_id: str) -> float:
+        db_config = self.get_db_config(db_id) or {}
+        return db_config.get("schema_cache_ttl", self._schema_ttl)
+
+    def _get_result_cache_ttl(self, db_id: str) -> float:
+        if not self._result_cache_enabled:
+            return 0
+        db_config = self.get_db_config(db_id) or {}
+        return db_config.get("result_cache_ttl", self._result_cache_ttl)
+
+    async def _safe_fingerprint(self, db_id: str, connector: BaseConnector) -> Optional[str]:
+        try:
+            return await connector.get_schema_fingerprint()
+        except Exception as e:
+            print(f"Warning: Could not fingerprint schema for {db_id}: {e}")
+            return None
+
+    async def _is_schema_entry_fresh(self, db_id: str, connector: BaseConnector, entry: Dict[str, Any]) -> bool:
+        now = time.monotonic()
+        if now - entry["fetched_at"] >= self._get_schema_ttl(db_id):
+            return False
+        if entry["fingerprint"] is None:
+            # Engine has no cheap change signal; rely on TTL alone
+            return True
+        if now - entry["validated_at"] < self._schema_revalidate_seconds:
+            return True
+        if await self._safe_fingerprint(db_id, connector) != entry["fingerprint"]:
+            return False
+        entry["validated_at"] = now
+        return True
+
+    async def _get_schema_entry(self, db_id: str) -> Dict[str, Any]:
         connector = self.get_connector(db_id)
-        return await connector.get_schema()
+        lock = self._schema_locks.setdefault(db_id, asyncio.Lock())
+        async with lock:
+            entry = self._schema_cache.get(db_id)
+            if entry and await self._is_schema_entry_fresh(db_id, connector, entry):
+                return entry
+
+            # Fingerprint first: a change racing with the fetch then shows up as a
+            # mismatch on the next check instead of being masked.
+            fingerprint = await self._safe_fingerprint(db_id, connector)
+            schema = await connector.get_schema()
+            now = time.monotonic()
+            entry = {
+                "schema": schema,
+                "prompt": None,
+                "fingerprint": fingerprint,
+                "fetched_at": now,
+                "validated_at": now,
+            }
+            self._schema_cache[db_id] = entry
+            return entry
 
-    async def get_schema_for_prompt(self, db_id: str) -> str:
+    def invalidate_schema(self, db_id: Optional[str] = None):
+        """Drops the cached schema for one database, or for all of them."""
+        if db_id is None:
+            self._schema_cache.clear()
+        else:
+            self._schema_cache.pop(db_id, None)
+
+    async def refresh_schema(self, db_id: str) -> List[Dict[str, Any]]:
+        """Forces a schema refetch for a database, bypassing the cache."""
+        self.get_connector(db_id)
+        self.invalidate_schema(db_id)
+        return await self.get_schema(db_id)
+
+    async def get_schema(self, db_id: str) -> List[Dict[str, Any]]:
+        entry = await self._get_schema_entry(db_id)
+        return entry["schema"]
+
+    async def get_schema_for_prompt(
+        self, db_id: str, question: Optional[str] = None, token_budget: Optional[int] = None
+    ) -> str:
+        """
+        Prompt-ready schema text. With a question, large schemas are pruned to the
+        relevant tables (see select_schema_for_prompt); otherwise the full schema.
+        """
+        if question:
+            selection = await self.select_schema_for_prompt(db_id, question, token_budget)
+            return selection["prompt"]
+        entry = await self._get_schema_entry(db_id)
+        if entry["prompt"] is None:
+            connector = self.get_connector(db_id)
+            entry["prompt"] = connector.format_schema_for_prompt(entry["schema"])
+        return entry["prompt"]
+
+    async def select_schema_for_prompt(
+        self, db_id: str, question: str, token_budget: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Ranks the database's tables against `question` and renders only those that
+        fit the token budget. Returns {"prompt", "pruned", "selected_tokens",
+        "full_tokens", "total_tables", "decisions"}; decisions explain, per table,
+        why it was kept or dropped. Small schemas are returned whole.
+        """
+        entry = await self._get_schema_entry(db_id)
         connector = self.get_connector(db_id)
-        return await connector.get_schema_for_prompt()
+        schema = entry["schema"]
+        budget = token_budget or self._pruning_token_budget
+
+        if entry["prompt"] is None:
+            entry["prompt"] = connector.format_schema_for_prompt(schema)
+        full_tokens = estimate_tokens(entry["prompt"])
+        if (
+            not self._pruning_enabled
+            or len(schema) < self._pruning_min_tables
+            or full_tokens <= budget
+        ):
+            return {
+                "prompt": entry["prompt"],
+                "pruned": False,
+                "selected_tokens": full_tokens,
+                "full_tokens": full_tokens,
+                "total_tables": len(schema),
+                "decisions": [],
+            }
+
+        # The index lives in the schema entry so it is rebuilt whenever the schema is
+        if entry.get("index") is None:
+            entry["index"] = SchemaIndex(schema)
+        table_tokens = entry.setdefault("table_tokens", {})
+
+        def cost(table: Dict[str, Any]) -> int:
+            if table["name"] not in table_tokens:
+                table_tokens[table["name"]] = estimate_tokens(connector.format_schema_for_prompt([table]))
+            return table_tokens[table["name"]]
+
+        selection = entry["index"].select(
+            question,
+            cost,
+            top_k=self._pruning_top_k,
+            token_budget=budget,
+            fk_depth=self._pruning_fk_depth,
+            fk_neighbors=self._pruning_fk_neighbors,
+        )
+        prompt = connector.format_schema_for_prompt(selection["tables"])
+        selected = {table["name"] for table in selection["tables"]}
+        omitted = [table["name"] for table in schema if table["name"] not in selected]
+        if omitted:
+            listed = ", ".join(omitted[:50]) + (" ..." if len(omitted) > 50 else "")
+            prompt += (
+                f"\n({len(omitted)} other tables not shown: {listed}. "
+                "Ask for their schema if the question needs them.)"
+            )
+        print(
+            f"DEBUG: Schema pruning for {db_id}: {len(selected)}/{len(schema)} tables, "
+            f"{selection['selected_tokens']}/{full_tokens} tokens, kept "
+            + ", ".join(f"{d['table']}({d['reason']})" for d in selection["decisions"] if d["included"])
+        )
+        return {
+            "prompt": prompt,
+            "pruned": True,
+            "selected_tokens": selection["selected_tokens"],
+            "full_tokens": full_tokens,
+            "total_tables": selection["total_tables"],
+            "decisions": selection["decisions"],
+        }
 
     async def get_sample_data(self, db_id: str, object_name: str) -> Dict[str, Any]:
         connector = self.get_connector(db_id)
         return await connector.get_sample_data(object_name)
 
-    async def execute_query(self, db_id: str, query: str) -> Dict[str, Any]:
+    async def execute_query(
+        self, db_id: str, query: str, params: Optional[Dict[str, Any]] = None, use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Executes a query. Read-only results are served from and stored in the result
+        cache; the returned dict then carries "cache_hit". Mutations drop the database's
+        cached results and schema.
+        """
         print(f"DEBUG: Executing SQL/Query on {db_id}: {query}")
         connector = self.get_connector(db_id)
-        result = await connector.execute_query(query)
+        is_mutation = connector.is_mutation(query)
+
+        cache_key = None
+        ttl = self._get_result_cache_ttl(db_id)
+        if use_cache and not is_mutation and ttl > 0:
+            cache_key = query_fingerprint(db_id, query, params)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                print(f"DEBUG: Result cache hit for {db_id}")
+                cached["cache_hit"] = True
+                return cached
+
+        if params:
+            result = await connector.execute_query(query, params)
+        else:
+            result = await connector.execute_query(query)
+        if is_mutation:
+            # DDL run through the console should be visible to the next prompt
+            self.invalidate_schema(db_id)
+            self.result_cache.invalidate(db_id)
+        elif cache_key and "error" not in result:
+            self.result_cache.put(cache_key, db_id, result, ttl)
         if "rows" in result:
              print(f"DEBUG: SQL Execution Success. Rows returned: {len(result['rows'])}")
         else:
              print(f"DEBUG: SQL Execution Result: {result.keys()}")
+        if cache_key:
+            result = {**result, "cache_hit": False}
         return result
 
+    async def execute_query_stream(self, db_id: str, query: str, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Yields result batches from the connector's server-side cursor (see BaseConnector)."""
+        print(f"DEBUG: Streaming SQL/Query on {db_id}: {query}")
+        connector = self.get_connector(db_id)
+        # aclosing: closing this generator early must also close the connector's
+        # stream so its cursor and pooled connection are released right away.
+        async with aclosing(connector.execute_query_stream(query, batch_size)) as batches:
+            async for batch in batches:
+                yield batch
+        if connector.is_mutation(query):
+            self.invalidate_schema(db_id)
+            self.result_cache.invalidate(db_id)
+
+    async def execute_query_columnar(
+        self, db_id: str, query: str, batch_size: int = 5000, use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Runs a read query and returns {"columnar": {...}, "rows_affected": n}, built straight
+        from driver tuples. Document or status results come back in their usual shape.
+        Uses the result cache like execute_query (with "cache_hit"): columnar results are
+        cached under their own key, and a cached row result of the same query is reused.
+        """
+        ttl = self._get_result_cache_ttl(db_id)
+        if not use_cache or ttl <= 0:
+            return await self._execute_query_columnar(db_id, query, batch_size)
+
+        rows_key = query_fingerprint(db_id, query)
+        cache_key = f"{rows_key}:columnar"
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            cached = self.result_cache.get(rows_key)
+            if cached is not None and cached.get("rows") is not None:
+                cached["columnar"] = columnar_from_rows(cached.get("columns") or [], cached.pop("rows"))
+        if cached is not None:
+            print(f"DEBUG: Result cache hit for {db_id}")
+            cached["cache_hit"] = True
+            return cached
+
+        result = await self._execute_query_columnar(db_id, query, batch_size)
+        if "error" not in result:
+            self.result_cache.put(cache_key, db_id, result, ttl)
+        return {**result, "cache_hit": False}
+
+    async def _execute_query_columnar(self, db_id: str, query: str, batch_size: int) -> Dict[str, Any]:
+        builder = None
+        documents = None
+        async with aclosing(self.execute_query_stream(db_id, query, batch_size)) as batches:
+            async for batch in batches:
+                if "rows" in batch and batch.get("columns") is not None:
+                    if builder is None:
+                        builder = ColumnarBuilder(batch["columns"])
+                    builder.add_rows(batch["rows"])
+                elif isinstance(batch.get("json_result"), list):
+                    documents = (documents or []) + batch["json_result"]
+                else:
+                    return batch
+        if builder is not None:
+            return {"columnar": builder.build(), "rows_affected": builder.row_count}
+        documents = documents or []
+        return {"json_result": documents, "rows_affected": len(documents)}
+
+    async def _fetch_schema_annotated(
+        self, db_id: str, for_prompt: bool, question: Optional[str] = None, token_budget: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetches one database's schema (or prompt string) under the fan-out deadline.
+        Returns {"status", "latency_ms", and "result" or "error"}; never raises.
+        Databases that failed `failure_threshold` times in a row are skipped until
+        their backoff expires; a success resets the count.
+        """
+        failure = self._schema_failures.get(db_id)
+        if failure and failure["until"] > time.monotonic():
+            return {
+                "status": "skipped",
+                "latency_ms": 0.0,
+                "error": f"Skipped after recent failure: {failure['error']}",
+            }
+
+        started = time.perf_counter()
+        try:
+            if for_prompt:
+                fetch = self.get_schema_for_prompt(db_id, question, token_budget)
+            else:
+                fetch = self.get_schema(db_id)
+            result = await asyncio.wait_for(fetch, timeout=self._fanout_timeout)
+            self._schema_failures.pop(db_id, None)
+            return {
+                "status": "ok",
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "result": result,
+            }
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                status, error = "timeout", f"Timed out after {self._fanout_timeout}s"
+            else:
+                status, error = "error", str(e)
+            print(f"Error fetching schema for {db_id}: {error}")
+            failures = self._schema_failures.get(db_id, {}).get("count", 0) + 1
+            self._schema_failures[db_id] = {
+                "count": failures,
+                "until": time.monotonic() + self._failure_backoff if failures >= self._failure_threshold else 0,
+                "error": error,
+            }
+            return {
+                "status": status,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "error": error,
+            }
+
+    async def _gather_schemas(
+        self, db_ids: List[str], for_prompt: bool, question: Optional[str] = None, token_budget: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        results = await asyncio.gather(
+            *(self._fetch_schema_annotated(db_id, for_prompt, question, token_budget) for db_id in db_ids)
+        )
+        return dict(zip(db_ids, results))
+
     async def get_all_schemas(self) -> Dict[str, Any]:
         """
-        Returns a dictionary of schemas for all configured databases.
-        Format: { "db_id": { "name": "DB Name", "schema": ... } }
+        Returns a dictionary of schemas for all configured databases, fetched concurrently.
+        Format: { "db_id": { "name": "DB Name", "engine": ..., "status": "ok", "latency_ms": ..., "schema": ... } }
+        Unavailable databases carry "status" ("error", "timeout" or "skipped") and "error" instead of "schema".
         """
+        fetched = await self._gather_schemas(list(self._connectors), for_prompt=False)
         all_schemas = {}
-        for db_id, connector in self._connectors.items():
-            try:
-                # We need the friendly name from config
-                db_config = self.get_db_config(db_id)
-                db_name = db_config.get("name", db_id)
-                schema = await connector.get_schema()
-                all_schemas[db_id] = {
-                    "name": db_name,
-                    "engine": db_config.get("engine"),
-                    "schema": schema
-                }
-            except Exception as e:
-                print(f"Error fetching schema for {db_id}: {e}")
-                # We optionally include error info or skip
-                all_schemas[db_id] = {
-                    "name": self.get_db_config(db_id).get("name", db_id),
-                    "error": str(e)
-                }
+        for db_id, outcome in fetched.items():
+            # We need the friendly name from config
+            db_config = self.get_db_config(db_id)
+            entry = {
+                "name": db_config.get("name", db_id),
+                "engine": db_config.get("engine"),
+                "status": outcome["status"],
+                "latency_ms": outcome["latency_ms"],
+            }
+            if outcome["status"] == "ok":
+                entry["schema"] = outcome["result"]
+            else:
+                entry["error"] = outcome["error"]
+            all_schemas[db_id] = entry
         return all_schemas
 
-    async def get_all_schemas_for_prompt(self, engine_filter: str = None) -> str:
+    async def get_all_schemas_for_prompt(self, engine_filter: str = None, question: Optional[str] = None) -> str:
         """
         Returns a formatted string containing schemas from ALL databases, suitable for LLM prompt.
         If engine_filter is provided, only includes databases with that engine type.
+        With a question, each database's schema is pruned within an equal share of the
+        token budget. Databases that fail or miss the fan-out deadline are left out.
         """
+        db_ids = [
+            db_id for db_id in self._connectors
+            if not engine_filter or self.get_db_config(db_id).get("engine") == engine_filter
+        ]
+        token_budget = max(1, self._pruning_token_budget // max(1, len(db_ids)))
+        fetched = await self._gather_schemas(db_ids, for_prompt=True, question=question, token_budget=token_budget)
+
         prompt_parts = []
+        for db_id, outcome in fetched.items():
+            if outcome["status"] != "ok":
+                continue
+            db_config = self.get_db_config(db_id)
+            db_name = db_config.get("name", db_id)
+            prompt_parts.append(f"--- Database: {db_name} (ID: {db_id}, Engine: {db_config.get('engine')}) ---")
+            prompt_parts.append(outcome["result"])
+            prompt_parts.append("\n")
+
+        return "\n".join(prompt_parts)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Returns pool metrics for every connector that keeps a connection pool.
+        """
+        return {
+            db_id: stats
+            for db_id, connector in self._connectors.items()
+            if (stats := connector.get_pool_stats()) is not None
+        }
+
+    async def close(self):
+        """Closes all connector pools. Called on application shutdown."""
         for db_id, connector in self._connectors.items():
             try:
-                db_config = self.get_db_config(db_id)
-                
-                # Filter by engine if specified
-                if engine_filter and db_config.get("engine") != engine_filter:
-                    continue
-
-                db_name = db_config.get("name", db_id)
-                schema_str = await connector.get_schema_for_prompt()
-                
-                prompt_parts.append(f"--- Database: {db_name} (ID: {db_id}, Engine: {db_config.get('engine')}) ---")
-                prompt_parts.append(schema_str)
-                prompt_parts.append("\n")
+                await connector.disconnect()
             except Exception as e:
-                print(f"Error fetching schema prompt for {db_id}: {e}")
-        
-        return "\n".join(prompt_parts)
+                print(f"Error closing connector {db_id}: {e}")
 
     def is_mutation_query(self, db_id: str, query: str) -> bool:
         connector = self.get_connector(db_id)
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from services.single_flight import SingleFlight
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class LLMCacheBackend(ABC):
+    """Storage for serialized LLM responses. Values are opaque strings."""
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        pass
+
+    @abstractmethod
+    async def purge(self) -> int:
+        """Removes every cached response. Returns how many were removed."""
+        pass
+
+    async def size_info(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryLLMCache(LLMCacheBackend):
+    """Per-process LRU bounded by entry count and total value bytes, with TTL expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def purge(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        return count
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    async def size_info(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class RedisLLMCache(LLMCacheBackend):
+    """
+    Shared cache in Redis, so API workers and the arq worker reuse each other's
+    responses. Size is bounded by the per-key TTL (and Redis' own maxmemory policy).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "llmcache:"):
+        if aioredis is None:
+            raise RuntimeError("The 'redis' package is required for the Redis LLM cache backend.")
+        self.url = url
+        self.key_prefix = key_prefix
+        self._client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._client.get(self.key_prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._client.set(self.key_prefix + key, value, ex=max(1, int(ttl)))
+
+    async def purge(self) -> int:
+        removed = 0
+        async for key in self._client.scan_iter(match=f"{self.key_prefix}*", count=500):
+            removed += await self._client.delete(key)
+        return removed
+
+    async def size_info(self) -> Dict[str, Any]:
+        count = 0
+        async for _ in self._client.scan_iter(match=f"{self.key_prefix}*", count=500):
+            count += 1
+        return {"entries": count, "url": self.url}
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class LLMResponseCache:
+    """
+    Caches chat responses keyed by provider, model, engine, a hash of the schema text
+    the prompt was built from, and a hash of the normalized message history. Any schema
+    change therefore changes the key, and a follow-up in a longer conversation never
+    reuses an answer given for the same words in a different context.
+    Backend errors are counted and treated as misses; they never fail a request.
+    `inflight` coalesces concurrent misses for the same key into one provider call.
+    """
+
+    def __init__(self, backend: LLMCacheBackend, ttl_seconds: float = 3600, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+        self.inflight = SingleFlight()
+
+    @staticmethod
+    def build_key(provider: str, model: str, engine: str, schema: str, messages: List[Any]) -> str:
+        schema_hash = hashlib.sha256((schema or "").encode()).hexdigest()
+        history = [[m.role, _normalize_text(m.content)] for m in messages]
+        history_hash = hashlib.sha256(json.dumps(history, separators=(",", ":")).encode()).hexdigest()
+        return ":".join([provider.lower(), model or "", engine or "", schema_hash[:32], history_hash[:32]])
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"WARNING: LLM cache read failed ({self.backend.name}): {e}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"WARNING: LLM cache write failed ({self.backend.name}): {e}")
+
+    async def purge(self) -> int:
+        return await self.backend.purge()
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        try:
+            size = await self.backend.size_info()
+        except Exception as e:
+            size = {"error": str(e)}
+        return {
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "errors": self.errors,
+            "single_flight": self.inflight.stats(),
+            **size,
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Process-wide cache built from the `llm.cache` block of config.yaml
+    (backend: memory | redis, ttl_seconds, max_entries, max_bytes, redis_url, key_prefix).
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with open("config/config.yaml", "r") as f:
+            cache_config = (yaml.safe_load(f).get("llm") or {}).get("cache") or {}
+        backend_name = cache_config.get("backend", "memory")
+        if backend_name == "redis":
+            redis_url = cache_config.get("redis_url") or os.getenv("REDIS_URL", "redis://localhost:6379")
+            backend = RedisLLMCache(redis_url, cache_config.get("key_prefix", "llmcache:"))
+        else:
+            backend = MemoryLLMCache(
+                max_entries=cache_config.get("max_entries", 1000),
+                max_bytes=cache_config.get("max_bytes", 16 * 1024 * 1024),
+            )
+        _llm_cache = LLMResponseCache(
+            backend,
+            ttl_seconds=cache_config.get("ttl_seconds", 3600),
+            enabled=cache_config.get("enabled", True),
+        )
+    return _llm_cache
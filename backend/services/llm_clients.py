@@ -0,0 +1,101 @@
+import asyncio
+import os
+from typing import Any, Dict, Optional, Set
+
+import httpx
+import yaml
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+
+
+def _load_llm_config() -> Dict[str, Any]:
+    with open("config/config.yaml", "r") as f:
+        return yaml.safe_load(f).get("llm") or {}
+
+
+def _build_http_client(http_config: Dict[str, Any]) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=http_config.get("max_connections", 100),
+            max_keepalive_connections=http_config.get("max_keepalive_connections", 20),
+        ),
+        timeout=httpx.Timeout(http_config.get("timeout_seconds", 120), connect=10),
+    )
+
+
+class _SharedClients:
+    """Clients and concurrency limits for one event loop (httpx pools can't cross loops)."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop]):
+        self.loop = loop
+        self.config = _load_llm_config()
+        self.http = _build_http_client(self.config.get("http") or {})
+        self.openai: Optional[AsyncOpenAI] = None
+        self.groq: Optional[AsyncGroq] = None
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if openai_api_key:
+            self.openai = AsyncOpenAI(api_key=openai_api_key, http_client=self.http)
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        if groq_api_key:
+            self.groq = AsyncGroq(api_key=groq_api_key, http_client=self.http)
+
+    def semaphore(self, provider: str) -> asyncio.Semaphore:
+        provider = provider.lower()
+        if provider not in self.semaphores:
+            provider_config = (self.config.get("providers") or {}).get(provider) or {}
+            self.semaphores[provider] = asyncio.Semaphore(provider_config.get("max_concurrency", 8))
+        return self.semaphores[provider]
+
+
+_shared: Optional[_SharedClients] = None
+# Closes of replaced clients still in flight (tasks are only weakly referenced by the loop)
+_closing: Set[asyncio.Future] = set()
+
+
+async def _close_quietly(http: httpx.AsyncClient):
+    try:
+        await http.aclose()
+    except Exception as e:
+        print(f"WARNING: Failed to close replaced LLM HTTP client: {e}")
+
+
+def _close_replaced(shared: _SharedClients):
+    """
+    Closes the connection pool of clients replaced for a new event loop: on their own
+    loop if it is still running (another thread), otherwise on the current one.
+    """
+    old_loop = shared.loop
+    if old_loop is not None and old_loop.is_running() and not old_loop.is_closed():
+        closing = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_close_quietly(shared.http), old_loop))
+    else:
+        closing = asyncio.ensure_future(_close_quietly(shared.http))
+    _closing.add(closing)
+    closing.add_done_callback(_closing.discard)
+
+
+def shared_clients() -> _SharedClients:
+    """
+    Process-wide provider clients sharing one httpx connection pool (`llm.http` in
+    config.yaml), plus a semaphore per provider capping in-flight calls at
+    `llm.providers.<p>.max_concurrency`. Rebuilt if used from a different event loop,
+    closing the replaced clients' connection pool.
+    """
+    global _shared
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if _shared is None or (loop is not None and _shared.loop is not loop):
+        if _shared is not None:
+            _close_replaced(_shared)
+        _shared = _SharedClients(loop)
+    return _shared
+
+
+async def close_llm_clients():
+    global _shared
+    if _shared is not None:
+        shared, _shared = _shared, None
+        await shared.http.aclose()
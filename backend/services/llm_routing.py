@@ -0,0 +1,221 @@
+import asyncio
+import bisect
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+# Upper bounds (ms) of the latency buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000, 20000, 30000, 60000]
+
+# HTTP statuses that mean "try another provider now" rather than "retry this one"
+FAILOVER_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LatencyHistogram:
+    """Bucketed latency of one provider's calls, with success/error/cancel counts."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.sum_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.total += 1
+        self.sum_ms += elapsed_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None without samples)."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "mean_ms": round(self.sum_ms / self.total, 1) if self.total else None,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """HTTP-ish status of a provider error: OpenAI/Groq `status_code`, Google API `code`."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_failover_error(exc: BaseException) -> bool:
+    return error_status(exc) in FAILOVER_STATUSES
+
+
+class LLMRouter:
+    """
+    Routing policy from the `llm.routing` block of config.yaml.
+
+    A call goes to the requested provider first. If it has not answered after the
+    hedge delay, the same request is also sent to the next fallback provider and the
+    first valid answer wins; the other call is cancelled. The delay is the primary's
+    observed `hedge_quantile` latency once it has `min_samples` calls, clamped to
+    [min_hedge_ms, hedge_after_ms], and `hedge_after_ms` before that. A call that
+    fails with 429/5xx, raises, or returns an invalid answer moves on to the next
+    fallback immediately. Per-provider latency histograms are kept for every call.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config.get("enabled", True)
+        self.fallbacks: Dict[str, List[str]] = config.get("fallbacks") or {}
+        self.hedge_after_ms = config.get("hedge_after_ms", 4000)
+        self.min_hedge_ms = config.get("min_hedge_ms", 1000)
+        self.hedge_quantile = config.get("hedge_quantile", 0.9)
+        self.min_samples = config.get("min_samples", 20)
+        self.max_hedges = config.get("max_hedges", 1)
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, provider: str) -> LatencyHistogram:
+        return self.histograms.setdefault(provider.lower(), LatencyHistogram())
+
+    def candidates(self, provider: str) -> List[str]:
+        provider = provider.lower()
+        if not self.enabled:
+            return [provider]
+        return [provider] + [p for p in self.fallbacks.get(provider, []) if p != provider]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on `provider` before hedging."""
+        histogram = self.histogram(provider)
+        delay_ms = self.hedge_after_ms
+        if histogram.total >= self.min_samples:
+            observed = histogram.quantile(self.hedge_quantile)
+            delay_ms = max(self.min_hedge_ms, min(observed, self.hedge_after_ms))
+        return delay_ms / 1000
+
+    async def _timed(self, provider: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        histogram = self.histogram(provider)
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            histogram.cancelled += 1
+            raise
+        except Exception:
+            histogram.errors += 1
+            raise
+        histogram.observe((time.perf_counter() - started) * 1000)
+        return result
+
+    async def run(
+        self,
+        provider: str,
+        call: Callable[[str], Awaitable[Any]],
+        is_valid: Callable[[Any], bool] = lambda result: True,
+    ) -> Tuple[Any, str]:
+        """
+        Runs `call(provider_name)` under the policy. Returns (result, provider that
+        produced it). If every candidate fails, re-raises the last error, or returns
+        the last invalid result when none raised.
+        """
+        queue = self.candidates(provider)
+        tasks: Dict[asyncio.Task, str] = {}
+        hedges = 0
+        last_error: Optional[BaseException] = None
+        last_result: Optional[Tuple[Any, str]] = None
+
+        def launch():
+            name = queue.pop(0)
+            tasks[asyncio.create_task(self._timed(name, call))] = name
+
+        launch()
+        try:
+            while tasks:
+                timeout = None
+                if queue and hedges < self.max_hedges:
+                    timeout = self.hedge_delay(provider)
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedges += 1
+                    print(f"DEBUG: {provider} slower than {timeout:.2f}s, hedging with {queue[0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        kind = "failing over" if is_failover_error(last_error) else "trying next provider"
+                        print(f"WARNING: LLM provider {name} failed ({last_error}); {kind}")
+                    elif is_valid(task.result()):
+                        if name != provider.lower():
+                            print(f"DEBUG: LLM request for {provider} answered by {name}")
+                        return task.result(), name
+                    else:
+                        last_result = (task.result(), name)
+                    if queue and not tasks:
+                        launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        if last_result is not None:
+            return last_result
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "fallbacks": self.fallbacks,
+            "hedge_after_ms": self.hedge_after_ms,
+            "providers": {
+                name: {**histogram.snapshot(), "hedge_delay_ms": round(self.hedge_delay(name) * 1000)}
+                for name, histogram in sorted(self.histograms.items())
+            },
+        }
+
+
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    global _llm_router
+    if _llm_router is None:
+        with open("config/config.yaml", "r") as f:
+            routing_config = (yaml.safe_load(f).get("llm") or {}).get("routing") or {}
+        _llm_router = LLMRouter(routing_config)
+    return _llm_router
+
+
+def should_retry_llm_call(retry_state) -> bool:
+    """
+    Tenacity `retry` predicate for the provider methods (named `..._<provider>`):
+    429/5xx errors are not retried in place when the provider has a fallback to
+    fail over to; everything else keeps the usual retry.
+    """
+    if not retry_state.outcome.failed:
+        return False
+    exc = retry_state.outcome.exception()
+    if not is_failover_error(exc):
+        return True
+    provider = retry_state.fn.__name__.rsplit("_", 1)[-1]
+    return len(get_llm_router().candidates(provider)) <= 1
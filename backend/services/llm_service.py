@@ -1,17 +1,64 @@
 import os
+import re
+from contextlib import aclosing
 import google.generativeai as genai
-from openai import OpenAI
-from groq import AsyncGroq
 import yaml
 import json
-from typing import List, Dict, Any
+import textwrap
+from typing import List, Dict, Any, AsyncIterator
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from models.query import GeneratedQuery, ChatMessage
+from services.llm_cache import get_llm_cache
+from services.llm_clients import shared_clients
+from services.cassette import get_cassette
+from services.chat_history import extractive_summary
+from services.llm_routing import get_llm_router, should_retry_llm_call
+from services.local_llm import get_local_llm
+from services.prompt_cache import canonical_tools_json, content_hash, get_gemini_context_cache, get_prefix_cache
+
+TOOLS_INSTRUCTION = """### Available Tools
+You have access to the following tools:
+{tools_json}
+
+To use a tool, you MUST use the following format:
+Thought: Do I need to use a tool? Yes
+Action: the name of the tool to use
+Action Input: the input to the tool in JSON format
+Observation: <leave this blank>
+
+If you need several tool calls that do not depend on each other's output, write one
+Action / Action Input pair per call in the same response; they run in parallel and
+their observations come back together.
+
+When you have a final answer, or if you don't need to use a tool, use:
+Thought: Do I need to use a tool? No
+Final Answer: [your response here]"""
+
+
+_REACT_ACTION = re.compile(r"Action:[ \t]*(.*?)\n\s*Action Input:\s*")
+
+
+def _parse_tool_calls(text: str) -> List[Dict[str, Any]]:
+    """The {"tool", "args"} of each ReAct Action / Action Input pair in `text`, in order."""
+    decoder = json.JSONDecoder()
+    calls = []
+    for match in _REACT_ACTION.finditer(text):
+        try:
+            args, _ = decoder.raw_decode(text, match.end())
+        except ValueError:
+            continue
+        if isinstance(args, dict):
+            calls.append({"tool": match.group(1).strip(), "args": args})
+    return calls
+
+
+def _is_valid_completion(text: str) -> bool:
+    # Provider methods report missing keys and blocked responses as "Error..." text
+    return bool(text) and not text.startswith("Error")
 
 
 class LLMService:
-    cache = {}
     def __init__(self):
         with open("config/config.yaml", "r") as f:
             self.config = yaml.safe_load(f)["llm"]
@@ -21,29 +68,65 @@ class LLMService:
         if google_api_key:
             genai.configure(api_key=google_api_key)
 
-        # Configure OpenAI
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.openai_client = None
-        if self.openai_api_key:
-             self.openai_client = OpenAI(api_key=self.openai_api_key)
+    # OpenAI and Groq clients are shared process-wide over one httpx connection pool
+    @property
+    def openai_client(self):
+        return shared_clients().openai
 
-        # Configure Groq
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.groq_client = None
-        if self.groq_api_key:
-             self.groq_client = AsyncGroq(api_key=self.groq_api_key)
+    @property
+    def groq_client(self):
+        return shared_clients().groq
+
+    @staticmethod
+    def _provider_slot(provider: str):
+        """Caps concurrent calls per provider (llm.providers.<p>.max_concurrency)."""
+        return shared_clients().semaphore(provider)
 
     async def generate_query(
         self, provider: str, natural_language_query: str, schema: str, engine: str
     ) -> GeneratedQuery:
         prompt = self._build_prompt(natural_language_query, schema, engine)
 
+        async def complete() -> GeneratedQuery:
+            result, _ = await get_llm_router().run(
+                provider,
+                lambda name: self._query_completion(name, prompt, engine),
+                is_valid=lambda generated: not generated.error,
+            )
+            return result
+
+        # Identical concurrent requests share one provider call
+        model_name = self.config.get("providers", {}).get(provider.lower(), {}).get("model", "")
+        flight_key = "query:" + get_llm_cache().build_key(
+            provider, model_name, engine, schema, [ChatMessage(role="user", content=natural_language_query)]
+        )
+        result = await get_llm_cache().inflight.do(flight_key, complete)
+        return result.model_copy()
+
+    def _cassette_request(self, provider: str, engine: str, **fields) -> Dict[str, Any]:
+        """Identity of a provider request for cassettes; schema and prompt text are hashed."""
+        model_name = self.config.get("providers", {}).get(provider.lower(), {}).get("model", "")
+        return {"provider": provider.lower(), "model": model_name, "engine": engine, **fields}
+
+    async def _query_completion(self, provider: str, prompt: str, engine: str) -> GeneratedQuery:
+        # Recorded / replayed when a cassette is active (see services.cassette)
+        return await get_cassette().through(
+            "llm.query",
+            self._cassette_request(provider, engine, prompt=content_hash(prompt)),
+            lambda: self._provider_query_completion(provider, prompt, engine),
+            encode=lambda generated: generated.model_dump(mode="json"),
+            decode=GeneratedQuery.model_validate,
+        )
+
+    async def _provider_query_completion(self, provider: str, prompt: str, engine: str) -> GeneratedQuery:
         if provider.lower() == "gemini":
             return await self._generate_with_gemini(prompt, engine)
         elif provider.lower() == "chatgpt":
             return await self._generate_with_chatgpt(prompt, engine)
         elif provider.lower() == "groq":
             return await self._generate_with_groq(prompt, engine)
+        elif provider.lower() == "local":
+            return await self._generate_with_local(prompt, engine)
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
 
@@ -51,34 +134,35 @@ class LLMService:
         self, db_id: str, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
     ) -> ChatMessage:
         last_user_message = next((m.content for m in reversed(messages) if m.role == 'user'), None)
+        response_cache = get_llm_cache()
 
-        # Skip caching if tools are involved, as context matters more
+        # Skip caching if tools are involved: tool results depend on external state
+        cache_key = None
         if last_user_message and not tools:
-            cache_key = (db_id, last_user_message)
-            if cache_key in self.cache:
-                print(f"Returning cached response for: {cache_key}")
-                return self.cache[cache_key]
-
-        if provider.lower() == "gemini":
-            prompt = self._build_chat_prompt(messages, schema, engine, tools)
-            raw_response = await self._generate_chat_with_gemini(prompt)
-        elif provider.lower() == "chatgpt":
-            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
-            raw_response = await self._generate_chat_with_chatgpt(system_prompt, messages)
-        elif provider.lower() == "groq":
-            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
-            raw_response = await self._generate_chat_with_groq(system_prompt, messages)
-        else:
-            raise ValueError(f"Unsupported LLM provider: {provider}")
+            model_name = self.config.get("providers", {}).get(provider.lower(), {}).get("model", "")
+            cache_key = response_cache.build_key(provider, model_name, engine, schema, messages)
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                print(f"Returning cached response for: {last_user_message[:80]!r}")
+                return ChatMessage.model_validate_json(cached)
+
+        async def complete() -> ChatMessage:
+            # Hedged / failed over across providers per llm.routing (see LLMRouter)
+            raw_response, _ = await get_llm_router().run(
+                provider,
+                lambda name: self._chat_completion(name, messages, schema, engine, tools),
+                is_valid=_is_valid_completion,
+            )
+            response = self._parse_chat_response(raw_response, engine)
+            if cache_key and _is_valid_completion(raw_response):
+                await response_cache.set(cache_key, response.model_dump_json())
+            return response
 
-        response = self._parse_chat_response(raw_response, engine)
-
-        if last_user_message and not tools:
-            cache_key = (db_id, last_user_message)
-            print(f"Caching response for: {cache_key}")
-            self.cache[cache_key] = response
-        
-        return response
+        if cache_key is None:
+            return await complete()
+        # Concurrent misses for the same key await one provider call (single-flight)
+        response = await response_cache.inflight.do(cache_key, complete)
+        return response.model_copy()
 
     def _build_prompt(self, nl_query: str, schema: str, engine: str) -> str:
         if engine in ["postgresql", "mysql", "sqlite"]:
@@ -179,34 +263,203 @@ class LLMService:
                 "{nl_query}"
                 """
 
+    def _chat_cassette_request(
+        self, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        return self._cassette_request(
+            provider,
+            engine,
+            schema=content_hash(schema),
+            tools=content_hash(canonical_tools_json(tools)) if tools else None,
+            messages=[[m.role, m.content] for m in messages],
+        )
+
+    async def _chat_completion(
+        self, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> str:
+        return await get_cassette().through(
+            "llm.chat",
+            self._chat_cassette_request(provider, messages, schema, engine, tools),
+            lambda: self._provider_chat_completion(provider, messages, schema, engine, tools),
+        )
+
+    async def _provider_chat_completion(
+        self, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> str:
+        if provider.lower() == "gemini":
+            prompt = self._build_chat_prompt(messages, schema, engine, tools)
+            prefix = self._build_chat_system_prompt(schema, engine, tools)
+            return await self._generate_chat_with_gemini(prompt, static_prefix=prefix)
+        elif provider.lower() == "chatgpt":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return await self._generate_chat_with_chatgpt(system_prompt, messages)
+        elif provider.lower() == "groq":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return await self._generate_chat_with_groq(system_prompt, messages)
+        elif provider.lower() == "local":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return await self._generate_chat_with_local(system_prompt, messages, engine)
+        else:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    def _chat_stream(
+        self, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        return get_cassette().stream(
+            "llm.chat_stream",
+            self._chat_cassette_request(provider, messages, schema, engine, tools),
+            lambda: self._provider_chat_stream(provider, messages, schema, engine, tools),
+        )
+
+    def _provider_chat_stream(
+        self, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        if provider.lower() == "gemini":
+            prompt = self._build_chat_prompt(messages, schema, engine, tools)
+            prefix = self._build_chat_system_prompt(schema, engine, tools)
+            return self._stream_chat_with_gemini(prompt, static_prefix=prefix)
+        elif provider.lower() == "chatgpt":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return self._stream_chat_with_chatgpt(system_prompt, messages)
+        elif provider.lower() == "groq":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return self._stream_chat_with_groq(system_prompt, messages)
+        elif provider.lower() == "local":
+            system_prompt = self._build_chat_system_prompt(schema, engine, tools)
+            return self._stream_chat_with_local(system_prompt, messages, engine)
+        else:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    async def stream_response_from_messages(
+        self, db_id: str, provider: str, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of generate_response_from_messages. Yields
+        {"type": "token", "delta": str} as the provider produces text, then one
+        {"type": "response", "message": ChatMessage} parsed from the full text.
+        Cached responses are replayed as a single token event.
+        """
+        last_user_message = next((m.content for m in reversed(messages) if m.role == 'user'), None)
+        response_cache = get_llm_cache()
+
+        cache_key = None
+        if last_user_message and not tools:
+            model_name = self.config.get("providers", {}).get(provider.lower(), {}).get("model", "")
+            cache_key = response_cache.build_key(provider, model_name, engine, schema, messages)
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                response = ChatMessage.model_validate_json(cached)
+                yield {"type": "token", "delta": response.content}
+                yield {"type": "response", "message": response}
+                return
+
+        # A stream can't be hedged once tokens are out, but a provider that fails
+        # before its first token is failed over to the next one (llm.routing).
+        candidates = get_llm_router().candidates(provider)
+        parts = []
+        for index, name in enumerate(candidates):
+            has_next = index + 1 < len(candidates)
+            try:
+                async with aclosing(self._chat_stream(name, messages, schema, engine, tools)) as deltas:
+                    async for delta in deltas:
+                        if not delta:
+                            continue
+                        if not parts and has_next and not _is_valid_completion(delta):
+                            print(f"WARNING: LLM provider {name} unavailable ({delta}); trying next provider")
+                            break
+                        parts.append(delta)
+                        yield {"type": "token", "delta": delta}
+            except Exception as e:
+                if parts or not has_next:
+                    raise
+                print(f"WARNING: LLM provider {name} failed before streaming ({e}); trying next provider")
+                continue
+            if parts:
+                break
+
+        raw_response = "".join(parts).strip()
+        response = self._parse_chat_response(raw_response, engine)
+        if cache_key and _is_valid_completion(raw_response):
+            await response_cache.set(cache_key, response.model_dump_json())
+        yield {"type": "response", "message": response}
+
+    async def summarize_history(
+        self, provider: str, previous_summary: str, messages: List[Any], max_tokens: int
+    ) -> str:
+        """Folds `messages` into `previous_summary`, returning the new rolling summary."""
+        transcript = "\n".join(
+            f"{m.role}: {m.content}" + (f"\n(query: {m.query})" if getattr(m, "query", None) else "")
+            for m in messages
+        )
+        instructions = (
+            "You maintain a running summary of a conversation between a user and a database "
+            "query assistant. Merge the new messages into the existing summary. Keep the tables, "
+            "filters, queries and results the user cares about; drop pleasantries and raw tool "
+            f"output. Reply with the summary only, in at most {max_tokens * 3 // 4} words."
+        )
+        body = f"### Existing Summary\n{previous_summary or '(none)'}\n### New Messages\n{transcript}"
+        return await get_cassette().through(
+            "llm.summary",
+            self._cassette_request(provider, None, body=content_hash(body), max_tokens=max_tokens),
+            lambda: self._provider_summary(provider, previous_summary, messages, max_tokens, instructions, body),
+        )
+
+    async def _provider_summary(
+        self, provider: str, previous_summary: str, messages: List[Any], max_tokens: int, instructions: str, body: str
+    ) -> str:
+        if provider.lower() == "gemini":
+            return await self._generate_chat_with_gemini(f"{instructions}\n\n{body}")
+        elif provider.lower() == "chatgpt":
+            return await self._generate_chat_with_chatgpt(instructions, [ChatMessage(role="user", content=body)])
+        elif provider.lower() == "groq":
+            return await self._generate_chat_with_groq(instructions, [ChatMessage(role="user", content=body)])
+        elif provider.lower() == "local":
+            return extractive_summary(previous_summary, messages, max_tokens)
+        else:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+
     def _build_chat_prompt(
         self, messages: List[ChatMessage], schema: str, engine: str, tools: List[Dict[str, Any]] = None
     ) -> str:
+        # Static prefix first, per-request history last (see _build_chat_system_prompt)
         history = "\n".join([f"{m.role}: {m.content}" for m in messages])
+        prefix = self._build_chat_system_prompt(schema, engine, tools)
+        return f"{prefix}\n### Conversation History\n{history}\n### Your Response\n"
 
-        tools_instruction = ""
+    def _build_chat_system_prompt(self, schema: str, engine: str, tools: List[Dict[str, Any]] = None) -> str:
+        """
+        Static part of every chat prompt: instructions, tools, then schema. It is the
+        system prompt for ChatGPT/Groq and the start of the Gemini prompt; history
+        always follows it. Tools are serialized canonically and the compiled prefix is
+        memoized per (engine, schema hash, tools hash), so equal inputs give identical
+        bytes and the providers' prefix caches can hit across turns and sessions.
+        A pruned schema (schema_pruning) is part of the prefix: questions that select
+        the same tables share it, but a different selection starts a new prefix.
+        """
+        tools_json = canonical_tools_json(tools) if tools else ""
         if tools:
-            import json
-            print(f"DEBUG: Injecting tools into prompt: {[t['name'] for t in tools]}")
-            tools_json = json.dumps(tools, indent=2)
-            tools_instruction = f"""
-            ### Available Tools
-            You have access to the following tools:
-            {tools_json}
-
-            To use a tool, you MUST use the following format:
-            Thought: Do I need to use a tool? Yes
-            Action: the name of the tool to use
-            Action Input: the input to the tool in JSON format
-            Observation: <leave this blank>
-            
-            When you have a final answer, or if you don't need to use a tool, use:
-            Thought: Do I need to use a tool? No
-            Final Answer: [your response here]
-            """
+            print(f"DEBUG: Injecting tools into prompt: {sorted(t['name'] for t in tools)}")
+        key = ("chat", engine, content_hash(schema), content_hash(tools_json))
+        return get_prefix_cache().get_or_build(key, lambda: self._compile_chat_prefix(schema, engine, tools_json))
+
+    def _compile_chat_prefix(self, schema: str, engine: str, tools_json: str) -> str:
+        sections = [textwrap.dedent(self._chat_instructions(engine)).strip()]
+        if tools_json:
+            sections.append(TOOLS_INSTRUCTION.format(tools_json=tools_json))
+        if engine == "multi-db":
+            heading = "### Internal Database Connection Schemas"
+        elif engine == "redis":
+            heading = "### Internal Database Schema (Sample Keys)"
+        elif engine in ["postgresql", "mysql", "sqlite", "mongodb"]:
+            heading = "### Internal Database Schema"
+        else:
+            heading = "### Database Schema"
+        sections.append(f"{heading}\n{schema}")
+        return "\n\n".join(sections) + "\n"
 
+    def _chat_instructions(self, engine: str) -> str:
         if engine == "multi-db":
-             return f"""
+            return """
             You are an intelligent Database Router and Query Generator.
             You have access to valid schemas from multiple databases.
 
@@ -225,13 +478,6 @@ class LLMService:
                 DB_ID: users_db
                 SELECT * FROM users WHERE active = true;
                 ```
-
-            {tools_instruction}
-            ### Internal Database Connection Schemas
-            {schema}
-            ### Conversation History
-            {history}
-            ### Your Response
             """
 
         elif engine in ["postgresql", "mysql", "sqlite"]:
@@ -260,147 +506,11 @@ class LLMService:
 
             4.  **Context**:
                 - Use the provided conversation history for context.
-
-            {tools_instruction}
-            ### Internal Database Schema
-            {schema}
-            ### Conversation History
-            {history}
-            ### Your Response
             """
 
         elif engine == "mongodb":
-            return f"""
-            You are an expert MongoDB Query Generator. 
-            You are NOT a conversational assistant. You are a code generation engine.
-            Your ONLY purpose is to output valid JSON configuration for MongoDB queries.
-
-            ### Instructions
-            1.  **Response Format**:
-                - Output MUST be a single, valid JSON object.
-                - Enclose the JSON in ```json``` markdown blocks.
-                - **NO** introductory text.
-                - **ONLY** the JSON block.
-
-            2.  **Orchestration**:
-                - If the user asks for data, generate the MongoDB JSON.
-                - Check **Available Tools** first.
-
-            3.  **MongoDB Query Format**:
-                - Return a JSON object with:
-                  - "collection": "name"
-                  - "operation": "find" or "aggregate"
-                  - "filter": {{}} (for find)
-                  - "pipeline": [] (for aggregate)
-                - Do NOT use JavaScript connection code or `db.collection` syntax. Just the JSON.
-
-            4.  **Context**:
-                - Use the provided conversation history for context.
-
-            {tools_instruction}
-            ### Internal Database Schema
-            {schema}
-            ### Conversation History
-            {history}
-            ### Your Response
-            """
-
-        elif engine == "redis":
-            return f"""
-            You are an expert Redis Command Generator.
-            You are NOT a conversational assistant. You are a code generation engine.
-            Your ONLY purpose is to output valid Redis CLI commands.
-
-            ### Instructions
-            1.  **Response Format**:
-                - Output the Redis command inside ```redis``` markdown blocks.
-                - **NO** introductory text.
-                - **ONLY** the command.
-
-            2.  **Orchestration**:
-                - If the user asks for data, generate the appropriate Redis command.
-                - Common commands: GET, SET, HGETALL, HGET, HSET, KEYS, SCAN, LRANGE, etc.
-
-            {tools_instruction}
-            ### Internal Database Schema (Sample Keys)
-            {schema}
-            ### Conversation History
-            {history}
-            ### Your Response
-            """
-
-        else:
-            # Fallback for unknown engines
-            return f"""
-            You are a helpful database query assistant for a {engine} database.
-            
-            ### Instructions
-            Generate appropriate queries based on the user's request.
-            
-            {tools_instruction}
-            ### Database Schema
-            {schema}
-            ### Conversation History
-            {history}
-            ### Your Response
-            """
-
-    def _build_chat_system_prompt(self, schema: str, engine: str, tools: List[Dict[str, Any]] = None) -> str:
-        tools_instruction = ""
-        if tools:
-            import json
-            tools_json = json.dumps(tools, indent=2)
-            tools_instruction = f"""
-            ### Available Tools
-            You have access to the following tools:
-            {tools_json}
-
-            To use a tool, you MUST use the following format:
-            Thought: Do I need to use a tool? Yes
-            Action: the name of the tool to use
-            Action Input: the input to the tool in JSON format
-            Observation: <leave this blank>
-            
-            When you have a final answer, or if you don't need to use a tool, use:
-            Thought: Do I need to use a tool? No
-            Final Answer: [your response here]
-            """
-
-        if engine in ["postgresql", "mysql", "sqlite"]:
-            return f"""
-            You are an expert SQL Query Generator for a {engine.upper()} database.
-            You are NOT a conversational assistant. You are a code generation engine.
-            Your ONLY purpose is to output valid SQL queries.
-
-            ### Instructions
-            1.  **Response Format**:
-                - Output the SQL query inside ```sql``` markdown blocks.
-                - **NO** introductory text (e.g., "Here is the query").
-                - **NO** explaining the query unless asked.
-                - **ONLY** the SQL block when generating a query.
-
-            2.  **Orchestration**:
-                - If the user asks for data, generate a SQL SELECT query.
-                - **ONLY generate SELECT statements.** Never generate INSERT, UPDATE, DELETE, DROP, or DDL.
-                - If the user asks a general question *unrelated* to data retrieval, you may answer briefly.
-
-            3.  **SQL Query Guidelines**:
-                - Use proper JOIN syntax when combining tables.
-                - Use appropriate WHERE clauses for filtering.
-                - Use ORDER BY for sorting, LIMIT for pagination.
-                - Use aggregate functions (COUNT, SUM, AVG, etc.) when needed.
-
-            4.  **Context**:
-                - Use the provided conversation history for context.
-
-            {tools_instruction}
-            ### Internal Database Schema
-            {schema}
-            """
-
-        elif engine == "mongodb":
-            return f"""
-            You are an expert MongoDB Query Generator. 
+            return """
+            You are an expert MongoDB Query Generator.
             You are NOT a conversational assistant. You are a code generation engine.
             Your ONLY purpose is to output valid JSON configuration for MongoDB queries.
 
@@ -423,20 +533,16 @@ class LLMService:
                 - Return a JSON object with:
                   - "collection": "name"
                   - "operation": "find" or "aggregate"
-                  - "filter": {{}} (for find)
+                  - "filter": {} (for find)
                   - "pipeline": [] (for aggregate)
                 - Do NOT use JavaScript connection code or `db.collection` syntax. Just the JSON.
 
             4.  **Context**:
                 - Use the provided conversation history for context.
-
-            {tools_instruction}
-            ### Internal Database Schema
-            {schema}
             """
 
         elif engine == "redis":
-            return f"""
+            return """
             You are an expert Redis Command Generator.
             You are NOT a conversational assistant. You are a code generation engine.
             Your ONLY purpose is to output valid Redis CLI commands.
@@ -450,30 +556,24 @@ class LLMService:
             2.  **Orchestration**:
                 - If the user asks for data, generate the appropriate Redis command.
                 - Common commands: GET, SET, HGETALL, HGET, HSET, KEYS, SCAN, LRANGE, etc.
-
-            {tools_instruction}
-            ### Internal Database Schema (Sample Keys)
-            {schema}
             """
 
         else:
+            # Fallback for unknown engines
             return f"""
             You are a helpful database query assistant for a {engine} database.
-            
+
             ### Instructions
             Generate appropriate queries based on the user's request.
-            
-            {tools_instruction}
-            ### Database Schema
-            {schema}
             """
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
     async def _generate_with_gemini(self, prompt: str, engine: str) -> GeneratedQuery:
         try:
             model_name = self.config["providers"]["gemini"]["model"]
             model = genai.GenerativeModel(model_name)
-            response = await model.generate_content_async(prompt)
+            async with self._provider_slot("gemini"):
+                response = await model.generate_content_async(prompt)
             raw_text = ""
             if response.candidates and response.candidates[0].content.parts:
                 raw_text = response.candidates[0].content.parts[0].text
@@ -495,7 +595,7 @@ class LLMService:
             # Raise for retry unless it's a fatal error? For simplicity retry all exceptions for now
             raise e
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
     async def _generate_with_chatgpt(self, prompt: str, engine: str) -> GeneratedQuery:
         if not self.openai_client:
             return GeneratedQuery(
@@ -505,22 +605,23 @@ class LLMService:
             )
         try:
             model_name = self.config["providers"]["chatgpt"]["model"]
-            response = self.openai_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that converts natural language to database queries.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-            )
+            async with self._provider_slot("chatgpt"):
+                response = await self.openai_client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant that converts natural language to database queries.",
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                )
             raw_text = response.choices[0].message.content.strip()
             return self._parse_llm_response(raw_text, engine)
         except Exception as e:
             raise e
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
     async def _generate_with_groq(self, prompt: str, engine: str) -> GeneratedQuery:
         if not self.groq_client:
             return GeneratedQuery(
@@ -530,21 +631,27 @@ class LLMService:
             )
         try:
             model_name = self.config["providers"]["groq"]["model"]
-            response = await self.groq_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that converts natural language to database queries.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-            )
+            async with self._provider_slot("groq"):
+                response = await self.groq_client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant that converts natural language to database queries.",
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                )
             raw_text = response.choices[0].message.content.strip()
             return self._parse_llm_response(raw_text, engine)
         except Exception as e:
             raise e
 
+    async def _generate_with_local(self, prompt: str, engine: str) -> GeneratedQuery:
+        async with self._provider_slot("local"):
+            raw_text = await get_local_llm().complete(prompt, [ChatMessage(role="user", content=prompt)], engine)
+        return self._parse_llm_response(raw_text, engine)
+
     def _parse_llm_response(self, text: str, engine: str) -> GeneratedQuery:
         print(f"DEBUG: Raw LLM Response: {repr(text)}") 
 
@@ -654,20 +761,37 @@ class LLMService:
         else:
             return GeneratedQuery(raw_query=text, query_type=engine)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def _generate_chat_with_gemini(self, prompt: str) -> str:
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
+    async def _generate_chat_with_gemini(self, prompt: str, static_prefix: str = "") -> str:
+        model, contents, cached = await self._gemini_request(prompt, static_prefix)
         try:
-            model_name = self.config["providers"]["gemini"]["model"]
-            model = genai.GenerativeModel(model_name)
-            response = await model.generate_content_async(prompt)
+            async with self._provider_slot("gemini"):
+                response = await model.generate_content_async(contents)
             if response.candidates and response.candidates[0].content.parts:
                 return response.candidates[0].content.parts[0].text
             else:
                 return "Error from Gemini API: Received an empty or blocked response."
         except Exception as e:
+            if cached:
+                # The retry goes out uncached
+                get_gemini_context_cache().invalidate(self.config["providers"]["gemini"]["model"], static_prefix)
             raise e
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    async def _gemini_request(self, prompt: str, static_prefix: str = ""):
+        """
+        Model and contents for a Gemini call. When `prompt` starts with a static prefix
+        large enough for an explicit context cache (llm.prompt_cache), the prefix is
+        served from the cache and only the rest of the prompt is sent.
+        Returns (model, contents, used_cache).
+        """
+        model_name = self.config["providers"]["gemini"]["model"]
+        if static_prefix and prompt.startswith(static_prefix):
+            cached_content = await get_gemini_context_cache().get(model_name, static_prefix)
+            if cached_content is not None:
+                return genai.GenerativeModel.from_cached_content(cached_content), prompt[len(static_prefix):], True
+        return genai.GenerativeModel(model_name), prompt, False
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
     async def _generate_chat_with_chatgpt(
         self, system_prompt: str, messages: List[ChatMessage]
     ) -> str:
@@ -676,18 +800,19 @@ class LLMService:
         try:
             model_name = self.config["providers"]["chatgpt"]["model"]
             formatted_messages = [{"role": m.role, "content": m.content} for m in messages]
-            response = self.openai_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    *formatted_messages,
-                ],
-            )
+            async with self._provider_slot("chatgpt"):
+                response = await self.openai_client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        *formatted_messages,
+                    ],
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
             raise e
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=should_retry_llm_call)
     async def _generate_chat_with_groq(
         self, system_prompt: str, messages: List[ChatMessage]
     ) -> str:
@@ -696,16 +821,87 @@ class LLMService:
         try:
             model_name = self.config["providers"]["groq"]["model"]
             formatted_messages = [{"role": m.role, "content": m.content} for m in messages]
-            response = await self.groq_client.chat.completions.create(
+            async with self._provider_slot("groq"):
+                response = await self.groq_client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        *formatted_messages,
+                    ],
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            raise e
+
+    async def _generate_chat_with_local(
+        self, system_prompt: str, messages: List[ChatMessage], engine: str
+    ) -> str:
+        async with self._provider_slot("local"):
+            return await get_local_llm().complete(system_prompt, messages, engine)
+
+    # Streaming calls are not retried: tokens may already have reached the client.
+    # Each holds its provider slot until the stream is finished.
+    async def _stream_chat_with_gemini(self, prompt: str, static_prefix: str = "") -> AsyncIterator[str]:
+        model, contents, cached = await self._gemini_request(prompt, static_prefix)
+        async with self._provider_slot("gemini"):
+            try:
+                response = await model.generate_content_async(contents, stream=True)
+            except Exception:
+                if cached:
+                    get_gemini_context_cache().invalidate(self.config["providers"]["gemini"]["model"], static_prefix)
+                raise
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].content.parts:
+                    yield chunk.candidates[0].content.parts[0].text
+
+    async def _stream_chat_with_chatgpt(
+        self, system_prompt: str, messages: List[ChatMessage]
+    ) -> AsyncIterator[str]:
+        if not self.openai_client:
+            yield "Error: OpenAI API key not configured."
+            return
+        model_name = self.config["providers"]["chatgpt"]["model"]
+        formatted_messages = [{"role": m.role, "content": m.content} for m in messages]
+        async with self._provider_slot("chatgpt"):
+            stream = await self.openai_client.chat.completions.create(
                 model=model_name,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     *formatted_messages,
                 ],
+                stream=True,
             )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            raise e
+            async for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+
+    async def _stream_chat_with_groq(
+        self, system_prompt: str, messages: List[ChatMessage]
+    ) -> AsyncIterator[str]:
+        if not self.groq_client:
+            yield "Error: Groq API key not configured."
+            return
+        model_name = self.config["providers"]["groq"]["model"]
+        formatted_messages = [{"role": m.role, "content": m.content} for m in messages]
+        async with self._provider_slot("groq"):
+            stream = await self.groq_client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    *formatted_messages,
+                ],
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+
+    async def _stream_chat_with_local(
+        self, system_prompt: str, messages: List[ChatMessage], engine: str
+    ) -> AsyncIterator[str]:
+        async with self._provider_slot("local"):
+            async for chunk in get_local_llm().stream(system_prompt, messages, engine):
+                yield chunk
 
     def _parse_chat_response(self, text: str, engine: str) -> ChatMessage:
         import re
@@ -779,27 +975,15 @@ class LLMService:
                 query=query,
             )
         
-        # Check for ReAct pattern
-        react_pattern = r"Action:\s*(.*?)\nAction Input:\s*(\{.*?\})"
-        react_match = re.search(react_pattern, text, re.DOTALL)
-        if react_match:
-            tool_name = react_match.group(1).strip()
-            tool_input = react_match.group(2).strip()
-            try:
-                import json
-                tool_args = json.loads(tool_input)
-                # Return a special message indicating a tool call
-                # We reuse 'query' field for the tool call details or create a new way
-                # For now, let's format it as a special internal command so the router can pick it up
-                # Or better, we trust the router to inspect the content if we mark it?
-                # Let's use the 'query' field to store the tool call JSON for now
-                tool_call_payload = json.dumps({"tool": tool_name, "args": tool_args})
-                return ChatMessage(
-                    role="assistant",
-                    content=text,  # Keep the thought process
-                    query=f"__TOOL_CALL__:{tool_call_payload}"
-                )
-            except:
-                pass
+        # Check for ReAct pattern (one or more independent Action / Action Input pairs)
+        tool_calls = _parse_tool_calls(text)
+        if tool_calls:
+            # The orchestrator picks tool calls up from the 'query' field
+            payload = tool_calls[0] if len(tool_calls) == 1 else {"calls": tool_calls}
+            return ChatMessage(
+                role="assistant",
+                content=text,  # Keep the thought process
+                query=f"__TOOL_CALL__:{json.dumps(payload)}"
+            )
 
         return ChatMessage(role="assistant", content=text)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import yaml
+
+from models.query import ChatMessage
+from services.chat_history import OBSERVATION_PREFIX
+from services.token_utils import estimate_tokens
+
+_DB_HEADER = re.compile(r"--- Database: .*?\(ID: ([^,]+), Engine: ([^)]+)\) ---")
+_TABLE_PATTERNS = [
+    re.compile(r"CREATE TABLE (?:IF NOT EXISTS )?[`\"\[]?(\w+)", re.IGNORECASE),
+    re.compile(r"^Table `?(\w+)`?:", re.MULTILINE),
+    re.compile(r"Collection: '([^']+)'"),
+]
+_REDIS_KEY = re.compile(r"Key: '([^']+)', Type: (\w+)")
+
+
+def _words(text: str) -> set:
+    return {word.rstrip("s") for word in re.findall(r"[a-z0-9]+", (text or "").lower())}
+
+
+class LocalLLM:
+    """
+    Deterministic stand-in provider ("local") for offline load and latency tests.
+
+    Responses come from the fixture rules file first: the first rule whose `match`
+    regex finds the latest user message (and whose `engine`, if set, matches) answers,
+    either with its `response` text or with ReAct calls to its `tool` or `calls` (only
+    when the prompt offers those tools); regex groups fill `{0}`, `{1}`... in each. Otherwise
+    a query is generated from the schema in the prompt: a read of the table the
+    question names, or of the first table.
+
+    Timing is simulated: `latency_ms` (+ up to `jitter_ms`, seeded by the prompt so
+    reruns match) before the first token, then `tokens_per_second` (0 = instant).
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.latency_ms = config.get("latency_ms", 300)
+        self.jitter_ms = config.get("jitter_ms", 0)
+        self.tokens_per_second = config.get("tokens_per_second", 50)
+        self.chunk_chars = config.get("chunk_chars", 16)
+        self.rules: List[Dict[str, Any]] = []
+        fixtures = config.get("fixtures")
+        if fixtures:
+            try:
+                with open(fixtures, "r") as f:
+                    self.rules = (yaml.safe_load(f) or {}).get("rules") or []
+            except FileNotFoundError:
+                print(f"WARNING: Local LLM fixtures not found at {fixtures}; using generated responses only")
+
+    def respond(self, system_prompt: str, messages: List[ChatMessage], engine: str) -> str:
+        question = next((m.content for m in reversed(messages) if m.role == "user"), "") or ""
+        for rule in self.rules:
+            if rule.get("engine") and rule["engine"] != engine:
+                continue
+            match = re.search(rule.get("match", ""), question)
+            if not match:
+                continue
+            fill = lambda value: value.format(*match.groups(), question=question) if isinstance(value, str) else value
+            calls = rule.get("calls") or ([{"tool": rule["tool"], "args": rule.get("args")}] if rule.get("tool") else [])
+            if calls:
+                if any(f'"name":"{call["tool"]}"' not in system_prompt for call in calls):
+                    continue
+                actions = [
+                    f"Action: {call['tool']}\n"
+                    f"Action Input: {json.dumps({key: fill(value) for key, value in (call.get('args') or {}).items()}, sort_keys=True)}"
+                    for call in calls
+                ]
+                return "Thought: Do I need to use a tool? Yes\n" + "\n".join(actions)
+            return fill(rule.get("response", ""))
+
+        if question.startswith(OBSERVATION_PREFIX):
+            observation = question[len(OBSERVATION_PREFIX):].strip()
+            return f"Thought: Do I need to use a tool? No\nFinal Answer: The tool returned: {observation[:200]}"
+        return self._generated_query(system_prompt, question, engine)
+
+    def _generated_query(self, prompt: str, question: str, engine: str) -> str:
+        db_prefix = ""
+        if engine == "multi-db":
+            header = _DB_HEADER.search(prompt)
+            if header is None:
+                return "I could not find a database to query."
+            db_prefix = f"DB_ID: {header.group(1)}\n"
+            engine = header.group(2)
+
+        if engine == "redis":
+            keys = _REDIS_KEY.findall(prompt)
+            if not keys:
+                return "```redis\nSCAN 0 COUNT 100\n```"
+            name, key_type = next((k for k in keys if _words(k[0]) & _words(question)), keys[0])
+            command = {"hash": "HGETALL", "list": "LRANGE", "set": "SMEMBERS", "zset": "ZRANGE"}.get(key_type, "GET")
+            suffix = " 0 -1" if command in ("LRANGE", "ZRANGE") else ""
+            return f"```redis\n{db_prefix}{command} {name}{suffix}\n```"
+
+        tables = []
+        for pattern in _TABLE_PATTERNS:
+            tables.extend(name for name in pattern.findall(prompt) if name not in tables)
+        if not tables:
+            return "I could not find any tables in the schema."
+        question_words = _words(question)
+        table = next((t for t in tables if _words(t.replace("_", " ")) <= question_words), tables[0])
+
+        if engine == "mongodb":
+            query = json.dumps({"collection": table, "operation": "find", "filter": {}})
+            return f"```json\n{db_prefix}{query}\n```"
+        tag = "sql" if engine in ["postgresql", "mysql", "sqlite"] else ""
+        return f"```{tag}\n{db_prefix}SELECT * FROM {table} LIMIT 10;\n```"
+
+    def _first_token_delay(self, prompt: str) -> float:
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            seed = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+            delay_ms += random.Random(seed).uniform(0, self.jitter_ms)
+        return delay_ms / 1000
+
+    async def complete(self, system_prompt: str, messages: List[ChatMessage], engine: str) -> str:
+        text = self.respond(system_prompt, messages, engine)
+        delay = self._first_token_delay(system_prompt + (messages[-1].content if messages else ""))
+        if self.tokens_per_second:
+            delay += estimate_tokens(text) / self.tokens_per_second
+        await asyncio.sleep(delay)
+        return text
+
+    async def stream(self, system_prompt: str, messages: List[ChatMessage], engine: str) -> AsyncIterator[str]:
+        text = self.respond(system_prompt, messages, engine)
+        await asyncio.sleep(self._first_token_delay(system_prompt + (messages[-1].content if messages else "")))
+        for start in range(0, len(text), self.chunk_chars):
+            chunk = text[start:start + self.chunk_chars]
+            if self.tokens_per_second and start:
+                await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+
+
+_local_llm: Optional[LocalLLM] = None
+
+
+def get_local_llm() -> LocalLLM:
+    """Process-wide local provider from `llm.providers.local` in config.yaml."""
+    global _local_llm
+    if _local_llm is None:
+        with open("config/config.yaml", "r") as f:
+            providers = (yaml.safe_load(f).get("llm") or {}).get("providers") or {}
+        _local_llm = LocalLLM(providers.get("local") or {})
+    return _local_llm
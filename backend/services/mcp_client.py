@@ -1,26 +1,56 @@
-import httpx
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
 from mcp.types import CallToolResult
 from typing import List, Dict, Any, Optional
-import asyncio
+
+from services.cassette import get_cassette
+from services.mcp_pool import McpSessionPool
+
+
+def _server_identity(connection_config: Dict[str, Any]) -> str:
+    """The server a connection points at (headers and env, which may hold secrets, are left out)."""
+    config = connection_config.get("configuration") or {}
+    if connection_config.get("type") == "stdio":
+        return " ".join([str(config.get("command"))] + [str(arg) for arg in config.get("args", [])])
+    return config.get("url") or connection_config.get("url") or ""
+
+
+def _tool_definitions(result) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.inputSchema
+        }
+        for tool in result.tools
+    ]
+
 
 class McpClientService:
     def __init__(self):
         pass
 
-    async def get_tools(self, connection_config: Dict[str, Any], headers: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    async def get_tools(self, connection_config: Dict[str, Any], headers: Dict[str, Any] = None, connection_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Recorded / replayed when a cassette is active (see services.cassette)
+        return await get_cassette().through(
+            "mcp.list_tools",
+            {"server": _server_identity(connection_config)},
+            lambda: self._get_tools(connection_config, headers, connection_id),
+        )
+
+    async def _get_tools(self, connection_config: Dict[str, Any], headers: Dict[str, Any] = None, connection_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Connects to an MCP server and fetches the list of available tools.
+        Fetches the list of available tools over the connection's pooled MCP session.
         Args:
             connection_config: Dict containing 'type' ('sse' or 'stdio') and 'configuration'.
+            connection_id: MCPConnection.id, which keys the pooled session.
         """
         conn_type = connection_config.get("type", "sse")
         config = connection_config.get("configuration", {})
         headers = headers or {}
-        
+        pool = McpSessionPool()
+
         if conn_type == "stdio":
-            return await self._get_tools_stdio(config)
+            result = await pool.run(connection_id, connection_config, headers, lambda session: session.list_tools())
+            return _tool_definitions(result)
         else:
             # Default to SSE
             url = config.get("url") or connection_config.get("url") # Fallback to top-level url if in config
@@ -28,22 +58,13 @@ class McpClientService:
                  raise ValueError("URL is required for SSE connections")
             
             try:
-                # SSE Implementation
-                async with sse_client(url=url, headers=headers) as streams:
-                    async with ClientSession(streams[0], streams[1]) as session:
-                        await session.initialize()
-                        result = await session.list_tools()
-                        return [
-                            {
-                                "name": tool.name,
-                                "description": tool.description,
-                                "inputSchema": tool.inputSchema
-                            }
-                            for tool in result.tools
-                        ]
-            except BaseException as e:
+                # SSE Implementation (long-lived session from the pool)
+                result = await pool.run(connection_id, connection_config, headers, lambda session: session.list_tools())
+                return _tool_definitions(result)
+            except Exception as e:
                 # Catch ExceptionGroup or other async errors to ensure fallback runs
-                # Also catch explicit 405 from underlying libs if they bubble up differently
+                # Also catch explicit 405 from underlying libs if they bubble up differently.
+                # Cancellation (e.g. a caller's timeout) is not a transport failure: let it through
                 print(f"Error fetching tools from {url} via standard SSE: {e}. Broad fallback initiated...")
                 
                 # Generic Fallback: If SSE fails (e.g. 405 Method Not Allowed), try stateless HTTP POST
@@ -57,50 +78,37 @@ class McpClientService:
                     # If fallback also fails, raise the original error or the new one
                     raise e2 from e
 
-    async def _get_tools_stdio(self, config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        from mcp.client.stdio import stdio_client
-        
-        command = config.get("command")
-        args = config.get("args", [])
-        env = config.get("env", {})
-        
-        server_params = StdioServerParameters(command=command, args=args, env=env)
-        
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.list_tools()
-                return [
-                    {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "inputSchema": tool.inputSchema
-                    }
-                    for tool in result.tools
-                ]
-
-    async def call_tool(self, connection_config: Dict[str, Any], tool_name: str, arguments: Dict[str, Any] = None, headers: Dict[str, Any] = None) -> Any:
+    async def call_tool(self, connection_config: Dict[str, Any], tool_name: str, arguments: Dict[str, Any] = None, headers: Dict[str, Any] = None, connection_id: Optional[int] = None) -> Any:
+        return await get_cassette().through(
+            "mcp.call_tool",
+            {"server": _server_identity(connection_config), "tool": tool_name, "arguments": arguments or {}},
+            lambda: self._call_tool(connection_config, tool_name, arguments, headers, connection_id),
+        )
+
+    async def _call_tool(self, connection_config: Dict[str, Any], tool_name: str, arguments: Dict[str, Any] = None, headers: Dict[str, Any] = None, connection_id: Optional[int] = None) -> Any:
         conn_type = connection_config.get("type", "sse")
         config = connection_config.get("configuration", {})
         headers = headers or {}
         arguments = arguments or {}
+        pool = McpSessionPool()
+
+        async def call(session) -> CallToolResult:
+            return await session.call_tool(name=tool_name, arguments=arguments)
 
         if conn_type == "stdio":
-            return await self._call_tool_stdio(config, tool_name, arguments)
+            return self._process_tool_result(await pool.run(connection_id, connection_config, headers, call))
         else:
             url = config.get("url") or connection_config.get("url")
             if not url:
                  raise ValueError("URL is required for SSE connections")
 
             try:
-                async with sse_client(url=url, headers=headers) as streams:
-                    async with ClientSession(streams[0], streams[1]) as session:
-                        await session.initialize()
-                        result: CallToolResult = await session.call_tool(name=tool_name, arguments=arguments)
-                        processed_res = self._process_tool_result(result)
-                        print(f"DEBUG: MCP Tool '{tool_name}' SSE Success. Output Snippet: {processed_res[:200]}...")
-                        return processed_res
-            except BaseException as e:
+                result = await pool.run(connection_id, connection_config, headers, call)
+                processed_res = self._process_tool_result(result)
+                print(f"DEBUG: MCP Tool '{tool_name}' SSE Success. Output Snippet: {processed_res[:200]}...")
+                return processed_res
+            except Exception as e:
+                 # Not BaseException: a cancelled (timed-out) call must not run again over HTTP
                  print(f"Error calling tool {tool_name} on {url} via standard SSE: {e}. Trying fallback HTTP...")
                  try:
                     params = {"name": tool_name, "arguments": arguments}
@@ -127,21 +135,6 @@ class McpClientService:
                     print(f"Error calling tool {tool_name} on {url} via fallback: {e2}")
                     raise e
 
-    async def _call_tool_stdio(self, config: Dict[str, Any], tool_name: str, arguments: Dict[str, Any]) -> str:
-        from mcp.client.stdio import stdio_client
-        
-        command = config.get("command")
-        args = config.get("args", [])
-        env = config.get("env", {})
-        
-        server_params = StdioServerParameters(command=command, args=args, env=env)
-        
-        async with stdio_client(server_params) as (read, write):
-             async with ClientSession(read, write) as session:
-                await session.initialize()
-                result: CallToolResult = await session.call_tool(name=tool_name, arguments=arguments)
-                return self._process_tool_result(result)
-
     def _process_tool_result(self, result: CallToolResult) -> str:
         output = []
         for content in result.content:
@@ -174,23 +167,24 @@ class McpClientService:
         
         print(f"DEBUG: Sending fallback request to {url} with headers {headers}")
         
-        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-            async with client.stream("POST", url, json=payload, headers=headers) as response:
-                if response.status_code >= 400:
-                    body = await response.aread()
-                    print(f"DEBUG: HTTP {response.status_code} Error Body: {body.decode('utf-8')}")
-                
-                response.raise_for_status()
-                
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        json_str = line[6:]
-                        try:
-                            data = json.loads(json_str)
-                            if "result" in data:
-                                return data["result"]
-                            if "error" in data:
-                                raise Exception(f"MCP Error: {data['error']}")
-                        except json.JSONDecodeError:
-                            continue
+        # Shared keep-alive client from the MCP session pool
+        client = McpSessionPool().http_client()
+        async with client.stream("POST", url, json=payload, headers=headers) as response:
+            if response.status_code >= 400:
+                body = await response.aread()
+                print(f"DEBUG: HTTP {response.status_code} Error Body: {body.decode('utf-8')}")
+            
+            response.raise_for_status()
+            
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    json_str = line[6:]
+                    try:
+                        data = json.loads(json_str)
+                        if "result" in data:
+                            return data["result"]
+                        if "error" in data:
+                            raise Exception(f"MCP Error: {data['error']}")
+                    except json.JSONDecodeError:
+                        continue
         raise Exception("Stream ended without valid result")
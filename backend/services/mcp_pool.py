@@ -0,0 +1,365 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+import httpx
+import yaml
+from mcp import ClientSession, StdioServerParameters
+from mcp import types as mcp_types
+from mcp.client.sse import sse_client
+from mcp.shared.exceptions import McpError
+
+# Failures that mean the session's transport is gone, for every call sharing it
+_TRANSPORT_ERRORS = (
+    OSError,
+    EOFError,
+    httpx.TransportError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+class _PooledSession:
+    """
+    One long-lived MCP ClientSession (an SSE stream or a stdio subprocess). The
+    transport is opened and closed by its own task, since the underlying anyio
+    contexts must exit in the task that entered them; callers on other tasks send
+    requests through `session`, at most `max_concurrency` at a time.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        connection_config: Dict[str, Any],
+        headers: Dict[str, Any],
+        max_concurrency: int,
+        on_tools_changed: Optional[Callable[[str], None]] = None,
+    ):
+        self.key = key
+        self.connection_config = connection_config
+        self.headers = headers
+        self.slot = asyncio.Semaphore(max_concurrency)
+        self.session: Optional[ClientSession] = None
+        self.error: Optional[BaseException] = None
+        self.in_use = 0
+        self.retired = False
+        self.calls = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self._ready = asyncio.Event()
+        self._close = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._on_tools_changed = on_tools_changed
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    def belongs_to_running_loop(self) -> bool:
+        return self._task is not None and self._task.get_loop() is asyncio.get_running_loop()
+
+    def _transport(self):
+        config = self.connection_config.get("configuration") or {}
+        if self.connection_config.get("type") == "stdio":
+            from mcp.client.stdio import stdio_client
+
+            return stdio_client(StdioServerParameters(
+                command=config.get("command"), args=config.get("args", []), env=config.get("env", {})
+            ))
+        url = config.get("url") or self.connection_config.get("url")
+        if not url:
+            raise ValueError("URL is required for SSE connections")
+        return sse_client(url=url, headers=self.headers)
+
+    async def _on_message(self, message):
+        if (
+            self._on_tools_changed is not None
+            and isinstance(message, mcp_types.ServerNotification)
+            and isinstance(message.root, mcp_types.ToolListChangedNotification)
+        ):
+            self._on_tools_changed(self.key)
+
+    async def _run(self):
+        try:
+            async with self._transport() as streams:
+                async with ClientSession(streams[0], streams[1], message_handler=self._on_message) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._close.wait()
+        except BaseException as e:
+            # Transport failures surface as ExceptionGroups from anyio task groups
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def open(self, timeout: float):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(f"MCP connection {self.key} did not initialize within {timeout}s")
+        if self.session is None:
+            raise ConnectionError(f"MCP connection {self.key} failed to initialize: {self.error}")
+
+    async def close(self, timeout: float = 5.0):
+        self._close.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+
+
+class McpSessionPool:
+    """
+    Process-wide pool of long-lived MCP client sessions, one per MCP connection
+    (keyed by MCPConnection.id plus a fingerprint of its configuration, so an edited
+    connection gets a fresh session). stdio servers stay running between calls and
+    SSE streams stay open; a session that dies is replaced on next use, and one idle
+    for longer than `health_check_seconds` is pinged before reuse. Each session takes
+    `max_concurrency` concurrent requests; sessions idle past `idle_timeout_seconds`
+    are closed by a background reaper. The stateless HTTP fallback shares one
+    keep-alive httpx client. Configured by `mcp_pool` in config.yaml.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        with open("config/config.yaml", "r") as f:
+            config = yaml.safe_load(f).get("mcp_pool") or {}
+        self.enabled = config.get("enabled", True)
+        self.max_concurrency = config.get("max_concurrency", 4)
+        self.idle_timeout = config.get("idle_timeout_seconds", 300)
+        self.health_check_interval = config.get("health_check_seconds", 30)
+        self.connect_timeout = config.get("connect_timeout_seconds", 15)
+        self.http_config = config.get("http") or {}
+        self._sessions: Dict[str, _PooledSession] = {}
+        self._opening: Dict[str, asyncio.Task] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tools_changed_listeners: List[Callable[[str], None]] = []
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    @staticmethod
+    def key_for(connection_id: Optional[int], connection_config: Dict[str, Any], headers: Dict[str, Any]) -> str:
+        fingerprint = hashlib.sha256(
+            json.dumps([connection_config, headers or {}], sort_keys=True, default=str).encode()
+        ).hexdigest()[:12]
+        return f"{connection_id or 'adhoc'}:{fingerprint}"
+
+    def on_tools_changed(self, listener: Callable[[str], None]):
+        """Registers `listener(key)` for a server's notifications/tools/list_changed."""
+        self._tools_changed_listeners.append(listener)
+
+    def _tools_changed(self, key: str):
+        print(f"DEBUG: MCP session {key} reported a changed tool list")
+        for listener in self._tools_changed_listeners:
+            listener(key)
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Keep-alive client for the stateless HTTP fallback (rebuilt per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._http_loop is not loop:
+            self._http_loop = loop
+            self._http = httpx.AsyncClient(
+                timeout=self.http_config.get("timeout_seconds", 60),
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.http_config.get("max_connections", 50),
+                    max_keepalive_connections=self.http_config.get("max_keepalive_connections", 10),
+                ),
+            )
+        return self._http
+
+    async def run(
+        self,
+        connection_id: Optional[int],
+        connection_config: Dict[str, Any],
+        headers: Dict[str, Any],
+        operation: Callable[[ClientSession], Awaitable[Any]],
+    ) -> Any:
+        """
+        Runs `operation(session)` on the connection's pooled session. A transport
+        failure (or a session that has died) closes the session, and the next call
+        reconnects; any other failure retires it: later calls get a new session and
+        this one is closed once its in-flight calls finish. Errors are re-raised;
+        operations are not retried here because tool calls may have side effects.
+        """
+        if not self.enabled:
+            return await self._run_unpooled(connection_config, headers, operation)
+
+        pooled = await self._acquire(self.key_for(connection_id, connection_config, headers), connection_config, headers)
+        pooled.in_use += 1
+        try:
+            async with pooled.slot:
+                result = await operation(pooled.session)
+            pooled.calls += 1
+            return result
+        except McpError:
+            # The server answered with an error; the session itself is fine
+            raise
+        except Exception as e:
+            if isinstance(e, _TRANSPORT_ERRORS) or not pooled.alive:
+                await self._discard(pooled)
+            else:
+                self._retire(pooled)
+            raise
+        finally:
+            pooled.in_use -= 1
+            pooled.last_used = time.monotonic()
+            if pooled.retired and not pooled.in_use:
+                await pooled.close()
+
+    async def _run_unpooled(self, connection_config, headers, operation):
+        pooled = _PooledSession("unpooled", connection_config, headers, 1)
+        await pooled.open(self.connect_timeout)
+        try:
+            return await operation(pooled.session)
+        finally:
+            await pooled.close()
+
+    async def _acquire(self, key: str, connection_config: Dict[str, Any], headers: Dict[str, Any]) -> _PooledSession:
+        pooled = self._sessions.get(key)
+        if pooled is not None and not pooled.belongs_to_running_loop():
+            # Sessions can't move across event loops; drop it without awaiting it
+            self._sessions.pop(key, None)
+            pooled = None
+        if pooled is not None and pooled.alive and await self._healthy(pooled):
+            self.reused += 1
+            return pooled
+        if pooled is not None:
+            self.reconnects += 1
+            await self._discard(pooled)
+
+        # Concurrent first calls share one handshake
+        opening = self._opening.get(key)
+        if opening is None or opening.get_loop() is not asyncio.get_running_loop():
+            opening = asyncio.create_task(self._open(key, connection_config, headers))
+            self._opening[key] = opening
+            opening.add_done_callback(lambda task, key=key: self._opened(key, task))
+        return await asyncio.shield(opening)
+
+    def _opened(self, key: str, task: asyncio.Task):
+        if self._opening.get(key) is task:
+            del self._opening[key]
+        if not task.cancelled():
+            # Mark the exception retrieved; waiters re-raise it themselves
+            task.exception()
+
+    async def _open(self, key: str, connection_config: Dict[str, Any], headers: Dict[str, Any]) -> _PooledSession:
+        pooled = _PooledSession(key, connection_config, headers, self.max_concurrency, self._tools_changed)
+        await pooled.open(self.connect_timeout)
+        self._sessions[key] = pooled
+        self.opened += 1
+        print(f"DEBUG: Opened pooled MCP session {key} ({connection_config.get('type', 'sse')})")
+        self._ensure_reaper()
+        return pooled
+
+    async def _healthy(self, pooled: _PooledSession) -> bool:
+        now = time.monotonic()
+        if pooled.in_use or now - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), self.connect_timeout)
+            pooled.last_checked = now
+            return True
+        except Exception as e:
+            print(f"WARNING: Pooled MCP session {pooled.key} failed its health check ({e}); reconnecting")
+            return False
+
+    def _retire(self, pooled: _PooledSession):
+        """Takes the session out of the pool without interrupting calls still using it."""
+        pooled.retired = True
+        if self._sessions.get(pooled.key) is pooled:
+            del self._sessions[pooled.key]
+
+    async def _discard(self, pooled: _PooledSession):
+        if self._sessions.get(pooled.key) is pooled:
+            del self._sessions[pooled.key]
+        await pooled.close()
+
+    def _ensure_reaper(self):
+        if (
+            self._reaper is None
+            or self._reaper.done()
+            or self._reaper.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def expire_idle(self) -> int:
+        """Closes sessions idle past the timeout. Returns how many were closed."""
+        now = time.monotonic()
+        idle = [
+            pooled for pooled in self._sessions.values()
+            if not pooled.in_use and now - pooled.last_used > self.idle_timeout
+        ]
+        for pooled in idle:
+            await self._discard(pooled)
+        return len(idle)
+
+    async def _reap_idle(self):
+        interval = max(1.0, self.idle_timeout / 4)
+        while self._sessions:
+            await asyncio.sleep(interval)
+            closed = await self.expire_idle()
+            if closed:
+                print(f"DEBUG: Closed {closed} idle MCP session(s)")
+
+    async def close_connection(self, connection_id: int) -> int:
+        """Closes every pooled session of one MCP connection (e.g. once it is deleted)."""
+        prefix = f"{connection_id}:"
+        closing = [pooled for key, pooled in self._sessions.items() if key.startswith(prefix)]
+        for pooled in closing:
+            await self._discard(pooled)
+        return len(closing)
+
+    async def close_all(self):
+        for pooled in list(self._sessions.values()):
+            if pooled.belongs_to_running_loop():
+                await self._discard(pooled)
+        self._sessions.clear()
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        if self._http is not None:
+            http, self._http = self._http, None
+            await http.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "idle_timeout_seconds": self.idle_timeout,
+            "opened": self.opened,
+            "reused": self.reused,
+            "reconnects": self.reconnects,
+            "sessions": {
+                key: {
+                    "type": pooled.connection_config.get("type", "sse"),
+                    "alive": pooled.alive,
+                    "in_use": pooled.in_use,
+                    "calls": pooled.calls,
+                    "age_seconds": round(now - pooled.created_at, 1),
+                    "idle_seconds": round(now - pooled.last_used, 1),
+                }
+                for key, pooled in self._sessions.items()
+            },
+        }
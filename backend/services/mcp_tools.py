@@ -0,0 +1,161 @@
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from services.mcp_pool import McpSessionPool
+from services.single_flight import SingleFlight
+
+# Separates a connection's namespace from the tool name for colliding tool names
+NAMESPACE_SEPARATOR = "__"
+
+
+def connection_config(connection) -> Dict[str, Any]:
+    """The connection_config dict McpClientService expects, from an MCPConnection row."""
+    return {
+        "type": connection.connection_type,
+        "url": connection.url,
+        "configuration": connection.configuration or {}
+    }
+
+
+def _namespace(connection) -> str:
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", connection.name or "").strip("_")
+    return slug or f"mcp{connection.id}"
+
+
+class ToolRoute:
+    def __init__(self, connection, tool_name: str):
+        self.connection = connection
+        self.tool_name = tool_name
+
+
+class ToolIndex:
+    """
+    The tools of a request's active MCP connections, as advertised to the model, and
+    the connection that owns each one, so a tool call goes straight to its server.
+    A name offered by several connections is advertised once per connection as
+    "<connection name>__<tool>"; unique names are left as they are.
+    """
+
+    def __init__(self):
+        self.tools: List[Dict[str, Any]] = []
+        self.routes: Dict[str, ToolRoute] = {}
+
+    @classmethod
+    def build(cls, catalogs: List[Tuple[Any, List[Dict[str, Any]]]]) -> "ToolIndex":
+        index = cls()
+        owners: Dict[str, int] = {}
+        for _, tools in catalogs:
+            for name in {tool["name"] for tool in tools}:
+                owners[name] = owners.get(name, 0) + 1
+
+        for connection, tools in catalogs:
+            for tool in tools:
+                original = tool["name"]
+                name = original
+                if owners[original] > 1:
+                    name = f"{_namespace(connection)}{NAMESPACE_SEPARATOR}{original}"
+                if name in index.routes:
+                    continue
+                index.routes[name] = ToolRoute(connection, original)
+                index.tools.append(tool if name == original else {**tool, "name": name})
+        return index
+
+    def resolve(self, name: str) -> Optional[ToolRoute]:
+        return self.routes.get(name)
+
+
+class ToolCatalogCache:
+    """
+    Tool lists per MCP connection, kept for `ttl_seconds` and dropped early when the
+    server sends notifications/tools/list_changed over its pooled session. Entries
+    are keyed like pooled sessions (connection id plus a configuration fingerprint);
+    concurrent misses for one connection share a single tools/list request.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            return await fetch()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return await self._single_flight.do(key, lambda: self._fill(key, fetch))
+
+    async def _fill(self, key: str, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        tools = await fetch()
+        self._entries[key] = (tools, time.monotonic() + self.ttl_seconds)
+        return tools
+
+    def invalidate(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_connection(self, connection_id: int):
+        prefix = f"{connection_id}:"
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self.invalidate(key)
+
+    async def load(self, client, connections: List[Any]) -> ToolIndex:
+        """Fetches the catalogs of `connections` concurrently and indexes them."""
+
+        async def catalog(connection) -> Optional[List[Dict[str, Any]]]:
+            config = connection_config(connection)
+            key = McpSessionPool.key_for(connection.id, config, connection.headers or {})
+            try:
+                return await self.get(
+                    key, lambda: client.get_tools(connection_config=config, headers=connection.headers, connection_id=connection.id)
+                )
+            except Exception as e:
+                print(f"Failed to fetch tools from {connection.name}: {e}")
+                return None
+
+        catalogs = await asyncio.gather(*(catalog(connection) for connection in connections))
+        return ToolIndex.build([
+            (connection, tools) for connection, tools in zip(connections, catalogs) if tools is not None
+        ])
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": sum(1 for _, expires_at in self._entries.values() if expires_at > now),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+_tool_catalog: Optional[ToolCatalogCache] = None
+
+
+def get_tool_catalog() -> ToolCatalogCache:
+    """
+    Process-wide tool catalog cache built from the `mcp_pool.tool_catalog` block of
+    config.yaml (enabled, ttl_seconds), invalidated by the session pool's tool list
+    change notifications.
+    """
+    global _tool_catalog
+    if _tool_catalog is None:
+        with open("config/config.yaml", "r") as f:
+            catalog_config = (yaml.safe_load(f).get("mcp_pool") or {}).get("tool_catalog") or {}
+        _tool_catalog = ToolCatalogCache(
+            ttl_seconds=catalog_config.get("ttl_seconds", 300),
+            enabled=catalog_config.get("enabled", True),
+        )
+        McpSessionPool().on_tools_changed(_tool_catalog.invalidate)
+    return _tool_catalog
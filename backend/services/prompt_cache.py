@@ -0,0 +1,164 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from services.single_flight import SingleFlight
+from services.token_utils import estimate_tokens
+
+try:
+    from google.generativeai import caching as genai_caching
+except ImportError:
+    genai_caching = None
+
+# Local entries are dropped this long before the server-side cache expires
+GEMINI_EXPIRY_MARGIN_SECONDS = 60
+# After a failed cache creation, the same prefix is sent uncached for this long
+GEMINI_FAILURE_BACKOFF_SECONDS = 300
+
+
+def canonical_tools_json(tools: Optional[List[Dict[str, Any]]]) -> str:
+    """Tool definitions serialized byte-stably: ordered by name, sorted keys, no padding."""
+    ordered = sorted(tools or [], key=lambda tool: str(tool.get("name", "")))
+    return json.dumps(ordered, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode()).hexdigest()[:32]
+
+
+class PromptPrefixCache:
+    """
+    LRU of compiled static prompt prefixes (instructions, tools, schema), keyed by
+    (kind, engine, schema hash, tools hash). Equal inputs always give the identical
+    string, which is what provider-side prefix caching keys on.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Tuple[str, ...], build: Callable[[], str]) -> str:
+        prefix = self._entries.get(key)
+        if prefix is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prefix
+        self.misses += 1
+        prefix = build()
+        self._entries[key] = prefix
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return prefix
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class GeminiContextCache:
+    """
+    Explicit Gemini context caches (CachedContent) for static prefixes of at least
+    `min_tokens` estimated tokens. A prefix is uploaded once per model and reused
+    until shortly before its TTL ends; concurrent requests share one upload. Any
+    failure (unsupported model, prefix under the API minimum, quota) is logged and
+    the request goes out uncached.
+    """
+
+    def __init__(self, enabled: bool = False, min_tokens: int = 4096, ttl_seconds: int = 3600):
+        self.enabled = enabled and genai_caching is not None
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._creating = SingleFlight()
+        self.created = 0
+        self.reused = 0
+        self.failures = 0
+
+    async def get(self, model_name: str, prefix: str) -> Optional[Any]:
+        if not self.enabled or estimate_tokens(prefix) < self.min_tokens:
+            return None
+        key = f"{model_name}:{content_hash(prefix)}"
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            self.reused += 1
+            return entry[0]
+        if self._failed_until.get(key, 0) > now:
+            return None
+        return await self._creating.do(key, lambda: self._create(key, model_name, prefix))
+
+    async def _create(self, key: str, model_name: str, prefix: str) -> Optional[Any]:
+        try:
+            cached = await asyncio.to_thread(
+                genai_caching.CachedContent.create,
+                model=model_name,
+                display_name=f"mcp-nocode-db-{key.rsplit(':', 1)[-1][:12]}",
+                system_instruction=prefix,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            self.failures += 1
+            self._failed_until[key] = time.monotonic() + GEMINI_FAILURE_BACKOFF_SECONDS
+            print(f"WARNING: Gemini context cache creation failed for {model_name}: {e}")
+            return None
+
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+        self._entries[key] = (cached, now + max(0, self.ttl_seconds - GEMINI_EXPIRY_MARGIN_SECONDS))
+        self.created += 1
+        print(f"DEBUG: Created Gemini context cache for {model_name} (~{estimate_tokens(prefix)} tokens)")
+        return cached
+
+    def invalidate(self, model_name: str, prefix: str):
+        """Forgets a cache the API rejected (e.g. expired early); the prefix goes uncached for a while."""
+        key = f"{model_name}:{content_hash(prefix)}"
+        self._entries.pop(key, None)
+        self._failed_until[key] = time.monotonic() + GEMINI_FAILURE_BACKOFF_SECONDS
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "min_tokens": self.min_tokens,
+            "ttl_seconds": self.ttl_seconds,
+            "live": sum(1 for _, expires_at in self._entries.values() if expires_at > time.monotonic()),
+            "created": self.created,
+            "reused": self.reused,
+            "failures": self.failures,
+        }
+
+
+_prefix_cache: Optional[PromptPrefixCache] = None
+_gemini_context_cache: Optional[GeminiContextCache] = None
+
+
+def _load_prompt_cache_config() -> Dict[str, Any]:
+    with open("config/config.yaml", "r") as f:
+        return (yaml.safe_load(f).get("llm") or {}).get("prompt_cache") or {}
+
+
+def get_prefix_cache() -> PromptPrefixCache:
+    global _prefix_cache
+    if _prefix_cache is None:
+        _prefix_cache = PromptPrefixCache(_load_prompt_cache_config().get("max_prefixes", 256))
+    return _prefix_cache
+
+
+def get_gemini_context_cache() -> GeminiContextCache:
+    """Process-wide Gemini context caches from `llm.prompt_cache` in config.yaml."""
+    global _gemini_context_cache
+    if _gemini_context_cache is None:
+        config = _load_prompt_cache_config()
+        _gemini_context_cache = GeminiContextCache(
+            enabled=config.get("gemini_context_cache", False),
+            min_tokens=config.get("gemini_min_tokens", 4096),
+            ttl_seconds=config.get("gemini_ttl_seconds", 3600),
+        )
+    return _gemini_context_cache
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from services.result_encoding import json_default
+
+# Quoted strings/identifiers are kept verbatim; everything else has runs of
+# whitespace collapsed, so reformatting a query doesn't change its fingerprint.
+_QUOTED_OR_SPACE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)|\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical text for fingerprinting: JSON (Mongo) is re-serialized with sorted keys,
+    SQL has insignificant whitespace and a trailing semicolon removed."""
+    stripped = query.strip()
+    if stripped.startswith("{"):
+        try:
+            return json.dumps(json.loads(stripped), sort_keys=True, separators=(",", ":"))
+        except json.JSONDecodeError:
+            pass
+    normalized = _QUOTED_OR_SPACE.sub(lambda m: m.group(1) or " ", stripped)
+    return normalized.rstrip("; ").strip()
+
+
+def query_fingerprint(db_id: str, query: str, params: Optional[Dict[str, Any]] = None) -> str:
+    params_text = json.dumps(params or {}, sort_keys=True, default=json_default)
+    raw = f"{db_id}\x00{normalize_query(query)}\x00{params_text}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _bounded_size(value: Any, limit: int) -> Optional[int]:
+    """
+    Approximate JSON size of a result, or None as soon as it passes `limit`. Lists are
+    walked item by item (nested lists, e.g. columnar values, included) so an oversized
+    result is rejected without encoding all of it.
+    """
+    if isinstance(value, dict):
+        size = 2
+        for key, item in value.items():
+            size += len(str(key)) + 4
+            item_size = _bounded_size(item, limit - size)
+            if item_size is None:
+                return None
+            size += item_size
+    elif isinstance(value, list):
+        size = 2
+        for item in value:
+            item_size = _bounded_size(item, limit - size) if isinstance(item, list) else len(
+                json.dumps(item, default=json_default)
+            )
+            if item_size is None:
+                return None
+            size += item_size + 2
+            if size > limit:
+                return None
+    else:
+        size = len(json.dumps(value, default=json_default))
+    return size if size <= limit else None
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies a cached result's dicts and lists (rows, columnar values); row dicts are shared."""
+    copied = {}
+    for key, value in result.items():
+        if isinstance(value, list):
+            value = [list(item) if isinstance(item, list) else item for item in value]
+        elif isinstance(value, dict):
+            value = _copy_result(value)
+        copied[key] = value
+    return copied
+
+
+class QueryResultCache:
+    """
+    Byte-bounded LRU of read-only query results, keyed by query_fingerprint.
+
+    Entry size approximates the length of the result's JSON encoding, which tracks
+    what the entry would cost to ship; results larger than max_entry_bytes are not
+    cached, and measuring stops as soon as a result is known to be too large.
+    Entries expire after the TTL given when they were stored. get() returns copies
+    of the cached lists, so callers may pop or reshape them; the row dicts inside
+    are shared and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max(1, max_bytes // 8)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return _copy_result(entry["result"])
+
+    def put(self, key: str, db_id: str, result: Dict[str, Any], ttl: float) -> bool:
+        if ttl <= 0:
+            return False
+        try:
+            size = _bounded_size(result, self.max_entry_bytes)
+        except (TypeError, ValueError):
+            return False
+        if size is None:
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = {
+            "db_id": db_id,
+            "result": result,
+            "size": size,
+            "expires_at": time.monotonic() + ttl,
+        }
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, db_id: Optional[str] = None) -> int:
+        """Drops every entry for `db_id` (or everything). Returns how many were dropped."""
+        keys = [k for k, e in self._entries.items() if db_id is None or e["db_id"] == db_id]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry["size"]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,219 @@
+import asyncio
+import secrets
+import time
+from typing import Dict, Any, Optional, AsyncIterator
+
+from services.db_manager import DbManager
+
+
+class CursorExpiredError(Exception):
+    """Raised when a continuation token is unknown, expired or owned by someone else."""
+
+
+class _ResultCursor:
+    def __init__(self, username: str, db_id: str, query: str, page_size: int):
+        self.username = username
+        self.db_id = db_id
+        self.query = query
+        self.page_size = page_size
+        self.offset = 0
+        self.columns = None
+        # Held mode: an open execute_query_stream generator plus one batch of lookahead.
+        # Stateless mode: stream is None and each page re-executes with LIMIT/OFFSET.
+        self.stream: Optional[AsyncIterator[Dict[str, Any]]] = None
+        self.lookahead: Optional[Dict[str, Any]] = None
+        self.last_used = time.monotonic()
+
+
+class ResultCursorRegistry:
+    """
+    Paginated query execution with opaque continuation tokens.
+
+    Engines with server-side cursors keep their execute_query_stream generator open
+    between pages, so each page is a cheap fetch on the held cursor. A held cursor
+    keeps a pooled connection checked out, so each database holds at most `max_held`
+    cursors, and never more than its pool's `max_size` minus `reserved_connections`.
+    Connectors without cursor support, or any request arriving while its database is
+    at that limit, fall back to re-executing the query with LIMIT/OFFSET per page
+    (see BaseConnector.paginate_query) and pin nothing.
+
+    Cursors idle for longer than `idle_timeout` seconds are closed by a background
+    reaper, which releases the pooled connection they were holding.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        config = DbManager().config.get("result_pagination") or {}
+        self.idle_timeout = config.get("idle_timeout_seconds", 120)
+        self.max_held = config.get("max_held_cursors_per_db", 8)
+        self.reserved_connections = config.get("reserved_connections", 2)
+        self.max_page_size = config.get("max_page_size", 5000)
+        self._cursors: Dict[str, _ResultCursor] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def held_count(self, db_id: Optional[str] = None) -> int:
+        return sum(
+            1 for cursor in self._cursors.values()
+            if cursor.stream is not None and (db_id is None or cursor.db_id == db_id)
+        )
+
+    def held_limit(self, connector) -> int:
+        """How many cursors may be held on `connector`'s database at once."""
+        pool_size = getattr(connector, "max_size", None)
+        if pool_size is None:
+            return self.max_held
+        return max(0, min(self.max_held, pool_size - self.reserved_connections))
+
+    async def open(self, username: str, db_id: str, query: str, page_size: int) -> Dict[str, Any]:
+        """Executes `query` and returns its first page, with `next_page_token` when more remain."""
+        db_manager = DbManager()
+        connector = db_manager.get_connector(db_id)
+        page_size = max(1, min(page_size, self.max_page_size))
+        cursor = _ResultCursor(username, db_id, query, page_size)
+
+        if connector.supports_server_cursors and self.held_count(db_id) < self.held_limit(connector):
+            cursor.stream = db_manager.execute_query_stream(db_id, query, page_size)
+            try:
+                cursor.lookahead = await cursor.stream.__anext__()
+            except StopAsyncIteration:
+                cursor.lookahead = None
+            except Exception:
+                await cursor.stream.aclose()
+                raise
+            return await self._next_held_page(cursor)
+
+        if connector.paginate_query(query, 0, 1) is None:
+            # Neither cursors nor LIMIT/OFFSET available: a single, complete page.
+            return await db_manager.execute_query(db_id, query)
+        return await self._next_stateless_page(cursor)
+
+    async def next_page(self, token: str, username: str) -> Dict[str, Any]:
+        # Tokens are single-use: taking the cursor out of the registry also keeps the
+        # reaper and concurrent requests for the same token away from it.
+        cursor = self._cursors.get(token)
+        if cursor is None or cursor.username != username:
+            raise CursorExpiredError("Continuation token is invalid or has expired; re-run the query.")
+        del self._cursors[token]
+        if cursor.stream is not None:
+            return await self._next_held_page(cursor)
+        return await self._next_stateless_page(cursor)
+
+    async def close(self, token: str, username: str) -> bool:
+        cursor = self._cursors.get(token)
+        if cursor is None or cursor.username != username:
+            return False
+        self._cursors.pop(token, None)
+        await self._close_cursor(cursor)
+        return True
+
+    async def close_all(self):
+        cursors = list(self._cursors.values())
+        self._cursors.clear()
+        for cursor in cursors:
+            await self._close_cursor(cursor)
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    async def _next_held_page(self, cursor: _ResultCursor) -> Dict[str, Any]:
+        batch = cursor.lookahead
+        try:
+            cursor.lookahead = await cursor.stream.__anext__() if batch is not None else None
+        except StopAsyncIteration:
+            cursor.lookahead = None
+        except Exception:
+            await self._close_cursor(cursor)
+            raise
+
+        if batch is None:
+            batch = {"columns": cursor.columns or [], "rows": []}
+        page = self._page_from_batch(cursor, batch)
+        if cursor.lookahead is not None and ("rows" in cursor.lookahead or "json_result" in cursor.lookahead):
+            page["next_page_token"] = self._register(cursor)
+        else:
+            await self._close_cursor(cursor)
+        return page
+
+    async def _next_stateless_page(self, cursor: _ResultCursor) -> Dict[str, Any]:
+        db_manager = DbManager()
+        connector = db_manager.get_connector(cursor.db_id)
+        # Fetch one extra row to learn whether another page exists
+        paged_query = connector.paginate_query(cursor.query, cursor.offset, cursor.page_size + 1)
+        result = await db_manager.execute_query(cursor.db_id, paged_query)
+
+        if "rows" in result:
+            rows = result["rows"]
+            has_more = len(rows) > cursor.page_size
+            rows = rows[:cursor.page_size]
+            page = {"columns": result.get("columns"), "rows": rows, "rows_affected": len(rows)}
+        elif isinstance(result.get("json_result"), list):
+            docs = result["json_result"]
+            has_more = len(docs) > cursor.page_size
+            docs = docs[:cursor.page_size]
+            page = {"json_result": docs, "rows_affected": len(docs)}
+        else:
+            return result
+
+        cursor.offset += page["rows_affected"]
+        if has_more:
+            page["next_page_token"] = self._register(cursor)
+        return page
+
+    def _page_from_batch(self, cursor: _ResultCursor, batch: Dict[str, Any]) -> Dict[str, Any]:
+        if "rows" in batch and batch.get("columns") is not None:
+            cursor.columns = batch["columns"]
+            rows = [dict(zip(batch["columns"], row)) for row in batch["rows"]]
+            cursor.offset += len(rows)
+            return {"columns": batch["columns"], "rows": rows, "rows_affected": len(rows)}
+        if isinstance(batch.get("json_result"), list):
+            cursor.offset += len(batch["json_result"])
+            return {"json_result": batch["json_result"], "rows_affected": len(batch["json_result"])}
+        return batch
+
+    def _register(self, cursor: _ResultCursor) -> str:
+        token = secrets.token_urlsafe(24)
+        cursor.last_used = time.monotonic()
+        self._cursors[token] = cursor
+        if (
+            self._reaper is None
+            or self._reaper.done()
+            or self._reaper.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._reaper = asyncio.create_task(self._reap_idle())
+        return token
+
+    async def _close_cursor(self, cursor: _ResultCursor):
+        if cursor.stream is not None:
+            stream, cursor.stream = cursor.stream, None
+            try:
+                await stream.aclose()
+            except Exception as e:
+                print(f"WARNING: Failed to close result cursor on {cursor.db_id}: {e}")
+
+    async def expire_idle(self) -> int:
+        """Closes cursors idle past the timeout. Returns how many were expired."""
+        now = time.monotonic()
+        expired = [
+            token for token, cursor in self._cursors.items()
+            if now - cursor.last_used > self.idle_timeout
+        ]
+        for token in expired:
+            cursor = self._cursors.pop(token, None)
+            if cursor is not None:
+                await self._close_cursor(cursor)
+        return len(expired)
+
+    async def _reap_idle(self):
+        interval = max(1.0, self.idle_timeout / 4)
+        while self._cursors:
+            await asyncio.sleep(interval)
+            expired = await self.expire_idle()
+            if expired:
+                print(f"DEBUG: Expired {expired} idle result cursor(s)")
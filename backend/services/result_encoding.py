@@ -0,0 +1,95 @@
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps fallback for the driver types that show up in query results."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
+
+
+def encode_ndjson_line(payload: Any) -> bytes:
+    """One compact JSON document followed by a newline."""
+    return (json.dumps(payload, default=json_default, separators=(",", ":")) + "\n").encode()
+
+
+_TYPE_TAGS = [
+    # bool before int: bool is a subclass of int
+    (bool, "boolean"),
+    (int, "integer"),
+    (float, "float"),
+    (Decimal, "decimal"),
+    (str, "string"),
+    (datetime, "datetime"),
+    (date, "date"),
+    (time, "time"),
+    (timedelta, "interval"),
+    (uuid.UUID, "uuid"),
+    ((bytes, bytearray, memoryview), "bytes"),
+    ((dict, list), "json"),
+]
+
+
+def _tag_for_type(value_type: type) -> str:
+    for types, tag in _TYPE_TAGS:
+        if issubclass(value_type, types):
+            return tag
+    return "string"
+
+
+def column_type_tag(values: List[Any]) -> str:
+    """Type tag for one column: the shared tag of its non-null values, or "mixed"."""
+    tags = {_tag_for_type(t) for t in {type(v) for v in values} if t is not type(None)}
+    if not tags:
+        return "null"
+    if len(tags) == 1:
+        return tags.pop()
+    if tags == {"integer", "float"} or tags == {"integer", "decimal"}:
+        return "float" if "float" in tags else "decimal"
+    return "mixed"
+
+
+class ColumnarBuilder:
+    """
+    Accumulates row tuples (as yielded by execute_query_stream) into per-column
+    value arrays, transposing each batch with zip() so no per-row dict is built.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.values: List[List[Any]] = [[] for _ in self.columns]
+        self.row_count = 0
+
+    def add_rows(self, rows: Sequence[Sequence[Any]]):
+        if not rows:
+            return
+        for target, column_values in zip(self.values, zip(*rows)):
+            target.extend(column_values)
+        self.row_count += len(rows)
+
+    def build(self) -> Dict[str, Any]:
+        return {
+            "columns": self.columns,
+            "types": [column_type_tag(values) for values in self.values],
+            "values": self.values,
+            "row_count": self.row_count,
+        }
+
+
+def columnar_from_rows(columns: List[str], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar encoding for a result that was already materialized as dicts."""
+    builder = ColumnarBuilder(columns)
+    builder.add_rows([tuple(row.get(col) for col in columns) for row in rows])
+    return builder.build()
@@ -0,0 +1,193 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+_WORDS = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_PARTS = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+_FK_TARGET = re.compile(r"FK -> ([^,\s]+)\.([^,\s]+)")
+# SQLite schemas only carry their foreign keys in the CREATE TABLE text
+_DDL_REFERENCE = re.compile(r"REFERENCES\s+[\"`\[]?([A-Za-z0-9_]+)", re.IGNORECASE)
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "with", "from", "and", "or",
+    "is", "are", "was", "were", "be", "do", "doe", "did", "i", "me", "my", "we", "our", "you",
+    "show", "list", "get", "give", "find", "what", "which", "who", "how", "many", "much",
+    "all", "each", "per", "every", "there", "their", "that", "this", "these", "those", "it",
+    "please", "can", "could", "would", "tell", "return", "select", "query", "table", "tables",
+}
+
+# Table-name matches count for more than column matches, and a question naming
+# the whole table ("orders") prefers it over tables that merely share a word ("order_items")
+NAME_WEIGHT = 3
+FULL_NAME_BOOST = 2.0
+
+
+def _stem(token: str) -> str:
+    # Crude plural folding so "orders" matches "order" and "categories" matches "category"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits snake_case, camelCase and free text into lower-cased, plural-folded terms."""
+    tokens = []
+    for word in _WORDS.findall(text or ""):
+        for part in _CAMEL_PARTS.findall(word) or [word]:
+            token = _stem(part.lower())
+            if token and token not in _STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+
+class SchemaIndex:
+    """
+    BM25 index over one database's schema (the connector get_schema() shape). Each table
+    is a document made of its name (weighted), column/field names, optional comments and
+    the names of the tables its foreign keys point to. FK edges are kept in both
+    directions for neighbourhood expansion.
+    """
+
+    def __init__(self, schema: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tables = {table["name"]: table for table in schema}
+        self.order = [table["name"] for table in schema]
+        self.position: Dict[str, int] = {}
+        for i, name in enumerate(self.order):
+            self.position.setdefault(name, i)
+        self.neighbors: Dict[str, List[str]] = {name: [] for name in self.order}
+        self.term_freqs: Dict[str, Counter] = {}
+        self.name_terms: Dict[str, set] = {}
+        self.doc_freq: Counter = Counter()
+
+        for table in schema:
+            name = table["name"]
+            self.name_terms[name] = set(tokenize(name))
+            terms = tokenize(name) * NAME_WEIGHT + tokenize(table.get("comment") or "")
+            for column in table.get("columns") or []:
+                terms += tokenize(column.get("name", "")) + tokenize(column.get("comment") or "")
+                for ref_table, _ in _FK_TARGET.findall(column.get("extra") or ""):
+                    terms += tokenize(ref_table)
+                    self._link(name, ref_table)
+            for ref_table in _DDL_REFERENCE.findall(table.get("ddl") or ""):
+                terms += tokenize(ref_table)
+                self._link(name, ref_table)
+            for field in table.get("fields") or []:
+                terms += tokenize(str(field))
+            counts = Counter(terms)
+            self.term_freqs[name] = counts
+            self.doc_freq.update(counts.keys())
+
+        lengths = [sum(c.values()) for c in self.term_freqs.values()]
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    def _link(self, a: str, b: str):
+        if b not in self.tables or a == b:
+            return
+        if b not in self.neighbors[a]:
+            self.neighbors[a].append(b)
+        if a not in self.neighbors[b]:
+            self.neighbors[b].append(a)
+
+    def score(self, question: str) -> Dict[str, float]:
+        terms = set(tokenize(question))
+        n_docs = len(self.term_freqs)
+        scores: Dict[str, float] = {}
+        for name, counts in self.term_freqs.items():
+            length = sum(counts.values())
+            total = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                df = self.doc_freq[term]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1)))
+                total += idf * norm
+            if total > 0:
+                if self.name_terms[name] and self.name_terms[name] <= terms:
+                    total *= FULL_NAME_BOOST
+                scores[name] = total
+        return scores
+
+    def select(
+        self,
+        question: str,
+        table_tokens: Callable[[Dict[str, Any]], int],
+        top_k: int = 8,
+        token_budget: int = 4000,
+        fk_depth: int = 1,
+        fk_neighbors: int = 3,
+    ) -> Dict[str, Any]:
+        """
+        Picks the tables to show the model for `question`: the top_k BM25 matches,
+        then their best-scoring FK neighbours (at most fk_neighbors per table, up to
+        fk_depth hops), added greedily while the
+        running token estimate stays within token_budget. With no match at all,
+        tables are taken in schema order until the budget is spent.
+
+        Returns {"tables": [...], "decisions": [...], "selected_tokens", "total_tables"}
+        where each decision is {"table", "score", "reason", "included", "tokens"}.
+        """
+        scores = self.score(question)
+        ranked = sorted(scores, key=lambda name: (-scores[name], self.position[name]))
+
+        candidates = []  # (name, reason)
+        if ranked:
+            seeds = ranked[:top_k]
+            candidates = [(name, "match") for name in seeds]
+            seen = set(seeds)
+            frontier = list(seeds)
+            for _ in range(fk_depth):
+                next_frontier = []
+                for source in frontier:
+                    neighbours = sorted(self.neighbors[source], key=lambda n: -scores.get(n, 0.0))
+                    for neighbour in neighbours[:fk_neighbors]:
+                        if neighbour not in seen:
+                            seen.add(neighbour)
+                            candidates.append((neighbour, f"fk:{source}"))
+                            next_frontier.append(neighbour)
+                frontier = next_frontier
+            candidates += [(name, "below_top_k") for name in ranked[top_k:] if name not in seen]
+        else:
+            candidates = [(name, "fallback") for name in self.order]
+
+        decisions = []
+        selected = set()
+        used = 0
+        for name, reason in candidates:
+            cost = table_tokens(self.tables[name])
+            include = reason != "below_top_k" and (used + cost <= token_budget or not selected)
+            if include:
+                used += cost
+                selected.add(name)
+            decisions.append({
+                "table": name,
+                "score": round(scores.get(name, 0.0), 3),
+                "reason": reason if include or reason == "below_top_k" else f"{reason}:over_budget",
+                "included": include,
+                "tokens": cost,
+            })
+
+        return {
+            "tables": [self.tables[name] for name in self.order if name in selected],
+            "decisions": decisions,
+            "selected_tokens": used,
+            "total_tables": len(self.order),
+        }
+
+
+def question_from_history(messages: List[Any], max_user_turns: int = 3) -> str:
+    """
+    Retrieval text for a chat: the latest user turns (tool observations excluded), so
+    a follow-up like "and per month?" still matches the tables the thread is about.
+    """
+    turns = [
+        m.content for m in messages
+        if m.role == "user" and m.content and not m.content.startswith("Observation:")
+    ]
+    return "\n".join(turns[-max_user_turns:])
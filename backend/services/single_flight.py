@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the work
+    as a task and later callers await the same task instead of repeating it.
+
+    Every waiter gets the same result or the same exception. A waiter that is
+    cancelled only stops waiting; the shared work is cancelled once no waiter is
+    left. The key is released as soon as the work finishes, so results are never
+    served from here after the fact (that is the response cache's job).
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None or flight.task.get_loop() is not asyncio.get_running_loop():
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._release(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _release(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception retrieved; waiters (if any) re-raise it themselves
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,12 @@
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for budgeting prompts without a provider tokenizer.
+    ~4 characters per token holds reasonably for English and SQL identifiers
+    across the GPT, Gemini and Llama tokenizers.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / 4)
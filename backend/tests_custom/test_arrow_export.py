@@ -0,0 +1,82 @@
+import sys
+import os
+import io
+import pytest
+from decimal import Decimal
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from services.arrow_export import stream_arrow, flatten_document, EXTRA_FIELDS_COLUMN
+
+
+async def _collect(batches, parquet=False):
+    return b"".join([chunk async for chunk in stream_arrow(batches, parquet=parquet)])
+
+
+async def row_batches():
+    yield {"columns": ["id", "note", "amount"], "column_types": ["int4", "text", "numeric"],
+           "rows": [(1, None, Decimal("1.50")), (2, None, Decimal("2.25"))]}
+    yield {"columns": ["id", "note", "amount"], "rows": [(3, "late", None)]}
+
+
+@pytest.mark.asyncio
+async def test_rows_round_trip_through_ipc_stream():
+    table = pa.ipc.open_stream(await _collect(row_batches())).read_all()
+
+    assert table.schema.field("id").type == pa.int32()
+    # All-NULL in the first batch: kept as text so later values still fit
+    assert table.schema.field("note").type == pa.string()
+    assert table.column("id").to_pylist() == [1, 2, 3]
+    assert table.column("note").to_pylist() == [None, None, "late"]
+    assert table.num_rows == 3
+
+
+@pytest.mark.asyncio
+async def test_rows_round_trip_through_parquet():
+    table = pq.read_table(io.BytesIO(await _collect(row_batches(), parquet=True)))
+    # Unconstrained numeric is exported as exact text
+    assert table.column("amount").to_pylist() == ["1.50", "2.25", None]
+
+
+@pytest.mark.asyncio
+async def test_wider_numeric_values_in_a_later_batch_still_fit():
+    async def batches():
+        # Column types as PostgresConnector.execute_query_stream reports them (attr.type.name)
+        yield {"columns": ["amount"], "column_types": ["numeric"], "rows": [(Decimal("1.5"),)]}
+        yield {"columns": ["amount"], "column_types": ["numeric"], "rows": [(Decimal("123456789012.123456789"),)]}
+
+    table = pa.ipc.open_stream(await _collect(batches())).read_all()
+
+    assert table.schema.field("amount").type == pa.string()
+    assert table.column("amount").to_pylist() == ["1.5", "123456789012.123456789"]
+
+
+@pytest.mark.asyncio
+async def test_documents_are_flattened_into_columns():
+    async def docs():
+        yield {"json_result": [{"_id": "a", "user": {"name": "x", "age": 3}, "tags": [1, 2],
+                                "seen": datetime(2024, 1, 1)}]}
+        yield {"json_result": [{"_id": "b", "user": {"name": "y"}, "late_field": True}]}
+
+    rows = pa.ipc.open_stream(await _collect(docs())).read_all().to_pylist()
+
+    assert rows[0]["user.name"] == "x" and rows[0]["user.age"] == 3
+    assert rows[0]["tags"] == "[1, 2]"
+    assert rows[1][EXTRA_FIELDS_COLUMN] == '{"late_field": true}'
+
+
+@pytest.mark.asyncio
+async def test_status_only_result_is_a_valid_empty_stream():
+    async def status():
+        yield {"rows_affected": 1}
+
+    table = pa.ipc.open_stream(await _collect(status())).read_all()
+    assert table.num_rows == 0
+
+
+def test_flatten_document_keeps_empty_subdocument_as_json():
+    assert flatten_document({"a": {}, "b": {"c": None}}) == {"a": "{}", "b.c": None}
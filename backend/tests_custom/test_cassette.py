@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+from contextlib import aclosing
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.query import ChatMessage
+from services import cassette
+from services.cassette import Cassette, CassetteMiss, CassetteReplayError
+from services.llm_service import LLMService
+from services.mcp_client import McpClientService
+
+SCHEMA = "CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL);"
+MESSAGES = [ChatMessage(role="user", content="cassette test: all orders")]
+SSE_CONNECTION = {"type": "sse", "url": "http://mcp.example/sse", "configuration": {}}
+
+
+class _ProviderError(Exception):
+    status_code = 503
+
+
+@pytest.fixture
+def use_cassette(tmp_path, monkeypatch):
+    path = str(tmp_path / "traffic.jsonl.gz")
+
+    def switch(mode, **kwargs):
+        monkeypatch.setattr(cassette, "_cassette", Cassette(mode=mode, path=path, **kwargs))
+        return cassette._cassette
+
+    return switch
+
+
+@pytest.mark.asyncio
+async def test_llm_and_mcp_calls_replay_from_cassette(use_cassette, monkeypatch):
+    calls = []
+
+    async def fake_completion(self, provider, messages, schema, engine, tools=None):
+        calls.append(provider)
+        return "```sql\nSELECT * FROM orders;\n```"
+
+    async def fake_stream(self, provider, messages, schema, engine, tools=None):
+        for delta in ["```sql\n", "SELECT 1;", "\n```"]:
+            yield delta
+
+    async def fake_call_tool(self, connection_config, tool_name, arguments=None, headers=None, connection_id=None):
+        calls.append(tool_name)
+        return f"rows for {arguments}"
+
+    monkeypatch.setattr(LLMService, "_provider_chat_completion", fake_completion)
+    monkeypatch.setattr(LLMService, "_provider_chat_stream", fake_stream)
+    monkeypatch.setattr(McpClientService, "_call_tool", fake_call_tool)
+    service, mcp = LLMService(), McpClientService()
+
+    async def workload():
+        text = await service._chat_completion("groq", MESSAGES, SCHEMA, "sqlite")
+        deltas = [d async for d in service._chat_stream("groq", MESSAGES, SCHEMA, "sqlite")]
+        tool_output = await mcp.call_tool(SSE_CONNECTION, "search", {"q": "orders"}, headers={"Authorization": "secret"})
+        return text, deltas, tool_output
+
+    recorder = use_cassette("record")
+    recorded = await workload()
+    assert recorder.recorded == 3 and calls == ["groq", "search"]
+    with cassette.gzip.open(recorder.path, "rt") as f:
+        assert "secret" not in f.read()
+
+    player = use_cassette("replay", replay_latency="zero")
+    assert await workload() == recorded
+    assert calls == ["groq", "search"] and player.replayed == 3
+
+    with pytest.raises(CassetteMiss):
+        await mcp.call_tool(SSE_CONNECTION, "search", {"q": "customers"})
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_recorded_errors_and_latency(use_cassette):
+    async def slow():
+        time.sleep(0.05)
+        return "ok"
+
+    async def failing():
+        raise _ProviderError("upstream unavailable")
+
+    recorder = use_cassette("record")
+    await recorder.through("llm.chat", {"n": 1}, slow)
+    with pytest.raises(_ProviderError):
+        await recorder.through("llm.chat", {"n": 2}, failing)
+
+    player = use_cassette("replay")
+    started = time.perf_counter()
+    assert await player.through("llm.chat", {"n": 1}, failing) == "ok"
+    assert time.perf_counter() - started >= 0.04
+
+    with pytest.raises(CassetteReplayError) as excinfo:
+        await player.through("llm.chat", {"n": 2}, slow)
+    assert excinfo.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_failed_and_abandoned_streams_are_recorded(use_cassette):
+    async def failing_stream():
+        yield "SELECT"
+        raise _ProviderError("stream dropped")
+
+    async def long_stream():
+        for delta in ["SELECT", " 1", ";"]:
+            yield delta
+
+    recorder = use_cassette("record")
+    seen = []
+    with pytest.raises(_ProviderError):
+        async for delta in recorder.stream("llm.stream", {"n": 1}, failing_stream):
+            seen.append(delta)
+    # The consumer stops after the first delta, like a provider failover
+    async with aclosing(recorder.stream("llm.stream", {"n": 2}, long_stream)) as deltas:
+        async for delta in deltas:
+            break
+    assert recorder.recorded == 2
+
+    player = use_cassette("replay", replay_latency="zero")
+    replayed = []
+    with pytest.raises(CassetteReplayError) as excinfo:
+        async for delta in player.stream("llm.stream", {"n": 1}, long_stream):
+            replayed.append(delta)
+    assert replayed == seen == ["SELECT"] and excinfo.value.status_code == 503
+    assert [d async for d in player.stream("llm.stream", {"n": 2}, failing_stream)] == ["SELECT"]
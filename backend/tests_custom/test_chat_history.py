@@ -0,0 +1,95 @@
+import sys
+import os
+import pytest
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.chat_history import ChatHistoryManager, SUMMARY_HEADER, extractive_summary
+
+
+def _messages(turns, observation_chars=0, start_id=1):
+    """turns x (question, [observation], answer) with increasing ids."""
+    messages = []
+    for t in range(turns):
+        messages.append(SimpleNamespace(id=start_id + len(messages), role="user", content=f"question {t} " + "word " * 40, query=None))
+        if observation_chars:
+            messages.append(SimpleNamespace(id=start_id + len(messages), role="user", content="Observation: " + "x" * observation_chars, query=None))
+        messages.append(SimpleNamespace(id=start_id + len(messages), role="assistant", content=f"answer {t}", query=f"SELECT {t}"))
+    return messages
+
+
+class _Saver:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, session_id, summary, through_id):
+        self.calls.append((session_id, summary, through_id))
+
+
+def _manager(saver, max_tokens=300, summarize=None, **history):
+    config = {"history": {"max_tokens": max_tokens, "summary_max_tokens": 80, "summarizer": "extractive", **history}}
+    return ChatHistoryManager(config, saver, summarize)
+
+
+@pytest.mark.asyncio
+async def test_short_history_is_sent_verbatim():
+    saver = _Saver()
+    session = SimpleNamespace(id=1, history_summary=None, summary_through_id=None)
+    messages = _messages(2)
+
+    context = await _manager(saver).build_context(session, messages, "groq")
+
+    assert [m.content for m in context] == [m.content for m in messages]
+    assert saver.calls == []
+
+
+@pytest.mark.asyncio
+async def test_long_history_is_folded_into_persisted_summary():
+    saver = _Saver()
+    session = SimpleNamespace(id=7, history_summary=None, summary_through_id=None)
+    messages = _messages(30)
+
+    manager = _manager(saver)
+    context = await manager.build_context(session, messages, "groq")
+
+    assert context[0].content.startswith(SUMMARY_HEADER)
+    assert context[-1].content == "answer 29"
+    assert sum(len(m.content) for m in context) // 4 <= 300
+    # The verbatim window starts on a question
+    assert context[1].role == "user" and context[1].content.startswith("question")
+    assert saver.calls and saver.calls[-1][0] == 7
+    assert session.summary_through_id == saver.calls[-1][2]
+
+    # Next turn: the stored summary is reused and only new messages are considered
+    messages += _messages(1, start_id=messages[-1].id + 1)
+    again = await manager.build_context(session, messages, "groq")
+    assert again[0].content == context[0].content
+    assert len(saver.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_current_turn_observations_kept_and_old_ones_truncated():
+    saver = _Saver()
+    session = SimpleNamespace(id=1, history_summary=None, summary_through_id=None)
+    messages = _messages(2, observation_chars=500)
+
+    context = await _manager(saver, max_tokens=10000, observation_max_chars=100).build_context(session, messages, "groq")
+
+    observations = [m.content for m in context if m.content.startswith("Observation:")]
+    assert "chars truncated" in observations[0]
+    assert len(observations[1]) == len("Observation: ") + 500
+
+
+@pytest.mark.asyncio
+async def test_llm_summarizer_falls_back_to_extractive():
+    async def failing(provider, previous, messages, max_tokens):
+        raise RuntimeError("quota exceeded")
+
+    saver = _Saver()
+    session = SimpleNamespace(id=1, history_summary=None, summary_through_id=None)
+    manager = _manager(saver, summarize=failing, summarizer="llm")
+    context = await manager.build_context(session, _messages(30), "groq")
+
+    assert "[query: SELECT" in context[0].content
+    assert extractive_summary("", _messages(1), 80).startswith("- User asked: question 0")
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db.session import Base
+from db.models import ChatSession
+from services import local_llm
+from services.chat_jobs import chat_jobs_redis_url, encode_event, job_status, run_chat_job
+from services.chat_orchestrator import ChatOrchestrator
+from services.chat_service import ChatService
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.db_manager import DbManager
+from services.llm_service import LLMService
+from services.local_llm import LocalLLM
+
+
+@pytest.fixture
+def jobs_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    db_config = {"engine": "sqlite", "path": path}
+    monkeypatch.setitem(manager.config["databases"], "jobs_db", db_config)
+    manager._connectors["jobs_db"] = SQLiteConnector(db_config)
+    fast = LocalLLM({"fixtures": "config/local_llm_fixtures.yaml", "latency_ms": 0, "tokens_per_second": 0})
+    monkeypatch.setattr(local_llm, "_local_llm", fast)
+    yield str(tmp_path / "meta.db")
+    manager._connectors.pop("jobs_db", None)
+    manager.invalidate_schema("jobs_db")
+
+
+async def _run_job(meta_path, content, timeout=None):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{meta_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    published = []
+
+    async def publish(event):
+        # What the worker writes to Redis
+        published.append(encode_event(event))
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        session = ChatSession(user_id="tester", db_id="jobs_db", title="t")
+        db.add(session)
+        await db.commit()
+        orchestrator = ChatOrchestrator(db, session, "tester", model_provider="local")
+        try:
+            await asyncio.wait_for(run_chat_job(orchestrator, content, publish), timeout)
+        except asyncio.TimeoutError:
+            published.append({"type": "timed out"})
+        stored = await ChatService(db).get_session_messages(session.id)
+    await engine.dispose()
+    return published, stored
+
+
+@pytest.mark.asyncio
+async def test_chat_job_publishes_the_orchestrator_events(jobs_db):
+    published, stored = await _run_job(jobs_db, "how many items for the background job test")
+
+    types = [event["type"] for event in published]
+    assert types[:2] == ["started", "turn"] and "token" in types
+    assert types[-2:] == ["query", "message"] and job_status(published) == "completed"
+    assert published[-1]["message"]["query"] == "SELECT COUNT(*) FROM items;"
+    assert published[-1]["message"]["id"] == stored[-1].id
+
+
+@pytest.mark.asyncio
+async def test_failed_chat_job_saves_and_publishes_the_error(jobs_db, monkeypatch):
+    async def failing_stream(self, **request):
+        raise RuntimeError("provider down")
+        yield
+
+    monkeypatch.setattr(LLMService, "stream_response_from_messages", failing_stream)
+    published, stored = await _run_job(jobs_db, "how many items")
+
+    assert published[-1] == {"type": "error", "detail": "provider down"}
+    assert job_status(published) == "failed"
+    assert [m.content for m in stored] == ["how many items", "Error: provider down"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_chat_job_still_publishes_a_final_event(jobs_db, monkeypatch):
+    async def hanging_stream(self, **request):
+        await asyncio.sleep(10)
+        yield
+
+    monkeypatch.setattr(LLMService, "stream_response_from_messages", hanging_stream)
+    published, stored = await _run_job(jobs_db, "how many items", timeout=0.3)
+
+    # Like an arq job timeout: the task is cancelled, reports it, and the cancellation propagates
+    assert [event["type"] for event in published] == ["started", "turn", "error", "timed out"]
+    assert job_status(published[:-1]) == "failed"
+    assert [m.content for m in stored] == ["how many items"]
+
+
+def test_api_and_worker_resolve_the_same_redis(monkeypatch):
+    monkeypatch.setenv("REDIS_URL", "redis://from-env:6379")
+    assert chat_jobs_redis_url({"redis_url": "redis://from-config:6379"}) == "redis://from-config:6379"
+    assert chat_jobs_redis_url({}) == "redis://from-env:6379"
+    monkeypatch.delenv("REDIS_URL")
+    assert chat_jobs_redis_url({}) == "redis://localhost:6379"
@@ -0,0 +1,116 @@
+import sys
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from db.session import Base
+from db.models import ChatSession, ChatMessage as ChatMessageORM
+from models.query import ChatMessage
+from services.db_manager import DbManager
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.llm_service import LLMService
+from services.chat_orchestrator import ChatOrchestrator
+from routers import chatbot
+from routers.chatbot import _sse_event
+
+
+async def _fake_groq_stream(self, system_prompt, messages):
+    for delta in ["Here you go:\n```sql\n", "SELECT name ", "FROM items;\n```"]:
+        yield delta
+
+
+@pytest.fixture
+def stream_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(LLMService, "_stream_chat_with_groq", _fake_groq_stream)
+    manager = DbManager()
+    db_config = {"engine": "sqlite", "path": path}
+    monkeypatch.setitem(manager.config["databases"], "stream_db", db_config)
+    manager._connectors["stream_db"] = SQLiteConnector(db_config)
+    yield str(tmp_path / "meta.db")
+    manager._connectors.pop("stream_db", None)
+    manager.invalidate_schema("stream_db")
+
+
+@pytest.mark.asyncio
+async def test_llm_stream_yields_tokens_then_parsed_response(stream_db):
+    llm_service = LLMService()
+    events = [
+        event async for event in llm_service.stream_response_from_messages(
+            db_id="stream_db",
+            provider="groq",
+            messages=[ChatMessage(role="user", content="stream test: item names")],
+            schema="CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)",
+            engine="sqlite",
+            tools=[{"name": "noop"}],  # tools disable the response cache
+        )
+    ]
+
+    assert [e["type"] for e in events] == ["token", "token", "token", "response"]
+    assert events[-1]["message"].query == "SELECT name FROM items;"
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_streams_and_persists_final_message(stream_db):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{stream_db}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        session = ChatSession(user_id="tester", db_id="stream_db", title="t")
+        db.add(session)
+        await db.commit()
+
+        orchestrator = ChatOrchestrator(db, session, "tester", model_provider="groq")
+        events = [event async for event in orchestrator.run("list item names for the stream test", stream=True)]
+
+        types = [e["type"] for e in events]
+        assert types[0] == "turn" and types.count("token") == 3
+        assert types[-2:] == ["query", "message"]
+        assert events[-1]["message"].query == "SELECT name FROM items;"
+
+        stored = await orchestrator.chat_service.get_session_messages(session.id)
+        assert [m.role for m in stored] == ["user", "assistant"]
+        assert isinstance(stored[-1], ChatMessageORM)
+
+        frame = _sse_event(events[-1])
+        assert frame.startswith("event: message\ndata: {") and frame.endswith("\n\n")
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_body_outlives_the_request_session(stream_db, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{stream_db}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(chatbot, "AsyncSessionLocal", sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    user = SimpleNamespace(username="tester")
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        session = ChatSession(user_id="tester", db_id="stream_db", title="t")
+        db.add(session)
+        await db.commit()
+        response = await chatbot.stream_message(
+            session.id, ChatMessage(role="user", content="list item names for the endpoint test"),
+            model_provider="groq", scope=None, active_mcp_ids=None, current_user=user, db=db,
+        )
+    # The request-scoped session is closed before the body runs, as under Starlette
+    frames = [frame async for frame in response.body_iterator]
+    assert frames[-1].startswith("event: message")
+
+    async with AsyncSession(engine) as db:
+        stored = await chatbot.ChatService(db).get_session_messages(session.id)
+        assert [m.role for m in stored] == ["user", "assistant"]
+    await engine.dispose()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import sqlite3
+import time
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db.session import Base
+from db.models import ChatSession
+from models.query import ChatMessage
+from services.chat_orchestrator import ChatOrchestrator, TOOL_CALL_PREFIX
+from services.chat_service import ChatService
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.db_manager import DbManager
+from services.llm_service import LLMService
+from services.mcp_client import McpClientService
+from services.mcp_tools import ToolIndex
+
+
+@pytest.fixture
+def turn_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    db_config = {"engine": "sqlite", "path": path}
+    monkeypatch.setitem(manager.config["databases"], "turn_db", db_config)
+    manager._connectors["turn_db"] = SQLiteConnector(db_config)
+    yield str(tmp_path / "meta.db")
+    manager._connectors.pop("turn_db", None)
+    manager.invalidate_schema("turn_db")
+
+
+def _scripted_llm(monkeypatch, responses):
+    calls = []
+
+    async def fake_generate(self, db_id, provider, messages, schema, engine, tools=None):
+        calls.append([m.content for m in messages])
+        response = responses[len(calls) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(LLMService, "generate_response_from_messages", fake_generate)
+    return calls
+
+
+def _with_tool(monkeypatch):
+    async def fake_load_tools(self):
+        self.active_connections = [SimpleNamespace(id=1, name="mcp", url="http://mcp", connection_type="sse", configuration={}, headers={})]
+        self.tool_index = ToolIndex.build([(self.active_connections[0], [{"name": "lookup"}])])
+        self.tools = self.tool_index.tools
+
+    async def fake_call_tool(self, connection_config, tool_name, arguments=None, headers=None, connection_id=None):
+        return f"{tool_name} found 3 items"
+
+    monkeypatch.setattr(ChatOrchestrator, "_load_tools", fake_load_tools)
+    monkeypatch.setattr(McpClientService, "call_tool", fake_call_tool)
+
+
+async def _session(turn_db):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{turn_db}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db = AsyncSession(engine, expire_on_commit=False)
+    session = ChatSession(user_id="tester", db_id="turn_db", title="t")
+    db.add(session)
+    await db.commit()
+    return db, session
+
+
+@pytest.mark.asyncio
+async def test_tool_turns_are_kept_in_memory_and_saved_per_turn(turn_db, monkeypatch):
+    _with_tool(monkeypatch)
+    calls = _scripted_llm(monkeypatch, [
+        ChatMessage(role="assistant", content="Action: lookup", query=TOOL_CALL_PREFIX + '{"tool": "lookup", "args": {}}'),
+        ChatMessage(role="assistant", content="Final", query="SELECT name FROM items;"),
+    ])
+    reads = []
+    original_read = ChatService.get_session_messages
+
+    async def counting_read(self, session_id):
+        reads.append(session_id)
+        return await original_read(self, session_id)
+
+    monkeypatch.setattr(ChatService, "get_session_messages", counting_read)
+
+    db, session = await _session(turn_db)
+    commits = []
+    event.listen(db.sync_session, "after_commit", lambda _: commits.append(1))
+    try:
+        orchestrator = ChatOrchestrator(db, session, "tester", model_provider="groq")
+        events = [e async for e in orchestrator.run("which items are there?")]
+
+        # The second turn sees the tool call and observation without re-reading the session
+        assert calls[1][-1] == "Observation: Tool Output: lookup found 3 items"
+        # One commit each for the question, the tool turn and the answer
+        assert len(reads) == 1 and len(commits) == 3
+        assert events[-1]["message"].query == "SELECT name FROM items;"
+
+        stored = await ChatService(db).get_session_messages(session.id)
+        assert [(m.role, m.content[:12]) for m in stored] == [
+            ("user", "which items "), ("assistant", "Action: look"),
+            ("user", "Observation:"), ("assistant", "Final"),
+        ]
+        assert stored[-1].id == events[-1]["message"].id
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_request_keeps_partial_turns(turn_db, monkeypatch):
+    _with_tool(monkeypatch)
+    _scripted_llm(monkeypatch, [
+        ChatMessage(role="assistant", content="Action: lookup", query=TOOL_CALL_PREFIX + '{"tool": "lookup", "args": {}}'),
+        RuntimeError("provider down"),
+    ])
+    db, session = await _session(turn_db)
+    try:
+        orchestrator = ChatOrchestrator(db, session, "tester", model_provider="groq")
+        with pytest.raises(RuntimeError):
+            async for _ in orchestrator.run("which items are there?"):
+                pass
+        await orchestrator.save_error(RuntimeError("provider down"))
+
+        stored = await ChatService(db).get_session_messages(session.id)
+        assert [m.role for m in stored] == ["user", "assistant", "user", "assistant"]
+        assert stored[2].content.startswith("Observation:")
+        assert stored[-1].content == "Error: provider down"
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_of_one_turn_run_concurrently(turn_db, monkeypatch):
+    _with_tool(monkeypatch)
+
+    async def slow_call_tool(self, connection_config, tool_name, arguments=None, headers=None, connection_id=None):
+        await asyncio.sleep(arguments["seconds"])
+        return f"waited {arguments['seconds']}"
+
+    monkeypatch.setattr(McpClientService, "call_tool", slow_call_tool)
+    actions = "\n".join(f'Action: lookup\nAction Input: {{"seconds": {s}}}' for s in (0.2, 0.2, 5))
+    calls = _scripted_llm(monkeypatch, [
+        LLMService()._parse_chat_response(f"Thought: Do I need to use a tool? Yes\n{actions}", "sqlite"),
+        ChatMessage(role="assistant", content="Final"),
+    ])
+    db, session = await _session(turn_db)
+    try:
+        orchestrator = ChatOrchestrator(db, session, "tester", model_provider="groq")
+        orchestrator.tool_call_timeout = 0.5
+        started = time.perf_counter()
+        events = [e async for e in orchestrator.run("which items are there?")]
+        assert time.perf_counter() - started < 1.0
+
+        ends = [e for e in events if e["type"] == "tool_call_end"]
+        assert [(e["index"], e["ok"]) for e in ends] == [(0, True), (1, True), (2, False)]
+        assert calls[1][-1] == (
+            "Observation: Results of 3 tool calls:\n"
+            "[1] lookup: Tool Output: waited 0.2\n"
+            "[2] lookup: Tool Output: waited 0.2\n"
+            "[3] lookup: Error: Tool lookup timed out after 0.5s."
+        )
+    finally:
+        await db.close()
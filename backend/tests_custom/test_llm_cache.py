@@ -0,0 +1,92 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.llm_cache as llm_cache
+from services.llm_cache import LLMResponseCache, MemoryLLMCache, LLMCacheBackend
+from services.llm_service import LLMService
+from models.query import ChatMessage
+
+
+class BrokenBackend(LLMCacheBackend):
+    name = "broken"
+
+    async def get(self, key):
+        raise ConnectionError("redis down")
+
+    async def set(self, key, value, ttl):
+        raise ConnectionError("redis down")
+
+    async def purge(self):
+        return 0
+
+
+@pytest.fixture
+def fresh_cache():
+    saved = llm_cache._llm_cache
+    llm_cache._llm_cache = LLMResponseCache(MemoryLLMCache(max_entries=10))
+    yield llm_cache._llm_cache
+    llm_cache._llm_cache = saved
+
+
+def _history(*contents):
+    return [ChatMessage(role="user" if i % 2 == 0 else "assistant", content=c) for i, c in enumerate(contents)]
+
+
+def test_key_covers_provider_model_schema_and_history():
+    base = LLMResponseCache.build_key("groq", "m1", "postgresql", "Table a", _history("count rows"))
+
+    assert base == LLMResponseCache.build_key("GROQ", "m1", "postgresql", "Table a", _history("count   rows "))
+    assert base != LLMResponseCache.build_key("gemini", "m1", "postgresql", "Table a", _history("count rows"))
+    assert base != LLMResponseCache.build_key("groq", "m2", "postgresql", "Table a", _history("count rows"))
+    assert base != LLMResponseCache.build_key("groq", "m1", "postgresql", "Table b", _history("count rows"))
+    assert base != LLMResponseCache.build_key("groq", "m1", "postgresql", "Table a", _history("hi", "hello", "count rows"))
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_is_bounded():
+    backend = MemoryLLMCache(max_entries=2, max_bytes=1000)
+    await backend.set("a", "1", ttl=60)
+    await backend.set("b", "2", ttl=60)
+    await backend.get("a")
+    await backend.set("c", "3", ttl=60)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == "1"
+    assert (await backend.size_info())["evictions"] == 1
+
+    await backend.set("expired", "x", ttl=0)
+    assert await backend.get("expired") is None
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_are_counted_as_misses():
+    cache = LLMResponseCache(BrokenBackend())
+    assert await cache.get("k") is None
+    await cache.set("k", "v")
+    assert (await cache.stats())["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_llm_service_reuses_cached_chat_response(fresh_cache):
+    service = LLMService()
+    calls = []
+
+    async def fake_groq(system_prompt, messages):
+        calls.append(messages)
+        return "SELECT count(*) FROM users;"
+
+    service._generate_chat_with_groq = fake_groq
+    messages = _history("how many users?")
+
+    first = await service.generate_response_from_messages("db", "groq", messages, "Table users", "postgresql")
+    second = await service.generate_response_from_messages("db", "groq", messages, "Table users", "postgresql")
+    await service.generate_response_from_messages("db", "groq", messages, "Table users, orders", "postgresql")
+
+    assert len(calls) == 2
+    assert second == first
+    stats = await fresh_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert await fresh_cache.purge() == 2
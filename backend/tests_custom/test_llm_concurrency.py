@@ -0,0 +1,98 @@
+import sys
+import os
+import asyncio
+import time
+import httpx
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.llm_clients as llm_clients
+from services.llm_service import LLMService
+from models.query import ChatMessage
+
+COMPLETION_DELAY = 0.5
+
+
+async def _slow_openai(request: httpx.Request) -> httpx.Response:
+    # Stands in for a slow completion; a sync client would hold the event loop for all of it
+    await asyncio.sleep(COMPLETION_DELAY)
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4-turbo",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": "```sql\nSELECT 1;\n```"},
+        }],
+    })
+
+
+@pytest.fixture
+def slow_openai(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(
+        llm_clients, "_build_http_client",
+        lambda http_config: httpx.AsyncClient(transport=httpx.MockTransport(_slow_openai)),
+    )
+    monkeypatch.setattr(llm_clients, "_shared", None)
+    yield
+    llm_clients._shared = None
+
+
+async def _ask(service: LLMService, question: str):
+    return await service.generate_response_from_messages(
+        db_id="none",
+        provider="chatgpt",
+        messages=[ChatMessage(role="user", content=question)],
+        schema="",
+        engine="sqlite",
+        tools=[{"name": "noop"}],  # tools disable the response cache
+    )
+
+
+@pytest.mark.asyncio
+async def test_event_loop_serves_other_work_during_chatgpt_call(slow_openai):
+    service = LLMService()
+    call = asyncio.create_task(_ask(service, "concurrency regression"))
+
+    # Other requests on the same loop keep being served while the completion is pending
+    started = time.perf_counter()
+    ticks = 0
+    while not call.done():
+        await asyncio.sleep(0.01)
+        ticks += 1
+    elapsed = time.perf_counter() - started
+
+    response = await call
+    assert response.query == "SELECT 1;"
+    assert elapsed >= COMPLETION_DELAY * 0.9
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_provider_concurrency_limit_queues_excess_calls(slow_openai):
+    service = LLMService()
+    llm_clients.shared_clients().semaphores["chatgpt"] = asyncio.Semaphore(1)
+
+    started = time.perf_counter()
+    await asyncio.gather(_ask(service, "first"), _ask(service, "second"))
+    assert time.perf_counter() - started >= COMPLETION_DELAY * 2 * 0.9
+
+    llm_clients.shared_clients().semaphores["chatgpt"] = asyncio.Semaphore(2)
+    started = time.perf_counter()
+    await asyncio.gather(_ask(service, "third"), _ask(service, "fourth"))
+    assert time.perf_counter() - started < COMPLETION_DELAY * 2 * 0.9
+
+
+def test_clients_replaced_for_a_new_event_loop_are_closed(slow_openai):
+    async def clients():
+        return llm_clients.shared_clients()
+
+    first = asyncio.run(clients())
+    second = asyncio.run(clients())
+
+    assert second is not first
+    assert first.http.is_closed and not second.http.is_closed
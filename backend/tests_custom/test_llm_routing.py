@@ -0,0 +1,106 @@
+import sys
+import os
+import asyncio
+import time
+import pytest
+from tenacity import retry, stop_after_attempt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.llm_routing as llm_routing
+from services.llm_routing import LLMRouter, LatencyHistogram, should_retry_llm_call
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def _router(**overrides):
+    config = {"fallbacks": {"gemini": ["groq"]}, "hedge_after_ms": 100, "min_hedge_ms": 10, **overrides}
+    return LLMRouter(config)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled():
+    router = _router()
+    delays = {"gemini": 2.0, "groq": 0.05}
+
+    async def call(name):
+        await asyncio.sleep(delays[name])
+        return f"answer from {name}"
+
+    started = time.perf_counter()
+    result, provider = await router.run("gemini", call)
+
+    assert (result, provider) == ("answer from groq", "groq")
+    assert time.perf_counter() - started < 0.5
+    assert router.histogram("gemini").cancelled == 1
+    assert router.histogram("groq").total == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_fails_over_without_waiting_for_hedge_delay():
+    router = _router(hedge_after_ms=10000)
+
+    async def call(name):
+        if name == "gemini":
+            raise RateLimited("quota")
+        return "ok"
+
+    started = time.perf_counter()
+    assert await router.run("gemini", call) == ("ok", "groq")
+    assert time.perf_counter() - started < 0.5
+    assert router.histogram("gemini").errors == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_answers_fall_through_and_last_error_is_raised():
+    router = _router()
+
+    async def invalid(name):
+        return "Error: not configured"
+
+    assert await router.run("gemini", invalid, is_valid=lambda text: not text.startswith("Error")) == (
+        "Error: not configured", "groq"
+    )
+
+    async def failing(name):
+        raise RateLimited(name)
+
+    with pytest.raises(RateLimited):
+        await router.run("gemini", failing)
+
+
+def test_hedge_delay_follows_observed_latency():
+    router = _router(hedge_after_ms=4000, min_hedge_ms=200, min_samples=10)
+    assert router.hedge_delay("gemini") == 4.0
+    for _ in range(10):
+        router.histogram("gemini").observe(600)
+    assert router.hedge_delay("gemini") == 0.75  # p90 bucket upper bound
+
+    histogram = LatencyHistogram()
+    for ms in (50, 120, 900, 70000):
+        histogram.observe(ms)
+    assert histogram.snapshot()["count"] == 4
+    assert histogram.quantile(0.5) == 250
+
+
+def test_rate_limits_skip_in_place_retries_only_when_a_fallback_exists(monkeypatch):
+    monkeypatch.setattr(llm_routing, "_llm_router", _router())
+    attempts = {"gemini": 0, "chatgpt": 0}
+
+    @retry(stop=stop_after_attempt(3), retry=should_retry_llm_call)
+    def _call_gemini():
+        attempts["gemini"] += 1
+        raise RateLimited()
+
+    @retry(stop=stop_after_attempt(3), retry=should_retry_llm_call)
+    def _call_chatgpt():
+        attempts["chatgpt"] += 1
+        raise RateLimited()
+
+    with pytest.raises(RateLimited):
+        _call_gemini()
+    with pytest.raises(Exception):
+        _call_chatgpt()
+    assert attempts == {"gemini": 1, "chatgpt": 3}
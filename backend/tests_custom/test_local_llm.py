@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.query import ChatMessage
+from services import local_llm
+from services.llm_service import LLMService
+from services.local_llm import LocalLLM
+
+SCHEMA = (
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);\n"
+    "CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER);\n"
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id));"
+)
+TOOLS = [{"name": "fetch", "description": "Fetch a URL", "inputSchema": {"type": "object"}}]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fast = LocalLLM({"fixtures": "config/local_llm_fixtures.yaml", "latency_ms": 0, "tokens_per_second": 0})
+    monkeypatch.setattr(local_llm, "_local_llm", fast)
+    return LLMService()
+
+
+def _ask(service, content, tools=None):
+    prompt = service._build_chat_system_prompt(SCHEMA, "sqlite", tools)
+    return local_llm.get_local_llm().respond(prompt, [ChatMessage(role="user", content=content)], "sqlite")
+
+
+def test_local_responses_from_fixtures_and_schema(service):
+    assert _ask(service, "how many orders") == "```sql\nSELECT COUNT(*) FROM orders;\n```"
+    assert "SELECT * FROM orders LIMIT 10;" in _ask(service, "show me the latest orders")
+    assert "SELECT * FROM customers LIMIT 10;" in _ask(service, "anything interesting?")
+
+    # Tool rules only fire when the prompt offers the tool
+    assert "Action:" not in _ask(service, "fetch https://example.com/a")
+    tool_call = service._parse_chat_response(_ask(service, "fetch https://example.com/a", TOOLS), "sqlite")
+    assert tool_call.query == '__TOOL_CALL__:{"tool": "fetch", "args": {"url": "https://example.com/a"}}'
+
+    parallel = service._parse_chat_response(_ask(service, "compare https://a.example and https://b.example", TOOLS), "sqlite")
+    assert parallel.query == (
+        '__TOOL_CALL__:{"calls": [{"tool": "fetch", "args": {"url": "https://a.example"}}, '
+        '{"tool": "fetch", "args": {"url": "https://b.example"}}]}'
+    )
+
+    final = _ask(service, "Observation: Tool Output: 42 rows")
+    assert final.startswith("Thought: Do I need to use a tool? No\nFinal Answer:")
+
+
+@pytest.mark.asyncio
+async def test_local_provider_through_llm_service(service):
+    messages = [ChatMessage(role="user", content="list customers for the local provider test")]
+    response = await service.generate_response_from_messages(
+        db_id="local_db", provider="local", messages=messages, schema=SCHEMA, engine="sqlite", tools=TOOLS
+    )
+    assert response.query == "SELECT * FROM customers LIMIT 10;"
+
+    events = [
+        event async for event in service.stream_response_from_messages(
+            db_id="local_db", provider="local", messages=messages, schema=SCHEMA, engine="sqlite", tools=TOOLS
+        )
+    ]
+    assert len([e for e in events if e["type"] == "token"]) > 1
+    assert events[-1]["message"].query == response.query
+
+
+def test_local_jitter_is_deterministic():
+    llm = LocalLLM({"latency_ms": 100, "jitter_ms": 50})
+    assert llm._first_token_delay("same prompt") == llm._first_token_delay("same prompt")
+    assert 0.1 <= llm._first_token_delay("other prompt") <= 0.15
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from mcp.types import CallToolResult, TextContent
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import mcp_pool
+from services.mcp_client import McpClientService
+from services.mcp_pool import McpSessionPool, _PooledSession
+
+STDIO_CONNECTION = {"type": "stdio", "configuration": {"command": "fake-mcp-server"}}
+SSE_CONNECTION = {"type": "sse", "url": "http://mcp.example/sse", "configuration": {}}
+
+
+class _FakeSession:
+    opened = []
+
+    def __init__(self, read_stream, write_stream, message_handler=None):
+        self.active = 0
+        self.peak = 0
+        self.fail_next = False
+        _FakeSession.opened.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def initialize(self):
+        pass
+
+    async def send_ping(self):
+        pass
+
+    async def call_tool(self, name, arguments):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep({"slow": 2, "busy": 0.1}.get(name, 0.01))
+            if name == "bad":
+                raise ValueError("malformed tool result")
+            if self.fail_next:
+                self.fail_next = False
+                raise ConnectionResetError("server went away")
+            return CallToolResult(content=[TextContent(type="text", text=f"{name}:{arguments}")])
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    @asynccontextmanager
+    async def fake_transport():
+        yield None, None
+
+    _FakeSession.opened = []
+    monkeypatch.setattr(_PooledSession, "_transport", lambda self: fake_transport())
+    monkeypatch.setattr(mcp_pool, "ClientSession", _FakeSession)
+    monkeypatch.setattr(McpSessionPool, "_instance", None)
+    pool = McpSessionPool()
+    pool.enabled = True
+    pool.max_concurrency = 2
+    yield pool
+    McpSessionPool._instance = None
+
+
+@pytest.mark.asyncio
+async def test_calls_share_one_session_within_its_concurrency_limit(pool):
+    client = McpClientService()
+    outputs = await asyncio.gather(*(
+        client.call_tool(STDIO_CONNECTION, "search", {"n": i}, connection_id=7) for i in range(6)
+    ))
+
+    assert outputs[3] == "search:{'n': 3}"
+    assert len(_FakeSession.opened) == 1 and pool.opened == 1
+    assert _FakeSession.opened[0].peak == 2
+    assert pool.stats()["sessions"][pool.key_for(7, STDIO_CONNECTION, {})]["calls"] == 6
+
+    # A different connection gets its own session
+    await client.call_tool(STDIO_CONNECTION, "search", {}, connection_id=8)
+    assert len(_FakeSession.opened) == 2
+    await pool.close_all()
+
+
+@pytest.mark.asyncio
+async def test_failed_session_reconnects_and_idle_sessions_are_closed(pool):
+    client = McpClientService()
+    await client.call_tool(STDIO_CONNECTION, "search", {}, connection_id=7)
+    _FakeSession.opened[0].fail_next = True
+    with pytest.raises(ConnectionResetError):
+        await client.call_tool(STDIO_CONNECTION, "search", {}, connection_id=7)
+    assert not pool.stats()["sessions"]
+
+    assert await client.call_tool(STDIO_CONNECTION, "search", {}, connection_id=7) == "search:{}"
+    assert len(_FakeSession.opened) == 2
+
+    pool.idle_timeout = 0
+    assert await pool.expire_idle() == 1
+    assert not pool.stats()["sessions"]
+    await pool.close_all()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_sse_call_is_not_retried_over_http(pool, monkeypatch):
+    fallbacks = []
+
+    async def fake_http_request(self, url, method, params, headers=None):
+        fallbacks.append(method)
+        return {"content": [{"type": "text", "text": "ran again"}]}
+
+    monkeypatch.setattr(McpClientService, "_http_mcp_request", fake_http_request)
+    started = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(McpClientService().call_tool(SSE_CONNECTION, "slow", {}, connection_id=7), 0.2)
+    assert time.perf_counter() - started < 1.0
+    assert fallbacks == []
+    await pool.close_all()
+
+
+@pytest.mark.asyncio
+async def test_failed_call_does_not_break_calls_sharing_its_session(pool):
+    client = McpClientService()
+    busy = asyncio.create_task(client.call_tool(STDIO_CONNECTION, "busy", {}, connection_id=7))
+    await asyncio.sleep(0.02)
+    first = next(iter(pool._sessions.values()))
+
+    with pytest.raises(ValueError):
+        await client.call_tool(STDIO_CONNECTION, "bad", {}, connection_id=7)
+    # Retired: new calls get a fresh session, the busy call finishes on the old one
+    assert first.retired and first.alive
+    assert await client.call_tool(STDIO_CONNECTION, "search", {}, connection_id=7) == "search:{}"
+    assert len(_FakeSession.opened) == 2
+
+    assert await busy == "busy:{}"
+    assert not first.alive
+    await pool.close_all()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from mcp import types as mcp_types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.mcp_client import McpClientService
+from services.mcp_pool import McpSessionPool, _PooledSession
+from services.mcp_tools import ToolCatalogCache, ToolIndex, connection_config
+
+
+def _connection(id, name):
+    return SimpleNamespace(id=id, name=name, url=f"http://{name}/sse", connection_type="sse", configuration={}, headers={})
+
+
+GITHUB = _connection(1, "GitHub")
+JIRA = _connection(2, "Jira")
+CATALOGS = {
+    "GitHub": [{"name": "search"}, {"name": "create_issue"}],
+    "Jira": [{"name": "search"}, {"name": "transition"}],
+}
+
+
+@pytest.fixture
+def fake_tools(monkeypatch):
+    fetched = []
+
+    async def fake_get_tools(self, connection_config, headers=None, connection_id=None):
+        fetched.append(connection_id)
+        await asyncio.sleep(0.05)
+        return CATALOGS[connection_config["url"].split("/")[2]]
+
+    monkeypatch.setattr(McpClientService, "get_tools", fake_get_tools)
+    return fetched
+
+
+def test_colliding_tool_names_are_namespaced_per_connection():
+    index = ToolIndex.build([(GITHUB, CATALOGS["GitHub"]), (JIRA, CATALOGS["Jira"])])
+
+    assert [tool["name"] for tool in index.tools] == ["GitHub__search", "create_issue", "Jira__search", "transition"]
+    route = index.resolve("Jira__search")
+    assert route.connection is JIRA and route.tool_name == "search"
+    assert index.resolve("transition").connection is JIRA
+    assert index.resolve("search") is None
+
+
+@pytest.mark.asyncio
+async def test_catalogs_are_fetched_concurrently_then_served_from_cache(fake_tools):
+    catalog, client = ToolCatalogCache(ttl_seconds=60), McpClientService()
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    index = await catalog.load(client, [GITHUB, JIRA])
+    assert loop.time() - started < 0.09  # two 50ms fetches overlapped
+    assert sorted(fake_tools) == [1, 2] and len(index.tools) == 4
+
+    await asyncio.gather(catalog.load(client, [GITHUB, JIRA]), catalog.load(client, [GITHUB]))
+    assert len(fake_tools) == 2 and catalog.stats()["hits"] == 3
+
+    catalog.invalidate_connection(1)
+    await catalog.load(client, [GITHUB, JIRA])
+    assert sorted(fake_tools) == [1, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_tool_list_changed_notification_drops_the_cached_catalog(fake_tools, monkeypatch):
+    monkeypatch.setattr(McpSessionPool, "_instance", None)
+    pool = McpSessionPool()
+    catalog = ToolCatalogCache(ttl_seconds=60)
+    pool.on_tools_changed(catalog.invalidate)
+    await catalog.load(McpClientService(), [GITHUB])
+
+    key = McpSessionPool.key_for(GITHUB.id, connection_config(GITHUB), GITHUB.headers)
+    session = _PooledSession(key, connection_config(GITHUB), {}, 1, pool._tools_changed)
+    await session._on_message(mcp_types.ServerNotification(
+        mcp_types.ToolListChangedNotification(method="notifications/tools/list_changed")
+    ))
+    assert catalog.stats()["invalidations"] == 1
+
+    await catalog.load(McpClientService(), [GITHUB])
+    assert fake_tools == [1, 1]
+    McpSessionPool._instance = None
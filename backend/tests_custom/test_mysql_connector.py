@@ -0,0 +1,67 @@
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.mysql_connector import MySqlConnector
+
+
+class FakeConnection:
+    def __init__(self, last_usage):
+        self.last_usage = last_usage
+        self.pings = 0
+
+    async def ping(self, reconnect=True):
+        self.pings += 1
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = []
+
+    async def acquire(self):
+        return self.conn
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+def _make_connector(conn):
+    connector = MySqlConnector({
+        "engine": "mysql", "host": "localhost", "user": "u", "password": "p", "dbname": "d",
+        "pool": {"ping_interval": 30},
+    })
+    connector._pool_loop = asyncio.get_running_loop()
+    connector._pool_lock = asyncio.Lock()
+    connector.pool = FakePool(conn)
+    return connector
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_is_pinged_before_use():
+    loop = asyncio.get_running_loop()
+    conn = FakeConnection(last_usage=loop.time() - 120)
+    connector = _make_connector(conn)
+
+    async with connector._acquire() as acquired:
+        assert acquired is conn
+
+    assert conn.pings == 1
+    assert connector.pool.released == [conn]
+    assert connector.metrics.acquisitions == 1
+    assert connector.metrics.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_recently_used_connection_skips_ping():
+    loop = asyncio.get_running_loop()
+    conn = FakeConnection(last_usage=loop.time())
+    connector = _make_connector(conn)
+
+    async with connector._acquire():
+        pass
+
+    assert conn.pings == 0
@@ -0,0 +1,95 @@
+import sys
+import os
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.postgres_connector import PostgresConnector
+from services.connectors.pool_metrics import PoolMetrics
+
+
+def test_bind_named_params_rewrites_to_positional():
+    query, args = PostgresConnector._bind_named_params(
+        "SELECT * FROM orders WHERE customer_id = :cid AND created_at > :since AND total::numeric > :cid",
+        {"cid": 7, "since": "2024-01-01"},
+    )
+    assert query == "SELECT * FROM orders WHERE customer_id = $1 AND created_at > $2 AND total::numeric > $1"
+    assert args == [7, "2024-01-01"]
+
+
+def test_bind_named_params_ignores_unused_keys():
+    query, args = PostgresConnector._bind_named_params("SELECT 1", {"unused": 1})
+    assert query == "SELECT 1"
+    assert args == []
+
+
+def test_rows_from_status():
+    assert PostgresConnector._rows_from_status("INSERT 0 3") == 3
+    assert PostgresConnector._rows_from_status("UPDATE 5") == 5
+    assert PostgresConnector._rows_from_status("CREATE TABLE") == -1
+
+
+def test_pool_stats_without_pool():
+    connector = PostgresConnector({
+        "engine": "postgresql", "host": "localhost", "user": "u", "password": "p", "dbname": "d",
+        "pool": {"min_size": 2, "max_size": 4},
+    })
+    stats = connector.get_pool_stats()
+    assert stats["min_size"] == 2
+    assert stats["max_size"] == 4
+    assert stats["size"] == 0
+    assert stats["acquisitions"] == 0
+
+
+def test_pool_metrics_tracks_waits():
+    metrics = PoolMetrics()
+    metrics.record_acquire(2.0)
+    metrics.record_acquire(6.0)
+    metrics.record_release()
+    snapshot = metrics.snapshot()
+    assert snapshot["acquisitions"] == 2
+    assert snapshot["in_use"] == 1
+    assert snapshot["avg_wait_ms"] == 4.0
+    assert snapshot["max_wait_ms"] == 6.0
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    @asynccontextmanager
+    async def _transaction(self):
+        yield
+
+    def transaction(self):
+        return self._transaction()
+
+    async def prepare(self, query):
+        raise asyncpg.PostgresSyntaxError("cannot insert multiple commands into a prepared statement")
+
+    async def execute(self, query):
+        self.executed.append(query)
+        return "INSERT 0 2"
+
+
+@pytest.mark.asyncio
+async def test_multi_statement_query_falls_back_to_unprepared_execute(monkeypatch):
+    connector = PostgresConnector({"engine": "postgresql", "host": "localhost", "user": "u", "password": "p", "dbname": "d"})
+    conn = _FakeConnection()
+
+    @asynccontextmanager
+    async def fake_acquire():
+        yield conn
+
+    monkeypatch.setattr(connector, "_acquire", fake_acquire)
+    script = "CREATE TABLE t (id int); INSERT INTO t VALUES (1), (2);"
+    result = await connector.execute_query(script)
+
+    assert conn.executed == [script]
+    assert result["rows_affected"] == 2
+    # Parameters need a prepared statement, so a parameterised script still fails
+    with pytest.raises(RuntimeError, match="multiple commands"):
+        await connector.execute_query("UPDATE t SET id = :id; SELECT 1;", {"id": 3})
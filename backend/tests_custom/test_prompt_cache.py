@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.query import ChatMessage
+from services import prompt_cache
+from services.llm_service import LLMService
+from services.prompt_cache import GeminiContextCache, PromptPrefixCache, canonical_tools_json
+
+SCHEMA = "CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL);"
+TOOLS = [
+    {"name": "search", "description": "Web search", "inputSchema": {"type": "object", "properties": {"q": {"type": "string"}}}},
+    {"name": "fetch", "inputSchema": {"properties": {"url": {"type": "string"}}, "type": "object"}, "description": "Fetch a URL"},
+]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "_prefix_cache", PromptPrefixCache(max_entries=8))
+    return LLMService()
+
+
+def test_prefix_is_byte_stable_and_memoized(service):
+    first = service._build_chat_prompt(
+        [ChatMessage(role="user", content="total revenue?")], SCHEMA, "sqlite", TOOLS
+    )
+    reordered = [dict(reversed(list(tool.items()))) for tool in reversed(TOOLS)]
+    second = service._build_chat_prompt(
+        [ChatMessage(role="user", content="total revenue?"), ChatMessage(role="assistant", content="42"),
+         ChatMessage(role="user", content="per month?")],
+        SCHEMA, "sqlite", reordered,
+    )
+    prefix = service._build_chat_system_prompt(SCHEMA, "sqlite", TOOLS)
+
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert "per month?" not in prefix and SCHEMA in prefix
+    assert prefix.index("### Available Tools") < prefix.index(SCHEMA)
+    stats = prompt_cache.get_prefix_cache().stats()
+    assert stats == {"entries": 1, "hits": 2, "misses": 1}
+
+    assert service._build_chat_system_prompt(SCHEMA + " ", "sqlite", TOOLS) != prefix
+    assert canonical_tools_json(TOOLS) == canonical_tools_json(reordered)
+
+
+@pytest.mark.asyncio
+async def test_gemini_context_cache_created_once(monkeypatch):
+    created = []
+
+    def fake_create(**kwargs):
+        created.append(kwargs)
+        return SimpleNamespace(name=f"cachedContents/{len(created)}")
+
+    monkeypatch.setattr(prompt_cache, "genai_caching", SimpleNamespace(CachedContent=SimpleNamespace(create=fake_create)))
+    cache = GeminiContextCache(enabled=True, min_tokens=10, ttl_seconds=600)
+    prefix = "x" * 400
+
+    first, second = await asyncio.gather(cache.get("gemini-2.5-flash", prefix), cache.get("gemini-2.5-flash", prefix))
+    third = await cache.get("gemini-2.5-flash", prefix)
+
+    assert first is second is third
+    assert len(created) == 1 and created[0]["system_instruction"] == prefix
+    assert await cache.get("gemini-2.5-flash", "short") is None
+    assert cache.stats()["created"] == 1 and cache.stats()["reused"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gemini_context_cache_failure_falls_back(monkeypatch):
+    calls = []
+
+    def failing_create(**kwargs):
+        calls.append(kwargs)
+        raise RuntimeError("400 Cached content is too small")
+
+    monkeypatch.setattr(prompt_cache, "genai_caching", SimpleNamespace(CachedContent=SimpleNamespace(create=failing_create)))
+    cache = GeminiContextCache(enabled=True, min_tokens=10, ttl_seconds=600)
+
+    assert await cache.get("gemini-2.5-flash", "y" * 400) is None
+    assert await cache.get("gemini-2.5-flash", "y" * 400) is None
+    assert len(calls) == 1 and cache.stats()["failures"] == 1
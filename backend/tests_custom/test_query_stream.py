@@ -0,0 +1,133 @@
+import sys
+import os
+import json
+import sqlite3
+import pytest
+from decimal import Decimal
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.base_connector import BaseConnector
+from services.connectors.mongo_connector import MongoConnector
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.result_encoding import encode_ndjson_line
+
+
+class BufferedConnector(BaseConnector):
+    """Only implements execute_query, so it exercises the default streaming fallback."""
+
+    def __init__(self, result):
+        super().__init__({"engine": "fake"})
+        self.result = result
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def get_schema(self):
+        return []
+
+    async def get_schema_for_prompt(self):
+        return ""
+
+    async def get_sample_data(self, object_name):
+        return {}
+
+    async def execute_query(self, query):
+        return self.result
+
+    def is_mutation(self, query):
+        return False
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    path = str(tmp_path / "stream.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item{i}",) for i in range(25)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.asyncio
+async def test_sqlite_streams_in_batches(sqlite_path):
+    connector = SQLiteConnector({"engine": "sqlite", "path": sqlite_path})
+    batches = [b async for b in connector.execute_query_stream("SELECT id, name FROM items ORDER BY id", 10)]
+    assert [len(b["rows"]) for b in batches] == [10, 10, 5]
+    assert batches[0]["columns"] == ["id", "name"]
+    assert batches[0]["rows"][0] == (1, "item0")
+
+
+@pytest.mark.asyncio
+async def test_empty_result_still_reports_columns(sqlite_path):
+    connector = SQLiteConnector({"engine": "sqlite", "path": sqlite_path})
+    batches = [b async for b in connector.execute_query_stream("SELECT id FROM items WHERE id < 0", 10)]
+    assert batches == [{"columns": ["id"], "rows": []}]
+
+
+@pytest.mark.asyncio
+async def test_default_fallback_slices_buffered_result():
+    rows = [{"a": i, "b": str(i)} for i in range(5)]
+    connector = BufferedConnector({"columns": ["a", "b"], "rows": rows, "rows_affected": 5})
+    batches = [b async for b in connector.execute_query_stream("SELECT", 2)]
+    assert [b["rows"] for b in batches] == [[(0, "0"), (1, "1")], [(2, "2"), (3, "3")], [(4, "4")]]
+
+    connector = BufferedConnector({"rows_affected": 3, "message": "ok"})
+    assert [b async for b in connector.execute_query_stream("UPDATE", 2)] == [{"rows_affected": 3, "message": "ok"}]
+
+
+class FakeMongoCursor:
+    """The chainable subset of a motor find() cursor the connector uses."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def skip(self, n):
+        return FakeMongoCursor(self.docs[n:])
+
+    def limit(self, n):
+        return FakeMongoCursor(self.docs[:n])
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length):
+        batch, self.docs = self.docs[:length], self.docs[length:]
+        return batch
+
+    async def close(self):
+        pass
+
+
+class FakeMongoCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, filter_obj):
+        return FakeMongoCursor([dict(doc) for doc in self.docs])
+
+
+@pytest.mark.asyncio
+async def test_mongo_find_stream_honours_skip_and_limit():
+    connector = MongoConnector({"engine": "mongodb"})
+    connector.client = object()  # already "connected"
+    connector.db = {"items": FakeMongoCollection([{"_id": i, "n": i} for i in range(25)])}
+    query = json.dumps({"collection": "items", "filter": {}, "skip": 5, "limit": 12})
+
+    batches = [b async for b in connector.execute_query_stream(query, 5)]
+    assert [doc["n"] for b in batches for doc in b["json_result"]] == list(range(5, 17))
+
+    unlimited = json.dumps({"collection": "items", "filter": {}})
+    batches = [b async for b in connector.execute_query_stream(unlimited, 10)]
+    assert sum(len(b["json_result"]) for b in batches) == 25
+
+
+def test_ndjson_line_encodes_driver_types():
+    line = encode_ndjson_line({"type": "rows", "rows": [(Decimal("1.5"), date(2024, 1, 2), b"\x01")]})
+    assert line.endswith(b"\n")
+    assert json.loads(line) == {"type": "rows", "rows": [[1.5, "2024-01-02", "01"]]}
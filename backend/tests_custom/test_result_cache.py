@@ -0,0 +1,124 @@
+import sys
+import os
+import sqlite3
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db_manager import DbManager
+from services.connectors.sqlite_connector import SQLiteConnector
+from services import result_cache
+from services.result_cache import QueryResultCache, normalize_query, query_fingerprint
+
+
+def test_normalization_ignores_formatting_but_not_literals():
+    assert normalize_query("SELECT  *\n FROM t\tWHERE a = 1;") == "SELECT * FROM t WHERE a = 1"
+    assert normalize_query("SELECT 'a  b'") != normalize_query("SELECT 'a b'")
+    assert normalize_query('{"filter": {}, "collection": "c"}') == normalize_query('{"collection":"c","filter":{}}')
+    assert query_fingerprint("db", "SELECT 1") != query_fingerprint("db", "SELECT 1", {"x": 1})
+    assert query_fingerprint("db", "SELECT 1") != query_fingerprint("other", "SELECT 1")
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = QueryResultCache(max_bytes=100, max_entry_bytes=60)
+    assert cache.put("a", "db", {"rows": ["x" * 30]}, ttl=60)
+    assert cache.put("b", "db", {"rows": ["y" * 30]}, ttl=60)
+    cache.get("a")  # a is now most recently used
+    assert cache.put("c", "db", {"rows": ["z" * 30]}, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.current_bytes <= 100
+    assert not cache.put("big", "db", {"rows": ["w" * 100]}, ttl=60)
+
+
+def test_oversized_results_are_rejected_without_encoding_every_row(monkeypatch):
+    encoded = []
+    real_dumps = result_cache.json.dumps
+    monkeypatch.setattr(result_cache.json, "dumps", lambda value, **kw: encoded.append(value) or real_dumps(value, **kw))
+    cache = QueryResultCache(max_bytes=10_000, max_entry_bytes=1_000)
+
+    rows = [{"id": i, "name": "x" * 20} for i in range(10_000)]
+    assert not cache.put("big", "db", {"columns": ["id", "name"], "rows": rows}, ttl=60)
+    assert len(encoded) < 100
+
+
+def test_cached_row_lists_are_copied_for_callers():
+    cache = QueryResultCache()
+    cache.put("a", "db", {"columns": ["id"], "rows": [{"id": 1}, {"id": 2}]}, ttl=60)
+
+    # routers/query.py pops "rows" to build columnar data
+    first = cache.get("a")
+    first.pop("rows").append({"id": 3})
+    first["columns"].append("extra")
+    assert cache.get("a") == {"columns": ["id"], "rows": [{"id": 1}, {"id": 2}]}
+
+
+def test_entries_expire_and_invalidate_by_db():
+    cache = QueryResultCache()
+    cache.put("a", "db1", {"rows": []}, ttl=60)
+    cache.put("b", "db2", {"rows": []}, ttl=60)
+    cache.put("c", "db1", {"rows": []}, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("c") is None
+    assert cache.invalidate("db1") == 1
+    assert cache.get("a") is None and cache.get("b") is not None
+
+
+@pytest.fixture
+def cached_manager(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("INSERT INTO items (name) VALUES ('a')")
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    manager._connectors["cache_db"] = SQLiteConnector({"engine": "sqlite", "path": path})
+    manager.result_cache.invalidate()
+    yield manager
+    manager._connectors.pop("cache_db", None)
+    manager.result_cache.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_db_manager_serves_repeat_reads_from_cache(cached_manager):
+    first = await cached_manager.execute_query("cache_db", "SELECT name FROM items")
+    second = await cached_manager.execute_query("cache_db", "SELECT name\n  FROM items;")
+
+    assert first["cache_hit"] is False
+    assert second["cache_hit"] is True
+    assert second["rows"] == [{"name": "a"}]
+
+    bypass = await cached_manager.execute_query("cache_db", "SELECT name FROM items", use_cache=False)
+    assert "cache_hit" not in bypass
+
+
+@pytest.mark.asyncio
+async def test_mutation_invalidates_cached_results(cached_manager):
+    await cached_manager.execute_query("cache_db", "SELECT name FROM items")
+    await cached_manager.execute_query("cache_db", "INSERT INTO items (name) VALUES ('b')")
+    after = await cached_manager.execute_query("cache_db", "SELECT name FROM items")
+
+    assert after["cache_hit"] is False
+    assert [row["name"] for row in after["rows"]] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_columnar_reads_use_the_result_cache(cached_manager):
+    first = await cached_manager.execute_query_columnar("cache_db", "SELECT name FROM items")
+    second = await cached_manager.execute_query_columnar("cache_db", "SELECT name FROM items;")
+    assert (first["cache_hit"], second["cache_hit"]) == (False, True)
+    assert second["columnar"]["values"] == [["a"]]
+
+    # A row result cached by execute_query is served in columnar form
+    await cached_manager.execute_query("cache_db", "SELECT id, name FROM items")
+    reused = await cached_manager.execute_query_columnar("cache_db", "SELECT id, name FROM items")
+    assert reused["cache_hit"] is True and reused["columnar"]["columns"] == ["id", "name"]
+
+    await cached_manager.execute_query("cache_db", "INSERT INTO items (name) VALUES ('b')")
+    fresh = await cached_manager.execute_query_columnar("cache_db", "SELECT name FROM items")
+    assert fresh["cache_hit"] is False and fresh["columnar"]["row_count"] == 2
@@ -0,0 +1,61 @@
+import sys
+import os
+import sqlite3
+import pytest
+from decimal import Decimal
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db_manager import DbManager
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.result_encoding import ColumnarBuilder, column_type_tag, columnar_from_rows
+
+
+def test_builder_transposes_batches():
+    builder = ColumnarBuilder(["id", "name"])
+    builder.add_rows([(1, "a"), (2, "b")])
+    builder.add_rows([])
+    builder.add_rows([(3, None)])
+
+    assert builder.build() == {
+        "columns": ["id", "name"],
+        "types": ["integer", "string"],
+        "values": [[1, 2, 3], ["a", "b", None]],
+        "row_count": 3,
+    }
+
+
+def test_column_type_tags():
+    assert column_type_tag([True, None, False]) == "boolean"
+    assert column_type_tag([1, 2.5]) == "float"
+    assert column_type_tag([1, Decimal("2.5")]) == "decimal"
+    assert column_type_tag([datetime(2024, 1, 1)]) == "datetime"
+    assert column_type_tag([None, None]) == "null"
+    assert column_type_tag([1, "x"]) == "mixed"
+
+
+def test_columnar_from_dict_rows_keeps_column_order():
+    result = columnar_from_rows(["b", "a"], [{"a": 1, "b": 2}, {"a": 3, "b": 4}])
+    assert result["values"] == [[2, 4], [1, 3]]
+
+
+@pytest.mark.asyncio
+async def test_execute_query_columnar_from_sqlite(tmp_path):
+    path = str(tmp_path / "columnar.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, price REAL)")
+    conn.executemany("INSERT INTO items (price) VALUES (?)", [(i * 1.5,) for i in range(7)])
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    manager._connectors["columnar_db"] = SQLiteConnector({"engine": "sqlite", "path": path})
+    try:
+        result = await manager.execute_query_columnar("columnar_db", "SELECT id, price FROM items ORDER BY id", 3)
+    finally:
+        manager._connectors.pop("columnar_db", None)
+
+    assert result["rows_affected"] == 7
+    assert result["columnar"]["types"] == ["integer", "float"]
+    assert result["columnar"]["values"][0] == [1, 2, 3, 4, 5, 6, 7]
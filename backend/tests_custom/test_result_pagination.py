@@ -0,0 +1,129 @@
+import sys
+import os
+import sqlite3
+import pytest
+from contextlib import aclosing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db_manager import DbManager
+from services.result_cursors import ResultCursorRegistry, CursorExpiredError
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.connectors.sql_paging import wrap_limit_offset
+
+
+class TrackingSQLiteConnector(SQLiteConnector):
+    """Counts open streams so tests can check that cursors are released."""
+
+    def __init__(self, db_config):
+        super().__init__(db_config)
+        self.open_streams = 0
+
+    async def execute_query_stream(self, query, batch_size=1000):
+        self.open_streams += 1
+        try:
+            async with aclosing(super().execute_query_stream(query, batch_size)) as batches:
+                async for batch in batches:
+                    yield batch
+        finally:
+            self.open_streams -= 1
+
+
+@pytest.fixture
+def paging(tmp_path):
+    path = str(tmp_path / "pages.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item{i}",) for i in range(25)])
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    connector = TrackingSQLiteConnector({"engine": "sqlite", "path": path})
+    manager._connectors["pages_db"] = connector
+    registry = ResultCursorRegistry()
+    saved = (registry.max_held, registry.idle_timeout)
+    yield registry, connector
+    registry.max_held, registry.idle_timeout = saved
+    registry._cursors.clear()
+    manager._connectors.pop("pages_db", None)
+
+
+async def _read_all(registry, page):
+    ids = [row["id"] for row in page["rows"]]
+    while page.get("next_page_token"):
+        page = await registry.next_page(page["next_page_token"], "alice")
+        ids.extend(row["id"] for row in page["rows"])
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_held_cursor_pages_through_result(paging):
+    registry, connector = paging
+    page = await registry.open("alice", "pages_db", "SELECT id, name FROM items ORDER BY id", 10)
+
+    assert page["columns"] == ["id", "name"]
+    assert len(page["rows"]) == 10 and page["next_page_token"]
+    assert connector.open_streams == 1
+
+    assert await _read_all(registry, page) == list(range(1, 26))
+    assert connector.open_streams == 0
+
+
+@pytest.mark.asyncio
+async def test_stateless_fallback_when_held_limit_reached(paging):
+    registry, connector = paging
+    registry.max_held = 0
+    page = await registry.open("alice", "pages_db", "SELECT id FROM items ORDER BY id", 10)
+
+    assert connector.open_streams == 0
+    assert await _read_all(registry, page) == list(range(1, 26))
+
+
+@pytest.mark.asyncio
+async def test_held_cursors_leave_pool_connections_for_other_queries(paging):
+    registry, connector = paging
+    connector.max_size = 4  # as PostgresConnector / MySQLConnector report their pool
+    pages = [await registry.open("alice", "pages_db", "SELECT id FROM items ORDER BY id", 10) for _ in range(6)]
+
+    # Only max_size - reserved_connections are held; the rest page with LIMIT/OFFSET
+    assert connector.open_streams == 2 == registry.held_count("pages_db")
+    assert registry.held_count("other_db") == 0
+    for page in pages:
+        assert await _read_all(registry, page) == list(range(1, 26))
+    assert connector.open_streams == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_single_use_and_owner_bound(paging):
+    registry, _ = paging
+    page = await registry.open("alice", "pages_db", "SELECT id FROM items ORDER BY id", 10)
+    token = page["next_page_token"]
+
+    with pytest.raises(CursorExpiredError):
+        await registry.next_page(token, "mallory")
+    await registry.next_page(token, "alice")
+    with pytest.raises(CursorExpiredError):
+        await registry.next_page(token, "alice")
+    await registry.close_all()
+
+
+@pytest.mark.asyncio
+async def test_idle_cursors_expire_and_release_stream(paging):
+    registry, connector = paging
+    page = await registry.open("alice", "pages_db", "SELECT id FROM items ORDER BY id", 10)
+    assert connector.open_streams == 1
+
+    registry.idle_timeout = 0
+    assert await registry.expire_idle() == 1
+    assert connector.open_streams == 0
+    with pytest.raises(CursorExpiredError):
+        await registry.next_page(page["next_page_token"], "alice")
+
+
+def test_wrap_limit_offset_only_pages_reads():
+    assert wrap_limit_offset("SELECT * FROM t ORDER BY id;", 20, 11) == (
+        "SELECT * FROM (SELECT * FROM t ORDER BY id) AS _page LIMIT 11 OFFSET 20"
+    )
+    assert wrap_limit_offset("DELETE FROM t", 0, 10) is None
+    assert wrap_limit_offset("SELECT 1; DROP TABLE t", 0, 10) is None
@@ -0,0 +1,208 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db_manager import DbManager
+from services.connectors.base_connector import BaseConnector
+
+
+class FakeConnector(BaseConnector):
+    def __init__(self, fingerprint="v1"):
+        super().__init__({"engine": "fake"})
+        self.fingerprint = fingerprint
+        self.schema_calls = 0
+        self.fingerprint_calls = 0
+        self.tables = ["users"]
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def get_schema(self):
+        self.schema_calls += 1
+        return [{"name": t, "type": "table", "columns": []} for t in self.tables]
+
+    async def get_schema_for_prompt(self):
+        return self.format_schema_for_prompt(await self.get_schema())
+
+    def format_schema_for_prompt(self, schema):
+        return ",".join(t["name"] for t in schema)
+
+    async def get_schema_fingerprint(self):
+        self.fingerprint_calls += 1
+        return self.fingerprint
+
+    async def get_sample_data(self, object_name):
+        return {}
+
+    async def execute_query(self, query):
+        return {"rows_affected": 0}
+
+    def is_mutation(self, query):
+        return query.upper().startswith("CREATE")
+
+
+@pytest.fixture
+def manager():
+    manager = DbManager()
+    connector = FakeConnector()
+    manager._connectors["fake_db"] = connector
+    manager.invalidate_schema()
+    saved = (manager._schema_ttl, manager._schema_revalidate_seconds)
+    yield manager, connector
+    manager._schema_ttl, manager._schema_revalidate_seconds = saved
+    manager._connectors.pop("fake_db", None)
+    manager.invalidate_schema()
+
+
+@pytest.mark.asyncio
+async def test_schema_is_served_from_cache_within_revalidate_window(manager):
+    manager, connector = manager
+    manager._schema_revalidate_seconds = 60
+
+    await manager.get_schema("fake_db")
+    prompt = await manager.get_schema_for_prompt("fake_db")
+    await manager.get_schema_for_prompt("fake_db")
+
+    assert prompt == "users"
+    assert connector.schema_calls == 1
+    assert connector.fingerprint_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_change_triggers_refetch(manager):
+    manager, connector = manager
+    manager._schema_revalidate_seconds = 0
+
+    await manager.get_schema_for_prompt("fake_db")
+    await manager.get_schema_for_prompt("fake_db")
+    assert connector.schema_calls == 1
+
+    connector.tables = ["users", "orders"]
+    connector.fingerprint = "v2"
+    assert await manager.get_schema_for_prompt("fake_db") == "users,orders"
+    assert connector.schema_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry_without_fingerprint(manager):
+    manager, connector = manager
+    connector.fingerprint = None
+    manager._schema_ttl = 0
+
+    await manager.get_schema("fake_db")
+    await manager.get_schema("fake_db")
+    assert connector.schema_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_and_mutation_invalidate(manager):
+    manager, connector = manager
+    manager._schema_revalidate_seconds = 60
+
+    await manager.get_schema("fake_db")
+    await manager.refresh_schema("fake_db")
+    assert connector.schema_calls == 2
+
+    await manager.execute_query("fake_db", "CREATE TABLE t (id int)")
+    await manager.get_schema("fake_db")
+    assert connector.schema_calls == 3
+
+
+class SlowConnector(FakeConnector):
+    async def get_schema(self):
+        import asyncio
+        await asyncio.sleep(5)
+        return []
+
+
+class BrokenConnector(FakeConnector):
+    async def get_schema(self):
+        self.schema_calls += 1
+        raise ConnectionError("connection refused")
+
+
+@pytest.fixture
+def fanout_manager():
+    manager = DbManager()
+    saved_connectors = dict(manager._connectors)
+    saved_databases = manager.config.get("databases")
+    saved_settings = (manager._fanout_timeout, manager._failure_backoff, manager._failure_threshold)
+
+    connectors = {"ok_db": FakeConnector(), "slow_db": SlowConnector(), "broken_db": BrokenConnector()}
+    manager._connectors.clear()
+    manager._connectors.update(connectors)
+    manager.config["databases"] = {
+        db_id: {"name": db_id.upper(), "engine": "fake"} for db_id in connectors
+    }
+    manager._fanout_timeout = 0.2
+    manager._failure_backoff = 60
+    manager._failure_threshold = 3
+    manager._schema_failures.clear()
+    manager.invalidate_schema()
+    yield manager, connectors
+
+    manager._connectors.clear()
+    manager._connectors.update(saved_connectors)
+    manager.config["databases"] = saved_databases
+    manager._fanout_timeout, manager._failure_backoff, manager._failure_threshold = saved_settings
+    manager._schema_failures.clear()
+    manager.invalidate_schema()
+
+
+@pytest.mark.asyncio
+async def test_fanout_returns_partial_results_with_annotations(fanout_manager):
+    import time
+    manager, connectors = fanout_manager
+
+    started = time.perf_counter()
+    schemas = await manager.get_all_schemas()
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert schemas["ok_db"]["status"] == "ok"
+    assert schemas["ok_db"]["schema"][0]["name"] == "users"
+    assert "latency_ms" in schemas["ok_db"]
+    assert schemas["slow_db"]["status"] == "timeout"
+    assert schemas["broken_db"]["status"] == "error"
+    assert "connection refused" in schemas["broken_db"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_failing_database_is_skipped_by_negative_cache(fanout_manager):
+    manager, connectors = fanout_manager
+
+    for _ in range(3):
+        await manager.get_all_schemas()
+    prompt = await manager.get_all_schemas_for_prompt()
+
+    assert connectors["broken_db"].schema_calls == 3
+    assert "ID: ok_db" in prompt
+    assert "broken_db" not in prompt
+    schemas = await manager.get_all_schemas()
+    assert schemas["broken_db"]["status"] == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_single_failures_do_not_back_off_and_success_resets_the_count(fanout_manager):
+    manager, connectors = fanout_manager
+    broken = connectors["broken_db"]
+
+    # One timeout or error is retried on the next request
+    for _ in range(2):
+        schemas = await manager.get_all_schemas()
+        assert schemas["broken_db"]["status"] == "error"
+    assert broken.schema_calls == 2
+
+    # A success in between starts the count again
+    broken.get_schema = FakeConnector().get_schema
+    assert (await manager.get_all_schemas())["broken_db"]["status"] == "ok"
+    del broken.get_schema
+    manager.invalidate_schema("broken_db")
+    for _ in range(3):
+        assert (await manager.get_all_schemas())["broken_db"]["status"] == "error"
+    assert (await manager.get_all_schemas())["broken_db"]["status"] == "skipped"
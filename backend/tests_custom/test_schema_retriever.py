@@ -0,0 +1,124 @@
+import sys
+import os
+import sqlite3
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import prompt_cache
+from services.db_manager import DbManager
+from services.llm_service import LLMService
+from services.prompt_cache import PromptPrefixCache
+from services.connectors.sqlite_connector import SQLiteConnector
+from services.schema_retriever import SchemaIndex, question_from_history, tokenize
+from models.query import ChatMessage
+
+
+def _table(name, *columns, fks=()):
+    cols = [{"name": "id", "type": "integer", "extra": "PK"}]
+    cols += [{"name": c, "type": "text", "extra": ""} for c in columns]
+    cols += [{"name": f"{t}_id", "type": "integer", "extra": f"FK -> {t}.id"} for t in fks]
+    return {"name": name, "type": "table", "columns": cols}
+
+
+SCHEMA = [
+    _table("customers", "full_name", "email"),
+    _table("orders", "orderDate", "total_amount", fks=["customers"]),
+    _table("order_items", "quantity", fks=["orders", "products"]),
+    _table("products", "title", "unit_price"),
+    _table("employees", "first_name", "hire_date"),
+    _table("audit_events", "payload"),
+]
+
+
+def test_tokenize_splits_identifiers_and_folds_plurals():
+    assert tokenize("orderDate total_amount Categories") == ["order", "date", "total", "amount", "category"]
+    assert tokenize("show me all the customers") == ["customer"]
+
+
+def test_select_ranks_matches_and_expands_fk_neighbours():
+    index = SchemaIndex(SCHEMA)
+    selection = index.select("total order amount by customer", lambda t: 10, top_k=1, token_budget=1000)
+
+    decisions = {d["table"]: d for d in selection["decisions"]}
+    assert decisions["orders"]["reason"] == "match"
+    assert decisions["customers"]["included"]
+    assert decisions["order_items"]["reason"] == "fk:orders"
+    assert "employees" not in decisions
+    # Selected tables keep schema order
+    names = [t["name"] for t in selection["tables"]]
+    assert names == sorted(names, key=[t["name"] for t in SCHEMA].index)
+
+
+def test_select_respects_token_budget_and_falls_back_without_matches():
+    index = SchemaIndex(SCHEMA)
+    selection = index.select("orders", lambda t: 40, top_k=8, token_budget=50)
+    assert [t["name"] for t in selection["tables"]] == ["orders"]
+    assert any(d["reason"].endswith(":over_budget") for d in selection["decisions"])
+
+    fallback = index.select("weather forecast", lambda t: 40, token_budget=100)
+    assert all(d["reason"].startswith("fallback") for d in fallback["decisions"])
+    assert len(fallback["tables"]) == 2
+    assert fallback["selected_tokens"] <= 100
+
+
+@pytest.fixture
+def wide_manager(tmp_path):
+    path = str(tmp_path / "wide.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, full_name TEXT)")
+    conn.execute("CREATE TABLE invoices (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), amount REAL)")
+    for i in range(30):
+        conn.execute(f"CREATE TABLE filler_{i} (id INTEGER PRIMARY KEY, value_{i} TEXT, other_{i} TEXT)")
+    conn.commit()
+    conn.close()
+
+    manager = DbManager()
+    manager._connectors["wide_db"] = SQLiteConnector({"engine": "sqlite", "path": path})
+    saved = (manager._pruning_min_tables, manager._pruning_token_budget)
+    manager._pruning_min_tables, manager._pruning_token_budget = 10, 60
+    yield manager
+    manager._pruning_min_tables, manager._pruning_token_budget = saved
+    manager._connectors.pop("wide_db", None)
+    manager.invalidate_schema("wide_db")
+
+
+@pytest.mark.asyncio
+async def test_db_manager_prunes_prompt_for_question(wide_manager):
+    selection = await wide_manager.select_schema_for_prompt("wide_db", "invoice amounts per customer")
+
+    assert selection["pruned"] is True
+    assert selection["selected_tokens"] < selection["full_tokens"]
+    assert "CREATE TABLE invoices" in selection["prompt"]
+    assert "CREATE TABLE filler_3 " not in selection["prompt"]
+    assert "30 other tables not shown" in selection["prompt"]
+
+    full = await wide_manager.get_schema_for_prompt("wide_db")
+    assert "CREATE TABLE filler_3 " in full
+
+
+@pytest.mark.asyncio
+async def test_questions_over_the_same_tables_share_one_prompt_prefix(wide_manager, monkeypatch):
+    monkeypatch.setattr(prompt_cache, "_prefix_cache", PromptPrefixCache(max_entries=8))
+    service = LLMService()
+    prefixes = []
+    for question in ["invoice amounts per customer", "which customer has the largest invoice?"]:
+        schema = await wide_manager.get_schema_for_prompt("wide_db", question=question)
+        prefixes.append(service._build_chat_system_prompt(schema, "sqlite"))
+
+    # The pruned schema depends only on the selected tables, not the question's wording
+    assert prefixes[0] == prefixes[1]
+    assert prompt_cache.get_prefix_cache().stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    other = await wide_manager.get_schema_for_prompt("wide_db", question="value_3 of filler 3")
+    assert service._build_chat_system_prompt(other, "sqlite") != prefixes[0]
+
+
+def test_question_from_history_skips_observations():
+    history = [
+        ChatMessage(role="user", content="invoice totals by customer"),
+        ChatMessage(role="assistant", content="Here they are"),
+        ChatMessage(role="user", content="Observation: 12 rows"),
+        ChatMessage(role="user", content="and per month?"),
+    ]
+    assert question_from_history(history) == "invoice totals by customer\nand per month?"
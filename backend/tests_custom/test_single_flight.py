@@ -0,0 +1,98 @@
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.single_flight import SingleFlight
+from services.llm_service import LLMService
+from services.llm_cache import get_llm_cache
+from models.query import ChatMessage
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+    # Finished flights are released: the next call runs again
+    await flight.do("k", work)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_work_running():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    finished = []
+
+    async def work():
+        started.set()
+        await asyncio.sleep(0.1)
+        finished.append(True)
+        return 42
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+    first.cancel()
+
+    assert await second == 42
+    assert first.cancelled() and finished == [True]
+
+    # With every waiter gone the work itself is cancelled
+    only = asyncio.create_task(flight.do("j", work))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0.15)
+    assert finished == [True]
+
+
+@pytest.mark.asyncio
+async def test_identical_chat_requests_make_one_provider_call(monkeypatch):
+    calls = []
+
+    async def fake_completion(self, provider, messages, schema, engine, tools=None):
+        calls.append(provider)
+        await asyncio.sleep(0.05)
+        return "```sql\nSELECT 1;\n```"
+
+    monkeypatch.setattr(LLMService, "_chat_completion", fake_completion)
+    await get_llm_cache().purge()
+    service = LLMService()
+    messages = [ChatMessage(role="user", content="single flight: how many rows?")]
+
+    responses = await asyncio.gather(*(
+        service.generate_response_from_messages("db", "groq", messages, "schema", "sqlite") for _ in range(3)
+    ))
+
+    assert len(calls) == 1
+    assert [r.query for r in responses] == ["SELECT 1;"] * 3
+    assert responses[0] is not responses[1]
+    await get_llm_cache().purge()
@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.connectors.sql_schema import assemble_sql_schema
+
+
+def test_assemble_sql_schema_groups_columns_and_constraints():
+    tables = [
+        {"table_name": "customers", "table_type": "BASE TABLE"},
+        {"table_name": "orders", "table_type": "BASE TABLE"},
+        {"table_name": "order_totals", "table_type": "VIEW"},
+    ]
+    columns = [
+        {"table_name": "customers", "column_name": "id", "data_type": "integer"},
+        {"table_name": "customers", "column_name": "name", "data_type": "text"},
+        {"table_name": "orders", "column_name": "id", "data_type": "integer"},
+        {"table_name": "orders", "column_name": "customer_id", "data_type": "integer"},
+    ]
+    constraints = [
+        {"table_name": "customers", "column_name": "id", "constraint_type": "PRIMARY KEY",
+         "referenced_table_name": None, "referenced_column_name": None},
+        {"table_name": "orders", "column_name": "id", "constraint_type": "PRIMARY KEY",
+         "referenced_table_name": None, "referenced_column_name": None},
+        {"table_name": "orders", "column_name": "customer_id", "constraint_type": "FOREIGN KEY",
+         "referenced_table_name": "customers", "referenced_column_name": "id"},
+    ]
+
+    schema = assemble_sql_schema(tables, columns, constraints)
+
+    assert [t["name"] for t in schema] == ["customers", "orders", "order_totals"]
+    assert schema[0]["columns"] == [
+        {"name": "id", "type": "integer", "extra": "PK"},
+        {"name": "name", "type": "text", "extra": ""},
+    ]
+    assert schema[1]["columns"][1]["extra"] == "FK -> customers.id"
+    assert schema[2]["type"] == "view"
+    assert schema[2]["columns"] == []
+
+
+def test_assemble_sql_schema_handles_uppercase_labels_and_pk_fk_columns():
+    tables = [{"TABLE_NAME": "line_items", "TABLE_TYPE": "BASE TABLE"}]
+    columns = [{"TABLE_NAME": "line_items", "COLUMN_NAME": "order_id", "DATA_TYPE": "int"}]
+    constraints = [
+        {"TABLE_NAME": "line_items", "COLUMN_NAME": "order_id", "CONSTRAINT_TYPE": "FOREIGN KEY",
+         "REFERENCED_TABLE_NAME": "orders", "REFERENCED_COLUMN_NAME": "id"},
+        {"TABLE_NAME": "line_items", "COLUMN_NAME": "order_id", "CONSTRAINT_TYPE": "PRIMARY KEY",
+         "REFERENCED_TABLE_NAME": None, "REFERENCED_COLUMN_NAME": None},
+    ]
+
+    schema = assemble_sql_schema(tables, columns, constraints)
+
+    assert schema[0]["columns"][0]["extra"] == "PK, FK -> orders.id"
@@ -1,13 +1,22 @@
 import asyncio
 import json
 from arq import Worker
-from typing import Dict, Any
+from arq.connections import RedisSettings
+from arq.worker import func
+from typing import Dict, Any, List, Optional
 
 from db.session import engine, Base, AsyncSessionLocal
 from services.llm_service import LLMService
 from services.chat_service import ChatService
+from services.chat_jobs import (
+    chat_jobs_redis_url, close_chat_job_queue, get_chat_job_queue, load_chat_jobs_config, run_chat_job
+)
+from services.chat_orchestrator import ChatOrchestrator
+from services.chat_history import ChatHistoryManager
 from services.db_manager import DbManager
-from models.chat import ChatMessage # Pydantic model
+from services.llm_clients import close_llm_clients
+from services.mcp_pool import McpSessionPool
+from services.schema_retriever import question_from_history
 from db.models import ChatMessage as ChatMessageORM
 import logging
 
@@ -24,8 +33,44 @@ async def startup(ctx):
 
 async def shutdown(ctx):
     logger.info("Worker shutting down...")
+    await McpSessionPool().close_all()
+    await DbManager().close()
+    await close_llm_clients()
+    await close_chat_job_queue()
     await engine.dispose()
 
+async def run_chat_task(
+    ctx,
+    job_id: str,
+    session_id: int,
+    username: str,
+    content: str,
+    model_provider: str,
+    scope: Optional[str] = None,
+    active_mcp_ids: Optional[List[str]] = None,
+):
+    """
+    Background chat request enqueued by POST /api/chatbot/sessions/{id}/message/async:
+    runs the same ReAct/MCP loop as the inline endpoints and publishes its events to
+    the job's Redis list and channel (see services.chat_jobs).
+    """
+    logger.info(f"Processing chat job {job_id} for session {session_id}")
+    queue = get_chat_job_queue()
+
+    async def publish(event: Dict[str, Any]):
+        await queue.publish(job_id, event)
+
+    async with AsyncSessionLocal() as db:
+        chat_session = await ChatService(db).get_session(session_id=session_id, user_id=username)
+        if not chat_session:
+            await publish({"type": "error", "detail": "Session not found"})
+            return {"status": "failed", "job_id": job_id}
+        orchestrator = ChatOrchestrator(db, chat_session, username, model_provider, scope, active_mcp_ids)
+        await run_chat_job(orchestrator, content, publish, stream=queue.stream_tokens)
+
+    logger.info(f"Finished chat job {job_id}")
+    return {"status": "completed", "job_id": job_id}
+
 async def generate_response_task(ctx, session_id: int, user_message_content: str, db_id: str, provider: str):
     """
     Background task to generate LLM response and save it.
@@ -41,21 +86,20 @@ async def generate_response_task(ctx, session_id: int, user_message_content: str
             # 1. Retrieve Context
             # We need to fetch messages again to provide context
             db_messages = await chat_service.get_session_messages(session_id=session_id)
-            
-            context_messages = []
-            for db_msg in db_messages:
-                context_messages.append(ChatMessage(
-                    role=db_msg.role,
-                    content=db_msg.content,
-                    query=db_msg.query
-                ))
+            chat_session = await chat_service.get_session_by_id(session_id)
+            history_manager = ChatHistoryManager(
+                llm_service.config, chat_service.update_session_summary, llm_service.summarize_history
+            )
+            context_messages = await history_manager.build_context(chat_session, db_messages, provider)
             
             # 2. Add the user message if it wasn't already added (Caller might have added it)
             # Strategy: Caller adds user message, then calls worker.
             # So context_messages should already include it if ChatService.get_session_messages works correctly.
             
             # 3. Generate Response
-            schema = await db_manager.get_schema_for_prompt(db_id)
+            schema = await db_manager.get_schema_for_prompt(
+                db_id, question=question_from_history(db_messages) or user_message_content
+            )
             db_engine = db_manager.get_db_engine(db_id)
             
             response_message = await llm_service.generate_response_from_messages(
@@ -98,8 +142,14 @@ async def generate_response_task(ctx, session_id: int, user_message_content: str
 
 # Define the worker settings
 class WorkerSettings:
-    functions = [generate_response_task]
-    redis_settings = "redis://redis:6379"
+    # Chat jobs are not retried: a retry would repeat tool calls and the saved messages.
+    # The timeout must cover MAX_TURNS model calls plus their tool calls.
+    functions = [
+        generate_response_task,
+        func(run_chat_task, max_tries=1, timeout=load_chat_jobs_config().get("job_timeout_seconds", 900)),
+    ]
+    # Same Redis the API enqueues chat jobs to
+    redis_settings = RedisSettings.from_dsn(chat_jobs_redis_url())
     on_startup = startup
     on_shutdown = shutdown
     max_tries = 3
@@ -0,0 +1,48 @@
+import apiClient from './apiClient';
+
+// POSTs to a Server-Sent Events endpoint and calls onEvent(type, data) for each
+// event as it arrives. Resolves when the stream ends; rejects on HTTP errors
+// (with error.response shaped like axios' so callers can share error handling).
+export const streamChatMessage = async (path, body, onEvent) => {
+    const response = await fetch(`${apiClient.defaults.baseURL}${path}`, {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+        body: JSON.stringify(body),
+    });
+
+    if (!response.ok) {
+        if (response.status === 401) {
+            window.dispatchEvent(new Event('logout'));
+        }
+        const error = new Error(`Request failed with status ${response.status}`);
+        error.response = { status: response.status, data: await response.json().catch(() => ({})) };
+        throw error;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let type = 'message';
+            const dataLines = [];
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) type = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+            }
+            if (dataLines.length) {
+                onEvent(type, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+};
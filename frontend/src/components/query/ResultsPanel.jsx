@@ -5,7 +5,22 @@ import Table from 'components/common/Table';
 import JsonViewer from 'components/common/JsonViewer';
 
 const ResultsPanel = () => {
-  const { queryResult, isQuerying } = useDbStore();
+  const { queryResult, isQuerying, isLoadingMore, loadMoreResults } = useDbStore();
+
+  const renderLoadMore = () => {
+    if (!queryResult?.next_page_token) return null;
+    return (
+      <div className="flex justify-center p-3">
+        <button
+          onClick={loadMoreResults}
+          disabled={isLoadingMore}
+          className="px-4 py-2 text-sm rounded-md bg-[var(--bg-tertiary)] text-[var(--text-primary)] border border-[var(--border-color)] disabled:opacity-50"
+        >
+          {isLoadingMore ? 'Loading...' : 'Load more'}
+        </button>
+      </div>
+    );
+  };
 
   const renderContent = () => {
     if (isQuerying) {
@@ -35,11 +50,21 @@ const ResultsPanel = () => {
     }
 
     if (queryResult.rows) {
-      return <Table columns={queryResult.columns} data={queryResult.rows} />;
+      return (
+        <>
+          <Table columns={queryResult.columns} data={queryResult.rows} />
+          {renderLoadMore()}
+        </>
+      );
     }
 
     if (queryResult.json_result) {
-      return <JsonViewer data={queryResult.json_result} />;
+      return (
+        <>
+          <JsonViewer data={queryResult.json_result} />
+          {renderLoadMore()}
+        </>
+      );
     }
 
     return (
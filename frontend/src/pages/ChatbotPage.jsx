@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import apiClient from 'api/apiClient';
+import { streamChatMessage } from 'api/chatStream';
 import { useDbStore } from 'stores/dbStore';
 import { useMcpStore } from 'stores/mcpStore';
 import ChatMessage from 'components/chat/ChatMessage';
@@ -7,6 +8,7 @@ import ChatInput from 'components/chat/ChatInput';
 import SessionList from 'components/chat/SessionList';
 import { Bars3Icon, SparklesIcon } from '@heroicons/react/24/outline';
 import { autoDetectChartConfig, transformResultsToChartData } from '../utils/chartUtils';
+import { expandColumnarResult } from '../utils/resultUtils';
 
 const ChatbotPage = () => {
     const defaultMessage = {
@@ -182,6 +184,7 @@ const ChatbotPage = () => {
             // UI message: { role, content, query, chartConfig, ... }
             const loadedMessages = res.data.messages.map(msg => ({
                 ...msg,
+                results: expandColumnarResult(msg.results),
                 chartConfig: msg.chart_config // Map snake_case to camelCase if needed by component
             }));
 
@@ -253,22 +256,39 @@ const ChatbotPage = () => {
                 params.append('active_mcp_ids', activeMcpIds.join(','));
             }
 
-            const res = await apiClient.post(
-                `/api/chatbot/sessions/${activeSessionId}/message?${params.toString()}`,
-                {
-                    role: 'user',
-                    content: userInput
+            // Streamed: the reply is drawn token by token, then replaced by the saved message
+            const draftId = `draft-${Date.now()}`;
+            const upsertDraft = (update) => setMessages(prev => {
+                const others = prev.filter(msg => msg.draftId !== draftId);
+                const draft = prev.find(msg => msg.draftId === draftId) || { role: 'assistant', content: '', draftId };
+                return [...others, update(draft)];
+            });
+
+            await streamChatMessage(
+                `/api/chatbot/sessions/${activeSessionId}/message/stream?${params.toString()}`,
+                { role: 'user', content: userInput },
+                (type, data) => {
+                    if (type === 'turn') {
+                        // A new model turn starts a fresh draft (tool-call reasoning is not kept on screen)
+                        setMessages(prev => prev.filter(msg => msg.draftId !== draftId));
+                    } else if (type === 'token') {
+                        upsertDraft(draft => ({ ...draft, content: draft.content + data.delta }));
+                    } else if (type === 'tool_call_start') {
+                        upsertDraft(draft => ({ ...draft, content: `Running tool ${data.tool}...` }));
+                    } else if (type === 'message') {
+                        setMessages(prev => [
+                            ...prev.filter(msg => msg.draftId !== draftId),
+                            { ...data.message, chartConfig: data.message.chart_config },
+                        ]);
+                    } else if (type === 'error') {
+                        setMessages(prev => prev.filter(msg => msg.draftId !== draftId));
+                        const error = new Error(data.detail);
+                        error.response = { data: { detail: data.detail } };
+                        throw error;
+                    }
                 }
             );
 
-            // Backend returns list of NEW messages (assistant response)
-            const botResponses = res.data.map(msg => ({
-                ...msg,
-                chartConfig: msg.chart_config
-            }));
-
-            setMessages(prev => [...prev, ...botResponses]);
-
         } catch (error) {
             let errorMsg = 'An unexpected error occurred.';
             if (error.response?.data?.detail) {
@@ -288,6 +308,8 @@ const ChatbotPage = () => {
                 db_id: selectedDbId,
                 raw_query: query,
                 model_provider: llmProvider,
+                // Compact per-column arrays: smaller to transfer and to persist below
+                format: 'columnar',
             });
 
             const results = res.data;
@@ -314,7 +336,7 @@ const ChatbotPage = () => {
                 if (index !== undefined && newMsgs[index]) {
                     newMsgs[index] = {
                         ...newMsgs[index],
-                        results: results
+                        results: expandColumnarResult(results)
                     };
                 }
                 return newMsgs;
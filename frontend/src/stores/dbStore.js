@@ -13,6 +13,7 @@ export const useDbStore = create((set, get) => ({
   isLoadingSchema: false,
   queryResult: null,
   isQuerying: false,
+  isLoadingMore: false,
   generatedQuery: null,
   isGenerating: false,
 
@@ -113,6 +114,7 @@ export const useDbStore = create((set, get) => ({
         raw_query: rawQuery,
         natural_language_query: nlQuery,
         confirm_execute: true,
+        page_size: 500,
       });
       set({ queryResult: response.data });
       if (response.data.error) {
@@ -131,4 +133,37 @@ export const useDbStore = create((set, get) => ({
       set({ isQuerying: false });
     }
   },
-}));
\ No newline at end of file
+
+  loadMoreResults: async () => {
+    const current = get().queryResult;
+    if (!current || !current.next_page_token || get().isLoadingMore) return;
+    set({ isLoadingMore: true });
+    try {
+      const response = await apiClient.get(`/api/query/pages/${current.next_page_token}`);
+      const page = response.data;
+      if (page.error) {
+        toast.error(page.error);
+        return;
+      }
+      set({
+        queryResult: {
+          ...current,
+          rows: page.rows ? [...(current.rows || []), ...page.rows] : current.rows,
+          json_result: Array.isArray(page.json_result)
+            ? [...(current.json_result || []), ...page.json_result]
+            : current.json_result,
+          next_page_token: page.next_page_token,
+        },
+      });
+    } catch (error) {
+      if (error.response && error.response.status === 410) {
+        toast.warn("These results expired. Run the query again to continue paging.");
+        set({ queryResult: { ...current, next_page_token: null } });
+      } else {
+        toast.error("Failed to load more results.");
+      }
+    } finally {
+      set({ isLoadingMore: false });
+    }
+  },
+}));
@@ -0,0 +1,19 @@
+// Query results requested with format: 'columnar' carry
+// { columns, types, values: [[...column values]], row_count } instead of row objects.
+// Expands them back to { columns, rows } for the table and chart components.
+export const expandColumnarResult = (results) => {
+    if (!results || !results.columnar) {
+        return results;
+    }
+
+    const { columns, values, row_count: rowCount } = results.columnar;
+    const rows = new Array(rowCount);
+    for (let r = 0; r < rowCount; r++) {
+        const row = {};
+        for (let c = 0; c < columns.length; c++) {
+            row[columns[c]] = values[c][r];
+        }
+        rows[r] = row;
+    }
+    return { ...results, columns, rows, columnar: undefined };
+};